@@ -0,0 +1,88 @@
+"""Per-call latency: adb server socket client vs spawning adb.
+
+Against a real adb server and device:
+
+    python benchmarks/bench_adbclient.py --serial 1WMHH... [--calls 50]
+
+Without a device, --fake runs the socket path against the in-process fake
+server from tests/ and compares it with the cost of spawning a trivial
+process, which is the floor for any `adb ...` subprocess call.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mirror_backend.adbclient import AdbClient  # noqa: E402
+from mirror_backend.utils import get_adb_path, NO_WINDOW  # noqa: E402
+
+
+def measure(fn, calls):
+    fn()  # warm up (first connect, feature probe, page cache)
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        "mean_ms": statistics.fmean(samples),
+    }
+
+
+def report(name, r):
+    print(f"{name:<34} p50 {r['p50_ms']:7.2f} ms   p95 {r['p95_ms']:7.2f} ms   mean {r['mean_ms']:7.2f} ms")
+
+
+def run_real(serial, calls):
+    adb = get_adb_path()
+    client = AdbClient()
+    client.prefill()
+
+    def sub(*args):
+        subprocess.run([adb, "-s", serial, *args], capture_output=True, creationflags=NO_WINDOW)
+
+    report("subprocess adb get-state", measure(lambda: sub("get-state"), calls))
+    report("socket     get-state", measure(lambda: client.get_state(serial), calls))
+    report("subprocess adb shell pidof", measure(lambda: sub("shell", "pidof", "screenrecord"), calls))
+    report("socket     shell pidof", measure(lambda: client.shell(serial, "pidof screenrecord"), calls))
+    report("subprocess adb shell getprop", measure(lambda: sub("shell", "getprop", "ro.product.model"), calls))
+    report("socket     shell getprop", measure(lambda: client.shell(serial, "getprop ro.product.model"), calls))
+    client.close()
+
+
+def run_fake(calls):
+    sys.path.insert(0, os.path.join(ROOT, "tests"))
+    from fake_adb_server import FakeAdbServer
+
+    with FakeAdbServer() as server:
+        client = AdbClient(port=server.port)
+        client.prefill()
+        report("spawn trivial process (floor)", measure(
+            lambda: subprocess.run([sys.executable, "-c", ""], creationflags=NO_WINDOW), calls))
+        report("socket get-state (fake server)", measure(lambda: client.get_state("FAKE0001"), calls))
+        report("socket shell true (fake server)", measure(lambda: client.shell("FAKE0001", "true"), calls))
+        client.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--serial")
+    ap.add_argument("--calls", type=int, default=50)
+    ap.add_argument("--fake", action="store_true")
+    args = ap.parse_args()
+    if args.fake or not args.serial:
+        run_fake(args.calls)
+    else:
+        run_real(args.serial, args.calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Child-process log draining: one thread per pipe vs the shared reactor.
+
+Spawns N fake players that each write an ffplay-style status line (\\r
+redraw, or \\n with --newline) at --rate Hz on stderr plus an occasional normal line, drains them
+for --seconds either the old way (a thread per pipe printing every line) or
+through LogReactor, and reports thread count, lines printed and CPU time of
+this process. Printing goes to os.devnull so the terminal isn't measured.
+
+    python benchmarks/bench_logging.py --players 20 --seconds 5
+"""
+import argparse
+import contextlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mirror_backend.logreactor import LogReactor, print_record  # noqa: E402
+
+CHILD = r"""
+import sys, time
+rate, seconds, end_char = float(sys.argv[1]), float(sys.argv[2]), sys.argv[3]
+end = time.monotonic() + seconds
+i = 0
+while time.monotonic() < end:
+    sys.stderr.write("%7.2f M-V: %6.3f fd=%4d aq=    0KB vq=  %3dKB sq=    0B %s" % (i / rate, 0.001, i // 50, i % 90, end_char))
+    if i % 100 == 99:
+        sys.stderr.write("\n[h264 @ 0x55] concealing 12 DC, 12 AC, 12 MV errors in P frame\n")
+    sys.stderr.flush()
+    i += 1
+    time.sleep(1 / rate)
+"""
+
+
+def spawn(n, rate, seconds, end_char):
+    return [subprocess.Popen([sys.executable, "-c", CHILD, str(rate), str(seconds), end_char], stderr=subprocess.PIPE)
+            for _ in range(n)]
+
+
+def run_threads(procs):
+    printed = [0]
+
+    def log_stderr(process, name):
+        # What ScreenRecordBackend._log_stderr used to do.
+        for line in process.stderr:
+            print(f"[{name}] {line.decode('utf-8', errors='replace').strip()}")
+            printed[0] += 1
+
+    threads = [threading.Thread(target=log_stderr, args=(p, "Player"), daemon=True) for p in procs]
+    for t in threads:
+        t.start()
+    peak = threading.active_count()
+    for t in threads:
+        t.join()
+    return peak, printed[0], None
+
+
+def run_reactor(procs):
+    reactor = LogReactor()
+    reactor.add_handler(print_record)
+    closed = threading.Semaphore(0)
+    for p in procs:
+        reactor.add(p.stderr, label="Player", on_close=closed.release)
+    peak = threading.active_count()
+    for _ in procs:
+        closed.acquire()
+    reactor.stop()
+    return peak, reactor.lines_out, reactor.lines_in
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--players", type=int, default=20)
+    ap.add_argument("--rate", type=float, default=10.0)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--newline", action="store_true",
+                    help="end status lines with \\n (as ffmpeg -stats does when not on a tty) instead of \\r")
+    args = ap.parse_args()
+
+    for name, fn in (("thread per pipe", run_threads), ("reactor", run_reactor)):
+        procs = spawn(args.players, args.rate, args.seconds, "\n" if args.newline else "\r")
+        cpu0 = time.process_time()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            peak, printed, parsed = fn(procs)
+        cpu = time.process_time() - cpu0
+        for p in procs:
+            p.wait()
+        extra = f", {parsed} lines parsed" if parsed is not None else ""
+        print(f"{name:<16} threads {peak:3d}   printed {printed:6d}{extra}   CPU {cpu * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Host cost of watching N headsets: N player windows vs one mosaic.
+
+Runs the same N simulated headsets (fake_headset.py) two ways and measures
+each over a fixed window:
+
+    players   N ScreenRecord sessions, one player per device (decode, eye
+              crop, full-size v360, a window each)
+    mosaic    one MosaicView (mosaic.py): N headless decoders correcting at
+              tile size, one compositor thread, one window
+
+For each: app CPU / RSS / threads (this process: relays, broker, the
+compositor), child CPU / RSS (players, or decoders + the mosaic's player),
+processes and windows, and the frame rate the slowest device reached. The
+fake adb processes' CPU is the simulator's and isn't counted.
+
+By default the players are fake_headset's "ffmpeg" stand-in: ffplay's own
+arguments run by ffmpeg into a null sink, so the decode and filter work is
+real but no window is drawn. --real-player uses ffplay itself (needs a
+display); --wm-pid PID then also samples the window manager / compositor
+process (e.g. Xorg, gnome-shell, kwin), the part N windows cost outside
+the players.
+
+    python benchmarks/bench_mosaic.py [--devices 16] [--seconds 10]
+        [--fps 30] [--size 1920x1080] [--stream file.h264] [--real-player]
+        [--wm-pid PID] [--out mosaic.json]
+
+Needs ffmpeg on PATH (QSC_FFMPEG_PATH for the decoders) and NumPy; without
+--stream a 1280x720 H.264 test stream is made with ffmpeg. Linux only (CPU
+and RSS come from /proc).
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_scaling  # noqa: E402
+from bench_scaling import PARALLEL, _self_usage, _version  # noqa: E402
+from fake_headset import FakeHeadset  # noqa: E402
+from mirror_backend import adbclient, shell, teardown  # noqa: E402
+from mirror_backend.exporter import process_usage  # noqa: E402
+from mirror_backend.logreactor import get_reactor, print_record  # noqa: E402
+from mirror_backend.mosaic import MosaicView  # noqa: E402
+from mirror_backend.screenrecord import ScreenRecordBackend  # noqa: E402
+from mirror_backend.utils import get_ffmpeg_path  # noqa: E402
+
+# bench_scaling's sessions, with the app's eye value so both sides crop and
+# correct.
+OPTIONS = dict(bench_scaling.OPTIONS, eye="左眼")
+
+
+def make_stream(path, seconds=4):
+    # An IDR a second at 30 fps, like screenrecord's; replayed at --fps.
+    subprocess.run([
+        get_ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30", "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "zerolatency",
+        "-g", "30", "-b:v", "8M", "-f", "h264", path,
+    ], check=True)
+
+
+def _usage(procs):
+    """(cpu_s, rss) summed over live processes."""
+    cpu, rss = 0.0, 0
+    for proc in procs:
+        usage = process_usage(proc)
+        if usage:
+            cpu += usage[0]
+            rss += usage[1]
+    return cpu, rss
+
+
+class Window:
+    """CPU of everything measured over one window of `seconds`."""
+
+    def __init__(self, procs, wm):
+        self.procs = procs
+        self.wm = wm
+
+    def __enter__(self):
+        self.t0 = time.monotonic()
+        self.app0 = _self_usage()[0]
+        self.child0 = _usage(self.procs)[0]
+        self.wm0 = _usage(self.wm)[0]
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.monotonic() - self.t0
+        app1, self.app_rss, self.threads = _self_usage()
+        child1, self.child_rss = _usage(self.procs)
+        self.app_cpu = app1 - self.app0
+        self.child_cpu = child1 - self.child0
+        self.wm_cpu = _usage(self.wm)[0] - self.wm0
+
+    def result(self):
+        def pct(cpu):
+            return 100.0 * cpu / self.wall
+        return {
+            "app_cpu_pct": pct(self.app_cpu),
+            "app_rss_mb": self.app_rss / 2**20,
+            "app_threads": self.threads,
+            "child_cpu_pct": pct(self.child_cpu),
+            "child_rss_mb": self.child_rss / 2**20,
+            "total_cpu_pct": pct(self.app_cpu + self.child_cpu),
+            "wm_cpu_pct": pct(self.wm_cpu) if self.wm else None,
+            "processes": len(self.procs),
+        }
+
+
+def run_players(headset, args, wm):
+    backends = {s: ScreenRecordBackend() for s in headset.serials}
+
+    def start(serial):
+        backends[serial].start(serial, dict(OPTIONS, window_title=serial))
+
+    with concurrent.futures.ThreadPoolExecutor(PARALLEL) as pool:
+        list(pool.map(start, headset.serials))
+    time.sleep(args.warmup)
+    procs = [b.player_process for b in backends.values()]
+    with Window(procs, wm) as w:
+        time.sleep(args.seconds)
+    teardown.stop_all(backends)
+    return dict(w.result(), mode="players", windows=len(procs), min_fps=None)
+
+
+def run_mosaic(headset, args, wm):
+    view = MosaicView(size=args.size, fps=args.fps, sink="window")
+    view.start({s: dict(OPTIONS) for s in headset.serials})
+    time.sleep(args.warmup)
+    procs = [t.decoder for t in view.tiles if t.decoder is not None] + [view.sink.proc]
+    frames0 = [t.ring.published for t in view.tiles]
+    with Window(procs, wm) as w:
+        time.sleep(args.seconds)
+    fps = [(t.ring.published - f0) / w.wall for t, f0 in zip(view.tiles, frames0)]
+    view.stop()
+    return dict(w.result(), mode="mosaic", windows=1, min_fps=min(fps, default=0.0),
+                tile_errors=[t.error for t in view.tiles if t.error])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--devices", type=int, default=16)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--warmup", type=float, default=3)
+    ap.add_argument("--fps", type=float, default=30)
+    ap.add_argument("--size", default="1920x1080")
+    ap.add_argument("--stream", help="H.264 (Annex-B) the headsets replay")
+    ap.add_argument("--real-player", action="store_true", help="real ffplay windows (needs a display)")
+    ap.add_argument("--wm-pid", type=int, help="also sample this window manager / compositor process")
+    ap.add_argument("--out", help="write results as JSON here")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    args.size = tuple(int(v) for v in args.size.split("x"))
+    if not shutil.which(get_ffmpeg_path()):
+        raise SystemExit("ffmpeg not found (PATH or QSC_FFMPEG_PATH)")
+    if not args.verbose:
+        get_reactor().remove_handler(print_record)  # children's stderr
+    wm = [SimpleNamespace(pid=args.wm_pid)] if args.wm_pid else []
+
+    stream = args.stream
+    if stream is None:
+        fd, stream = tempfile.mkstemp(suffix=".h264")
+        os.close(fd)
+        make_stream(stream)
+    results = []
+    try:
+        with FakeHeadset(stream, devices=args.devices, fps=args.fps,
+                         player=None if args.real_player else "ffmpeg") as headset:
+            print(f"{'mode':<8} {'app CPU':>8} {'child CPU':>9} {'total':>7} {'app RSS':>8} "
+                  f"{'child RSS':>9} {'procs':>5} {'windows':>7} {'WM CPU':>7}")
+            for run in (run_players, run_mosaic):
+                out = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with out:
+                    r = run(headset, args, wm)
+                results.append(r)
+                wm_cpu = "-" if r["wm_cpu_pct"] is None else f"{r['wm_cpu_pct']:.1f}%"
+                print(f"{r['mode']:<8} {r['app_cpu_pct']:>7.1f}% {r['child_cpu_pct']:>8.1f}% "
+                      f"{r['total_cpu_pct']:>6.1f}% {r['app_rss_mb']:>6.0f}MB {r['child_rss_mb']:>7.0f}MB "
+                      f"{r['processes']:>5} {r['windows']:>7} {wm_cpu:>7}")
+            mosaic = results[-1]
+            print(f"mosaic: slowest tile {mosaic['min_fps']:.1f} fps"
+                  + (f", {len(mosaic['tile_errors'])} tile(s) failed" if mosaic["tile_errors"] else ""))
+    finally:
+        shell.close_all()
+        adbclient.get_client().close()
+        if args.stream is None:
+            os.unlink(stream)
+
+    if args.out:
+        report = {
+            "benchmark": "mosaic",
+            "version": _version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "verbose")},
+            "results": results,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Relay overhead benchmark.
+
+Pushes a synthetic screenrecord-like H.264 stream (default 20 Mbps, 60 fps,
+IDR once per second) through StreamRelay as fast as the pipe allows and
+reports the relay's CPU cost per second of *stream* -- i.e. the share of one
+core it would use when fed at the real bitrate. --paced feeds it at the real
+rate instead (one write per frame interval, like adb), which is closer to
+production because every read then returns a small chunk.
+
+    python benchmarks/bench_relay.py [--mbps 20] [--fps 60] [--seconds 30] [--paced]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mirror_backend.relay import StreamRelay  # noqa: E402
+
+_ZERO_FREE = bytes.maketrans(b"\x00", b"\x01")
+
+
+def _payload(size):
+    # Random bytes with zeros removed can never contain a start code.
+    return os.urandom(size).translate(_ZERO_FREE)
+
+
+def synth_stream(mbps, fps, seconds, gop=None):
+    gop = gop or fps
+    frame_bytes = int(mbps * 1_000_000 / 8 / fps)
+    sps = b"\x00\x00\x00\x01\x67\x42\xc0\x1f" + _payload(12)
+    pps = b"\x00\x00\x00\x01\x68\xce\x3c\x80"
+    idr = b"\x00\x00\x00\x01\x65\x88" + _payload(frame_bytes * 4)
+    p_frames = [b"\x00\x00\x00\x01\x41\x9a" + _payload(frame_bytes) for _ in range(8)]
+    out = [sps, pps]
+    for i in range(int(fps * seconds)):
+        out.append(idr if i % gop == 0 else p_frames[i % len(p_frames)])
+    return b"".join(out)
+
+
+_FAST_WRITER = "import shutil,sys;shutil.copyfileobj(open(sys.argv[1],'rb'),sys.stdout.buffer,1<<16)"
+_PACED_WRITER = """
+import sys, time
+data = open(sys.argv[1], 'rb').read()
+step, tick = int(sys.argv[2]), 1.0 / float(sys.argv[3])
+out = sys.stdout.buffer
+t = time.perf_counter()
+for i in range(0, len(data), step):
+    out.write(data[i:i + step]); out.flush()
+    t += tick
+    time.sleep(max(0.0, t - time.perf_counter()))
+"""
+
+
+def run(mbps, fps, seconds, paced=False):
+    data = synth_stream(mbps, fps, seconds)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".h264") as f:
+        f.write(data)
+        path = f.name
+    try:
+        if paced:
+            cmd = [sys.executable, "-c", _PACED_WRITER, path, str(int(mbps * 1_000_000 / 8 / fps)), str(fps)]
+        else:
+            cmd = [sys.executable, "-c", _FAST_WRITER, path]
+        writer = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=0)
+        sink = open(os.devnull, "wb")
+        relay = StreamRelay(writer.stdout, sink, name="bench")
+        cpu0 = time.process_time()
+        wall0 = time.perf_counter()
+        relay.start()
+        relay._thread.join()
+        wall = time.perf_counter() - wall0
+        cpu = time.process_time() - cpu0
+        writer.wait()
+        sink.close()
+    finally:
+        os.unlink(path)
+
+    stream_seconds = seconds
+    return {
+        "bytes": relay.bytes_in,
+        "frames": relay.frames,
+        "nal_units": relay.nal_units,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "throughput_mbps": relay.bytes_in * 8 / wall / 1e6,
+        "core_pct_at_rate": 100.0 * cpu / stream_seconds,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mbps", type=float, default=20)
+    ap.add_argument("--fps", type=float, default=60)
+    ap.add_argument("--seconds", type=float, default=30)
+    ap.add_argument("--paced", action="store_true", help="feed at the real bitrate instead of flat out")
+    args = ap.parse_args()
+    r = run(args.mbps, args.fps, args.seconds, args.paced)
+    print(f"relayed {r['bytes'] / 1e6:.1f} MB, {r['frames']} frames, {r['nal_units']} NAL units "
+          f"in {r['wall_s']:.2f}s wall / {r['cpu_s']:.2f}s CPU "
+          f"({r['throughput_mbps']:.0f} Mbps throughput)")
+    print(f"relay cost at {args.mbps:g} Mbps: {r['core_pct_at_rate']:.2f}% of one core")
+
+
+if __name__ == "__main__":
+    main()
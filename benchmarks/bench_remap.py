@@ -0,0 +1,109 @@
+"""Per-frame CPU of the fisheye correction: v360 vs precomputed remap maps.
+
+Runs the player's filter chain (crop of one eye, then the correction) in
+ffmpeg over the same generated 1280x720 input. There are four variants:
+crop only, which is the floor; v360; v360 with interp=near; and the remap
+graph screenrecord.py builds from remap.py's maps. For each it reports
+ffmpeg's CPU time (user + system) per frame and the correction's share
+above the floor. It also reports what the maps cost to compute cold and to
+fetch from the cache.
+
+    python benchmarks/bench_remap.py [--frames 600] [--fov-in 150]
+        [--fov-out 95] [--roll 0] [--crop 640] [--out 720] [--threads 1]
+
+--threads 1 (the default) pins ffmpeg to one filter/decoder thread, as
+when many headsets share a CPU. Needs ffmpeg on PATH and NumPy.
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mirror_backend import remap  # noqa: E402
+from mirror_backend.screenrecord import ScreenRecordBackend  # noqa: E402
+
+
+def filter_chain(args, correction, use_remap, cache_dir, interp=None):
+    options = {
+        "width": 1280, "height": 720, "eye": "左眼", "correction": correction,
+        "fov_in": args.fov_in, "fov_out": args.fov_out, "roll": args.roll,
+        "crop_size": args.crop, "eye_cx": 320, "eye_cy": 360, "out_size": args.out,
+        "remap": use_remap, "remap_cache": cache_dir, "interp": interp,
+    }
+    vf = ScreenRecordBackend()._build_video_filters(options)
+    if use_remap and "remap" not in vf[0]:
+        raise SystemExit("remap maps unavailable (is NumPy installed?)")
+    return ",".join(vf)
+
+
+def cpu_per_frame(vf, args):
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=60,format=yuv420p",
+        "-frames:v", str(args.frames), "-threads", str(args.threads),
+        "-filter_threads", str(args.threads), "-vf", vf, "-f", "null", "-",
+    ]
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.monotonic()
+    subprocess.run(cmd, check=True)
+    wall = time.monotonic() - t0
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return cpu / args.frames, wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--fov-in", type=float, default=150)
+    ap.add_argument("--fov-out", type=float, default=95)
+    ap.add_argument("--roll", type=float, default=0)
+    ap.add_argument("--crop", type=int, default=640)
+    ap.add_argument("--out", type=int, default=720)
+    ap.add_argument("--threads", type=int, default=1)
+    args = ap.parse_args()
+    if not shutil.which("ffmpeg"):
+        raise SystemExit("ffmpeg not found on PATH")
+
+    cache_dir = tempfile.mkdtemp(prefix="remap-bench-")
+    try:
+        params = (args.crop, args.fov_in, args.fov_out, args.roll, args.out)
+        t0 = time.perf_counter()
+        if remap.get_maps(*params, cache_dir=cache_dir) is None:
+            raise SystemExit("remap maps unavailable (is NumPy installed?)")
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        remap.get_maps(*params, cache_dir=cache_dir)
+        cached = time.perf_counter() - t0
+        print(f"maps: computed in {cold * 1000:.1f} ms, cached lookup {cached * 1000:.2f} ms")
+
+        # "crop" (no correction) is the floor: input generation, crop, null
+        # output. The correction's own cost is a row minus that.
+        print(f"{'filter':<9} {'CPU/frame':>10} {'correction':>10} {'wall':>8}")
+        results = {}
+        for name, correction, use_remap, interp in (("crop", "none", False, None),
+                                                    ("v360", "v360", False, None),
+                                                    ("v360near", "v360", False, "near"),
+                                                    ("remap", "v360", True, None)):
+            vf = filter_chain(args, correction, use_remap, cache_dir, interp)
+            per_frame, wall = cpu_per_frame(vf, args)
+            results[name] = per_frame
+            own = per_frame - results["crop"]
+            print(f"{name:<9} {per_frame * 1000:>8.2f}ms {own * 1000:>8.2f}ms {wall:>7.2f}s")
+        v360 = results["v360"] - results["crop"]
+        if v360 > 0:
+            for name in ("v360near", "remap"):
+                print(f"{name} costs {(results[name] - results['crop']) / v360 * 100:.0f}% of v360 per frame")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Instant-replay buffer cost: per-NAL overhead, memory held, save time.
+
+Feeds a synthetic screenrecord-like stream (bench_relay.synth_stream,
+default 20 Mbps, 60 fps, IDR once per second) through a ReplayBuffer with
+stream timestamps, as the relay would, then saves it while a thread keeps
+feeding (the mirror doesn't stop for a save) and reports:
+
+    on_nal     CPU per second of stream (share of one core at the real rate)
+    held/peak  encoded bytes kept vs the byte cap
+    save       ms to write the buffer + index, and the feeder's worst stall
+
+    python benchmarks/bench_replay.py [--mbps 20] [--fps 60] [--seconds 90] [--keep 30] [--cap-mb 96]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_relay import synth_stream  # noqa: E402
+from mirror_backend import recorder, replay  # noqa: E402
+from mirror_backend.h264 import AnnexBReader, NAL_IDR, NAL_SLICE, is_first_slice  # noqa: E402
+
+
+def nals(data, fps):
+    """(type, nal, ts) for `data`, one frame per 1/fps s; NALs are views, as
+    the relay passes them."""
+    out = []
+    frame = -1
+    with tempfile.TemporaryFile() as f:
+        f.write(data)
+        f.seek(0)
+        reader = AnnexBReader(f)
+        while True:
+            result = reader.read()
+            if result is None:
+                break
+            for t, nal in result[1]:
+                if (t == NAL_SLICE or t == NAL_IDR) and is_first_slice(nal):
+                    frame += 1
+                out.append((t, memoryview(bytes(nal)), max(frame, 0) / fps))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mbps", type=float, default=20)
+    ap.add_argument("--fps", type=int, default=60)
+    ap.add_argument("--seconds", type=float, default=90)
+    ap.add_argument("--keep", type=float, default=30)
+    ap.add_argument("--cap-mb", type=int, default=replay.DEFAULT_BYTES >> 20)
+    args = ap.parse_args()
+
+    units = nals(synth_stream(args.mbps, args.fps, args.seconds), args.fps)
+    buf = replay.ReplayBuffer("bench", args.keep, args.cap_mb << 20)
+    # Fill all but the last 10 s.
+    split = next(i for i, u in enumerate(units) if u[2] >= args.seconds - 10)
+    t0 = time.process_time()
+    for t, nal, ts in units[:split]:
+        buf.on_nal(t, nal, ts)
+    cpu = time.process_time() - t0
+    print(f"on_nal: {cpu / (args.seconds - 10) * 100:.2f}% of a core "
+          f"({cpu / split * 1e6:.2f} us/NAL, {split} NALs)")
+
+    # Keep feeding at the real rate while saving.
+    stall = [0.0]
+
+    def feeder():
+        start = time.perf_counter()
+        for t, nal, ts in units[split:]:
+            wait = start + ts - units[split][2] - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            t1 = time.perf_counter()
+            buf.on_nal(t, nal, ts)
+            stall[0] = max(stall[0], time.perf_counter() - t1)
+
+    thread = threading.Thread(target=feeder)
+    thread.start()
+    time.sleep(1.0)
+    tmp = tempfile.mkdtemp(prefix="replay-bench-")
+    try:
+        saved = buf.save(os.path.join(tmp, "replay.h264"))
+        thread.join()
+        stats = buf.stats()
+        print(f"held {stats['bytes'] / 2**20:.1f} MB / {stats['seconds']:.1f} s, "
+              f"peak {stats['peak_bytes'] / 2**20:.1f} MB (cap {args.cap_mb} MB)")
+        print(f"save: {saved['bytes'] / 2**20:.1f} MB, {saved['seconds']:.1f} s, "
+              f"{saved['keyframes']} keyframes in {saved['save_ms']:.0f} ms; "
+              f"worst on_nal during the run {stall[0] * 1000:.2f} ms")
+        with recorder.Segment(saved["path"]) as seg:
+            assert bytes(seg.gop(0)[:5]) == b"\x00\x00\x00\x01\x67", "replay must start at SPS"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
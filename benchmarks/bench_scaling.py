@@ -0,0 +1,239 @@
+"""Steady-state cost of N concurrent ScreenRecord sessions (1 to 32 devices).
+
+Starts N simulated headsets (fake_headset.py) through the real
+ScreenRecordBackend with the app's default options (relay + rollover, async
+start), lets them run, and measures over a fixed window:
+
+    app CPU / RSS / threads   this process: relay, log reactor, shells, ...
+    player CPU / RSS          the null decoders (`ffmpeg -f null`, standing
+                              in for ffplay without a window)
+    throughput                bytes through all relays
+    stalls                    per stream, frame gaps over --stall-ms
+    stop                      all N sessions stopped at once (teardown.py,
+                              as on app exit): total and slowest session
+
+The fake adb processes' CPU is reported separately (it is the simulator's
+cost, not the app's). Results go to JSON so runs of two versions can be
+diffed:
+
+    python benchmarks/bench_scaling.py [--devices 1,2,4,8,16,32] [--seconds 10]
+        [--mbps 8] [--fps 60] [--player null|fake] [--out scaling.json]
+
+--player fake swaps the decoder for fake_headset's Annex-B scanner when
+ffmpeg isn't installed (player numbers then say little). Linux only (CPU and
+RSS come from /proc).
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_relay import synth_stream  # noqa: E402
+from fake_headset import FakeHeadset  # noqa: E402
+from mirror_backend import adbclient, shell, teardown  # noqa: E402
+from mirror_backend.exporter import process_usage  # noqa: E402
+from mirror_backend.logreactor import get_reactor, print_record  # noqa: E402
+from mirror_backend.h264 import NAL_IDR, NAL_SLICE, is_first_slice  # noqa: E402
+from mirror_backend.screenrecord import ScreenRecordBackend  # noqa: E402
+
+OPTIONS = {
+    "bitrate": 8, "width": 1280, "height": 720, "mode": "window",
+    "correction": "v360", "fov_in": 150, "fov_out": 95, "roll": 0,
+    "crop_size": 640, "eye_cx": 320, "eye_cy": 360, "eye": "left",
+    "relay": False, "rollover": True, "async_start": True,
+}
+# Sessions started at once.
+PARALLEL = 8
+
+
+class StallCounter:
+    """Relay listener: frame gaps longer than `threshold` seconds."""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.last = None
+        self.measuring = False
+        self.frames = 0
+        self.stalls = 0
+        self.max_gap = 0.0
+
+    def begin(self) -> None:
+        self.frames = self.stalls = 0
+        self.max_gap = 0.0
+        self.measuring = True
+
+    def __call__(self, t, nal, ts):
+        if (t != NAL_SLICE and t != NAL_IDR) or not is_first_slice(nal):
+            return
+        if self.measuring:
+            self.frames += 1
+            if self.last is not None:
+                gap = ts - self.last
+                if gap > self.max_gap:
+                    self.max_gap = gap
+                if gap > self.threshold:
+                    self.stalls += 1
+        self.last = ts
+
+
+def _self_usage():
+    with open("/proc/self/statm", "rb") as f:
+        rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return time.process_time(), rss, len(os.listdir("/proc/self/task"))
+
+
+def _children_usage(backends):
+    """{"player"|"adb": (cpu_s, rss)} summed over the sessions' processes."""
+    totals = {"player": [0.0, 0], "adb": [0.0, 0]}
+    for backend in backends:
+        for kind, proc in (("adb", backend.adb_process), ("player", backend.player_process)):
+            usage = proc is not None and process_usage(proc)
+            if usage:
+                totals[kind][0] += usage[0]
+                totals[kind][1] += usage[1]
+    return totals
+
+
+def run_step(headset, n, args):
+    serials = headset.serials[:n]
+    backends = {s: ScreenRecordBackend() for s in serials}
+    counters = {s: StallCounter(args.stall_ms / 1000) for s in serials}
+    failed = []
+
+    def start(serial):
+        try:
+            backends[serial].start(serial, dict(OPTIONS, bitrate=int(args.mbps), window_title=serial))
+            backends[serial].relay.add_listener(counters[serial])
+        except Exception as e:
+            failed.append((serial, str(e)))
+
+    with concurrent.futures.ThreadPoolExecutor(PARALLEL) as pool:
+        list(pool.map(start, serials))
+    running = [backends[s] for s in serials if s not in dict(failed)]
+    time.sleep(args.warmup)
+
+    bytes0 = {id(b): b.relay.bytes_in for b in running}
+    cpu0, _, _ = _self_usage()
+    children0 = _children_usage(running)
+    for counter in counters.values():
+        counter.begin()
+    t0 = time.monotonic()
+    time.sleep(args.seconds)
+    wall = time.monotonic() - t0
+    cpu1, rss, threads = _self_usage()
+    children1 = _children_usage(running)
+    moved = sum(b.relay.bytes_in - bytes0[id(b)] for b in running)
+
+    streams = []
+    for serial in serials:
+        c = counters[serial]
+        streams.append({
+            "serial": serial,
+            "fps": c.frames / wall,
+            "stalls": c.stalls,
+            "max_gap_ms": 1000 * c.max_gap,
+        })
+
+    t0 = time.monotonic()
+    stopped = teardown.stop_all(backends)
+    stop_wall = time.monotonic() - t0
+
+    def pct(cpu):
+        return 100.0 * cpu / wall
+
+    return {
+        "devices": n,
+        "started": len(running),
+        "start_failures": failed,
+        "seconds": wall,
+        "app_cpu_pct": pct(cpu1 - cpu0),
+        "app_rss_mb": rss / 2**20,
+        "app_threads": threads,
+        "player_cpu_pct": pct(children1["player"][0] - children0["player"][0]),
+        "player_rss_mb": children1["player"][1] / 2**20,
+        "adb_sim_cpu_pct": pct(children1["adb"][0] - children0["adb"][0]),
+        "throughput_mbps": moved * 8 / wall / 1e6,
+        "stalled_streams": sum(1 for s in streams if s["stalls"]),
+        "min_fps": min((s["fps"] for s in streams), default=0.0),
+        "stop_ms": 1000 * stop_wall,
+        "stop_max_ms": 1000 * max((v for v in stopped.values() if v is not None), default=0.0),
+        "stop_pending": sum(1 for v in stopped.values() if v is None),
+        "streams": streams,
+    }
+
+
+def _version():
+    rev = None
+    with contextlib.suppress(Exception):
+        rev = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                             capture_output=True, text=True, timeout=5).stdout.strip() or None
+    return rev
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--devices", default="1,2,4,8,16,32")
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--warmup", type=float, default=2)
+    ap.add_argument("--mbps", type=float, default=8)
+    ap.add_argument("--fps", type=float, default=60)
+    ap.add_argument("--stall-ms", type=float, default=100)
+    ap.add_argument("--player", choices=("null", "fake"), default="null" if shutil.which("ffmpeg") else "fake")
+    ap.add_argument("--out", help="write results as JSON here")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    steps = [int(n) for n in args.devices.split(",")]
+    if not args.verbose:
+        get_reactor().remove_handler(print_record)  # children's stderr
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".h264") as tmp:
+        tmp.write(synth_stream(args.mbps, args.fps, 2))
+    results = []
+    try:
+        with FakeHeadset(tmp.name, devices=max(steps), fps=args.fps, player=args.player) as headset:
+            print(f"{'N':>3} {'app CPU':>8} {'app RSS':>8} {'threads':>7} {'player CPU':>10} "
+                  f"{'player RSS':>10} {'Mbps':>7} {'min fps':>7} {'stalled':>7} {'stop':>8}")
+            for n in steps:
+                out = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with out:
+                    r = run_step(headset, n, args)
+                results.append(r)
+                print(f"{n:>3} {r['app_cpu_pct']:>7.1f}% {r['app_rss_mb']:>6.0f}MB {r['app_threads']:>7} "
+                      f"{r['player_cpu_pct']:>9.1f}% {r['player_rss_mb']:>8.0f}MB {r['throughput_mbps']:>7.1f} "
+                      f"{r['min_fps']:>7.1f} {r['stalled_streams']:>3}/{r['started']} {r['stop_ms']:>6.0f}ms")
+                for serial, error in r["start_failures"]:
+                    print(f"    {serial} failed to start: {error}")
+    finally:
+        shell.close_all()
+        adbclient.get_client().close()
+        os.unlink(tmp.name)
+
+    if args.out:
+        report = {
+            "benchmark": "scaling",
+            "version": _version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "verbose")},
+            "results": results,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Thumbnail / trim time in a recorded segment: keyframe index vs none.
+
+Records a generated H.264 stream (1280x720, 30 fps, an IDR every
+--gop seconds like screenrecord's) into one segment with recorder.py, then
+for several points in it:
+
+    indexed    Segment.thumbnail(): mmap + index, decode one keyframe
+    ffmpeg -ss `ffmpeg -ss T -f h264 -i segment.h264 -frames:v 1`, what a raw
+               .h264 without an index allows (the demuxer reads from the
+               start to find T)
+
+and trims a 10 s clip both ways (Segment.trim vs `ffmpeg -ss -t -c copy`).
+
+    python benchmarks/bench_seek.py [--seconds 120] [--gop 10] [--points 5]
+
+Needs ffmpeg on PATH (or QSC_FFMPEG_PATH) with libx264.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mirror_backend import recorder  # noqa: E402
+from mirror_backend.h264 import AnnexBReader, NAL_IDR, NAL_SLICE, is_first_slice  # noqa: E402
+from mirror_backend.utils import get_ffmpeg_path  # noqa: E402
+
+FPS = 30
+
+
+def make_stream(path, seconds, gop):
+    subprocess.run([
+        get_ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate={FPS}", "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(int(gop * FPS)), "-b:v", "8M",
+        "-f", "h264", path,
+    ], check=True)
+
+
+def record(stream_path, directory):
+    """Feed the file through a SegmentRecorder, one frame per 1/FPS s."""
+    rec = recorder.SegmentRecorder(directory, "bench", max_bytes=1 << 40, max_seconds=1e9)
+    frame = -1
+    with open(stream_path, "rb", buffering=0) as f:
+        reader = AnnexBReader(f)
+        while True:
+            result = reader.read()
+            if result is None:
+                break
+            for t, nal in result[1]:
+                if (t == NAL_SLICE or t == NAL_IDR) and is_first_slice(nal):
+                    frame += 1
+                rec.on_nal(t, nal, 1000.0 + max(frame, 0) / FPS)
+        tail = reader.flush()
+        if tail is not None:
+            rec.on_nal(NAL_SLICE, tail, 1000.0 + frame / FPS)
+    rec.close(timeout=30)
+    return rec.paths[0]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--seconds", type=float, default=120)
+    ap.add_argument("--gop", type=float, default=10)
+    ap.add_argument("--points", type=int, default=5)
+    args = ap.parse_args()
+    ffmpeg = get_ffmpeg_path()
+    if not shutil.which(ffmpeg):
+        raise SystemExit("ffmpeg not found (PATH or QSC_FFMPEG_PATH)")
+
+    tmp = tempfile.mkdtemp(prefix="seek-bench-")
+    try:
+        source = os.path.join(tmp, "source.h264")
+        make_stream(source, args.seconds, args.gop)
+        t0 = time.perf_counter()
+        path = record(source, os.path.join(tmp, "rec"))
+        print(f"recorded {os.path.getsize(path) / 2**20:.1f} MB in {time.perf_counter() - t0:.2f} s")
+
+        seg = recorder.Segment(path)
+        print(f"{len(seg.offsets)} keyframes, index {os.path.getsize(recorder.index_path(path))} bytes")
+        thumb = os.path.join(tmp, "thumb.png")
+        points = [args.seconds * (i + 0.5) / args.points for i in range(args.points)]
+        print(f"{'at':>7} {'indexed':>9} {'ffmpeg -ss':>10}")
+        indexed, naive = [], []
+        for at in points:
+            indexed.append(timed(lambda: seg.thumbnail(at, thumb)))
+            naive.append(timed(lambda: subprocess.run(
+                [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{at:.3f}",
+                 "-f", "h264", "-i", path, "-frames:v", "1", "-vf", "scale=320:-2", thumb], check=True)))
+            print(f"{at:>6.1f}s {indexed[-1] * 1000:>7.0f}ms {naive[-1] * 1000:>8.0f}ms")
+        print(f"median   {statistics.median(indexed) * 1000:>7.0f}ms {statistics.median(naive) * 1000:>8.0f}ms")
+
+        clip = os.path.join(tmp, "clip.h264")
+        start = args.seconds / 2
+        t_index = timed(lambda: seg.trim(start, start + 10, clip))
+        t_ffmpeg = timed(lambda: subprocess.run(
+            [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-t", "10",
+             "-f", "h264", "-i", path, "-c", "copy", "-f", "h264", clip], check=True))
+        print(f"trim 10 s: indexed {t_index * 1000:.1f} ms, ffmpeg -c copy {t_ffmpeg * 1000:.0f} ms")
+        seg.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Time from ScreenRecordBackend.start() to the first decoded frame.
+
+Runs each backend configuration against a simulated headset
+(fake_headset.py: fake adb server + adb CLI + player, all local, headless)
+and reports p50/p95 of
+
+    first frame  start() called -> player has a complete IDR frame
+    start()      start() called -> start() returned
+
+    python benchmarks/bench_startup.py [--runs 10] [--configs relay-async,direct]
+        [--stream rec.h264] [--fps 60] [--screenrecord-delay 0.3]
+        [--shell-delay 0.01] [--displays 0,2 --display-failures 1]
+        [--player ffplay] [--warm] [--standby] [--verbose] [--trace startup.json]
+
+--stream replays a recorded H.264 file (e.g. `adb exec-out screenrecord
+--output-format=h264 - > rec.h264`); without it a synthetic stream is used.
+--display-failures makes that many screenrecord launches per run fail with
+INVALID_LAYER_STACK (needs two or more --displays, otherwise no --display-id
+is passed). --player ffplay uses the real ffplay (SDL_VIDEODRIVER=dummy) and
+counts its first status line as the first decoded frame; that needs a real
+recording. Every run starts cold (device info, shell sessions and the
+failure history dropped) unless --warm; warm runs skip a --display-id that
+failed before. --standby selects the device first (standby.py warm-up,
+finished before the clock starts), as the app does when a device is picked
+in the list; the numbers are then what a click on 接続 costs. --trace writes every run's startup trace (tracing.py) as
+Chrome trace-event JSON.
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_relay import synth_stream  # noqa: E402
+from fake_headset import FakeHeadset  # noqa: E402
+from mirror_backend import adbclient, devinfo, shell, standby, startfail, tracing  # noqa: E402
+from mirror_backend.logreactor import get_reactor  # noqa: E402
+from mirror_backend.playerstats import parse_status  # noqa: E402
+from mirror_backend.screenrecord import ScreenRecordBackend  # noqa: E402
+
+CONFIGS = {
+    "direct": {"relay": False, "rollover": False, "async_start": False},
+    "direct-async": {"relay": False, "rollover": False, "async_start": True},
+    "relay": {"relay": True, "rollover": False, "async_start": False},
+    "relay-async": {"relay": True, "rollover": False, "async_start": True},
+    # The app's defaults.
+    "rollover-async": {"relay": False, "rollover": True, "async_start": True},
+}
+BASE_OPTIONS = {
+    "bitrate": 20, "width": 1280, "height": 720, "mode": "window",
+    "correction": "v360", "fov_in": 150, "fov_out": 95, "roll": 0,
+    "crop_size": 640, "eye_cx": 320, "eye_cy": 360, "eye": "left",
+}
+FIRST_FRAME_TIMEOUT = 15.0
+
+
+class FirstFrameProbe:
+    """Raw log-reactor handler catching the player's first decoded frame.
+
+    Only lines from `serial`'s player count, and only after arm(): the fake
+    player's `first-frame` line (stamped with its own clock, so a line from
+    before arm() is recognised as stale) or, for ffplay, its first status
+    line with a clock. run_config() also waits for the previous run's
+    pipes to be drained before arming, so no leftover line can fire it.
+    """
+
+    def __init__(self, serial, fake_player=True):
+        self.serial = serial
+        self.fake_player = fake_player
+        self.since = None
+        self.at = None
+        self.event = threading.Event()
+
+    def arm(self, since):
+        self.at = None
+        self.event.clear()
+        self.since = since
+
+    def __call__(self, record):
+        if record.label != "Player" or record.source != self.serial:
+            return
+        if self.since is None or self.event.is_set():
+            return
+        if self.fake_player:
+            if not record.text.startswith("first-frame "):
+                return
+            at = float(record.text.split()[1])  # fake player's own clock
+            if at < self.since:
+                return
+        elif (parsed := parse_status(record.text)) and parsed[0] != "nan":
+            at = time.monotonic()  # ffplay: when its status line arrived
+        else:
+            return
+        self.at = at
+        self.event.set()
+
+
+def wait_drained(timeout=5.0):
+    """Wait until every pipe the last run handed to the log reactor has hit
+    EOF (all of its lines delivered)."""
+    deadline = time.monotonic() + timeout
+    while get_reactor().stream_count() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def run_config(headset, probe, serial, options, runs, failures, warm, verbose, use_standby=False):
+    first, returned, errors = [], [], 0
+    for _ in range(runs):
+        headset.reset(failures)
+        if not warm:
+            devinfo.invalidate_all()
+            startfail.forget(serial)
+            shell.close_all()
+            adbclient.get_client().close()
+        wait_drained()
+        backend = ScreenRecordBackend()
+        out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with out:
+            if use_standby:
+                backend.warm_standby(serial, dict(options))
+                standby.get(serial).ready.wait(10)
+            t0 = time.monotonic()
+            probe.arm(t0)
+            try:
+                backend.start(serial, dict(options))
+                returned.append(time.monotonic() - t0)
+                if probe.event.wait(FIRST_FRAME_TIMEOUT):
+                    first.append(probe.at - t0)
+                else:
+                    errors += 1
+            except Exception as e:
+                errors += 1
+                if verbose:
+                    print(f"start failed: {e}")
+            finally:
+                probe.arm(None)
+                backend.stop()
+    return first, returned, errors
+
+
+def percentiles(samples):
+    if not samples:
+        return "      -          -   "
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * len(samples))) - 1)]
+    return f"{statistics.median(samples) * 1000:7.0f} ms {p95 * 1000:7.0f} ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--configs", default=",".join(CONFIGS))
+    ap.add_argument("--stream", help="recorded Annex-B H.264 file to replay")
+    ap.add_argument("--fps", type=float, default=60)
+    ap.add_argument("--screenrecord-delay", type=float, default=0.3,
+                    help="seconds before screenrecord's first byte")
+    ap.add_argument("--shell-delay", type=float, default=0.0, help="added to every device shell command")
+    ap.add_argument("--wake-delay", type=float, default=0.1, help="`input keyevent WAKEUP` duration")
+    ap.add_argument("--displays", default="0")
+    ap.add_argument("--display-failures", type=int, default=0)
+    ap.add_argument("--player", choices=("fake", "ffplay"), default="fake")
+    ap.add_argument("--warm", action="store_true", help="keep device info / shell sessions / failure history between runs")
+    ap.add_argument("--standby", action="store_true", help="warm the device up before each start")
+    ap.add_argument("--verbose", action="store_true")
+    ap.add_argument("--trace", help="write the runs' startup traces here (Chrome trace JSON)")
+    args = ap.parse_args()
+
+    stream = args.stream
+    tmp = None
+    if stream is None:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".h264") as tmp:
+            tmp.write(synth_stream(8, args.fps, 2))
+        stream = tmp.name
+    if args.player == "ffplay":
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    headset = FakeHeadset(stream, fps=args.fps, screenrecord_delay=args.screenrecord_delay,
+                          shell_delay=args.shell_delay, wake_delay=args.wake_delay,
+                          displays=[int(d) for d in args.displays.split(",")],
+                          player="fake" if args.player == "fake" else None)
+    probe = FirstFrameProbe(headset.serial, fake_player=args.player == "fake")
+    get_reactor().add_handler(probe, raw=True)
+    try:
+        with headset:
+            print(f"{'config':<16} {'first frame p50':>15} {'p95':>10}   {'start() p50':>11} {'p95':>10}   failed")
+            for name in args.configs.split(","):
+                options = dict(BASE_OPTIONS, window_title=f"bench {name}", **CONFIGS[name])
+                first, returned, errors = run_config(headset, probe, headset.serial, options, args.runs,
+                                                     args.display_failures, args.warm, args.verbose,
+                                                     args.standby)
+                print(f"{name:<16} {percentiles(first)}   {percentiles(returned)}   {errors}/{args.runs}")
+    finally:
+        get_reactor().remove_handler(probe)
+        shell.close_all()
+        adbclient.get_client().close()
+        if tmp is not None:
+            os.unlink(tmp.name)
+    if args.trace:
+        print(f"wrote {tracing.dump(args.trace)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""A simulated headset for benchmarks: fake adb server, adb CLI and player.
+
+FakeHeadset starts the in-process fake adb server from tests/ with device
+shell commands running in a real /bin/sh whose PATH starts with stand-ins
+for the Quest's tools (cmd display list, pidof, killall, input, am, svc,
+wm, getprop, ip), and points the app at a fake `adb` executable
+(QSC_ADB_PATH) and, optionally, a stand-in player (QSC_PLAYER_PATH). Several
+devices can be simulated at once (FAKE0001, FAKE0002, ...); stand-ins see
+which one they run on in ANDROID_SERIAL.
+
+The fake `adb -s SERIAL exec-out screenrecord ...` behaves like the device
+side of a capture: it shows up in `pidof screenrecord` (and goes away on
+`killall screenrecord`), waits `screenrecord_delay` before the first byte,
+then replays an H.264 file frame by frame at `fps`, looping until
+`duration` (screenrecord's 180 s limit). With `display_failures` set, that
+many launches with --display-id fail the way dump.h264 shows:
+
+    ERROR: INVALID_LAYER_STACK, please check your display state.
+
+The fake player reads Annex-B from stdin and, once the first complete IDR
+frame has arrived, writes `first-frame <time.monotonic()>` to stderr; after
+that it prints an ffplay-style status line every 100 ms and drains stdin
+until EOF. player="null" uses `ffmpeg -f h264 -i - -f null -` instead: a
+real decoder without a window (ffplay's arguments are ignored).
+player="ffmpeg" runs ffplay's own arguments through ffmpeg into a null
+sink: the player's decode and -vf filters, everything but the window.
+Linux/macOS only (the stand-ins are sh scripts).
+
+    python benchmarks/fake_headset.py adb ...     # used via QSC_ADB_PATH
+    python benchmarks/fake_headset.py player ...  # used via QSC_PLAYER_PATH
+"""
+import json
+import os
+import re
+import shutil
+import signal
+import stat
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INVALID_LAYER_STACK = b"ERROR: INVALID_LAYER_STACK, please check your display state.\n"
+
+_STUBS = {
+    "pidof": """
+[ "$1" = screenrecord ] || exit 1
+pid=$(cat "$QSC_FAKE_DIR/screenrecord-$ANDROID_SERIAL.pid" 2>/dev/null) || exit 1
+kill -0 "$pid" 2>/dev/null || exit 1
+echo "$pid"
+""",
+    "killall": """
+[ "$1" = screenrecord ] || exit 1
+pid=$(cat "$QSC_FAKE_DIR/screenrecord-$ANDROID_SERIAL.pid" 2>/dev/null) || exit 1
+kill "$pid" 2>/dev/null
+""",
+    "cmd": """
+[ "$1 $2" = "display list" ] || exit 0
+echo "Displays:"
+for id in $QSC_FAKE_DISPLAYS; do
+  echo "  Display $id: DisplayInfo{\\"Built-in Screen\\", displayId $id, type INTERNAL}"
+done
+""",
+    "getprop": """
+case "$1" in
+  ro.product.model) echo Quest_3 ;;
+  ro.build.display.id) echo SQ3A.220605.009.A1 ;;
+  ro.build.version.sdk) echo 32 ;;
+esac
+""",
+    "wm": """
+[ "$1" = size ] && echo "Physical size: 4128x2208"
+exit 0
+""",
+    "ip": """
+echo "192.168.0.0/24 dev wlan0 proto kernel scope link src 192.168.0.42"
+""",
+    "input": 'sleep "$QSC_FAKE_WAKE_DELAY"\n',
+    "svc": "sleep 1\n",  # `svc power stayon` is slow on Quest
+    "am": "exit 0\n",
+}
+
+
+def _write_script(path: str, body: str) -> None:
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\n" + body.lstrip("\n"))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def split_frames(data: bytes) -> list:
+    """Annex-B bytes -> access units (parameter sets/SEI are kept with the
+    slice that follows them; one slice per frame, as screenrecord emits)."""
+    starts = [m.start() for m in re.finditer(rb"\x00\x00\x01", data)]
+    starts = [s - 1 if s and data[s - 1] == 0 else s for s in starts]
+    frames, pending = [], b""
+    for i, start in enumerate(starts):
+        nal = data[start:starts[i + 1] if i + 1 < len(starts) else len(data)]
+        header = nal[3] if nal[2] == 1 else nal[4]
+        pending += nal
+        if header & 0x1F in (1, 5):
+            frames.append(pending)
+            pending = b""
+    if pending:
+        frames.append(pending)
+    return frames
+
+
+class FakeHeadset:
+    """Context manager: a simulated device reachable the way the app reaches
+    a real one. Sets ANDROID_ADB_SERVER_PORT / QSC_ADB_PATH (and
+    QSC_PLAYER_PATH unless player is None) for the current process.
+
+    player: "fake" (first-frame probe), "null" (ffmpeg null sink), "ffmpeg"
+    (ffplay's command run by ffmpeg, filters included) or None (the real
+    ffplay).
+    """
+
+    def __init__(self, stream: str, devices: int = 1, fps: float = 60.0,
+                 displays=(0,), screenrecord_delay: float = 0.3, shell_delay: float = 0.0,
+                 wake_delay: float = 0.1, display_failures: int = 0, duration: float = 180.0,
+                 player: str = "fake"):
+        self.serials = [f"FAKE{i + 1:04d}" for i in range(devices)]
+        self.serial = self.serials[0]
+        self.config = {
+            "stream": os.path.abspath(stream),
+            "fps": fps,
+            "screenrecord_delay": screenrecord_delay,
+            "duration": duration,
+        }
+        self.displays = displays
+        self.shell_delay = shell_delay
+        self.wake_delay = wake_delay
+        self.display_failures = display_failures
+        self.player = player
+        self.dir = None
+        self.server = None
+        self._saved_env = {}
+
+    def reset(self, display_failures: int = None) -> None:
+        """Re-arm the injected failures (e.g. before each benchmark run)."""
+        if display_failures is not None:
+            self.display_failures = display_failures
+        for serial in self.serials:
+            with open(os.path.join(self.dir, f"display_failures-{serial}"), "w") as f:
+                f.write(str(self.display_failures))
+
+    def _setenv(self, name, value) -> None:
+        self._saved_env.setdefault(name, os.environ.get(name))
+        os.environ[name] = value
+
+    def __enter__(self):
+        sys.path.insert(0, os.path.join(ROOT, "tests"))
+        from fake_adb_server import FakeAdbServer
+
+        self.dir = tempfile.mkdtemp(prefix="fake-headset-")
+        bin_dir = os.path.join(self.dir, "bin")
+        os.mkdir(bin_dir)
+        for name, body in _STUBS.items():
+            _write_script(os.path.join(bin_dir, name), body)
+        with open(os.path.join(self.dir, "config.json"), "w") as f:
+            json.dump(self.config, f)
+        self.reset()
+
+        me = os.path.abspath(__file__)
+        _write_script(os.path.join(self.dir, "adb"), f'exec "{sys.executable}" "{me}" adb "$@"\n')
+        if self.player == "null":
+            _write_script(os.path.join(self.dir, "player"),
+                          "exec ffmpeg -hide_banner -nostats -loglevel error -f h264 -i - -f null -\n")
+        elif self.player == "ffmpeg":
+            _write_script(os.path.join(self.dir, "player"), f'exec "{sys.executable}" "{me}" ffplay "$@"\n')
+        else:
+            _write_script(os.path.join(self.dir, "player"), f'exec "{sys.executable}" "{me}" player "$@"\n')
+
+        device_env = dict(os.environ)
+        device_env.update({
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "QSC_FAKE_DIR": self.dir,
+            "QSC_FAKE_DISPLAYS": " ".join(str(d) for d in self.displays),
+            "QSC_FAKE_WAKE_DELAY": str(self.wake_delay),
+        })
+        self.server = FakeAdbServer(devices={serial: "device" for serial in self.serials}, env=device_env,
+                                    shell_delay=self.shell_delay).__enter__()
+        self._setenv("ANDROID_ADB_SERVER_PORT", str(self.server.port))
+        self._setenv("QSC_ADB_PATH", os.path.join(self.dir, "adb"))
+        self._setenv("QSC_FAKE_DIR", self.dir)
+        if self.player is not None:
+            self._setenv("QSC_PLAYER_PATH", os.path.join(self.dir, "player"))
+        return self
+
+    def __exit__(self, *exc):
+        self.server.__exit__(*exc)
+        for name, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+# --- fake adb CLI ---
+
+def _screenrecord(state_dir: str, serial: str, args: list) -> int:
+    with open(os.path.join(state_dir, "config.json")) as f:
+        config = json.load(f)
+    out = sys.stdout.buffer
+    if "--display-id" in args:
+        path = os.path.join(state_dir, f"display_failures-{serial}")
+        with open(path) as f:
+            left = int(f.read() or 0)
+        if left > 0:
+            with open(path, "w") as f:
+                f.write(str(left - 1))
+            time.sleep(0.05)
+            out.write(INVALID_LAYER_STACK)
+            out.flush()
+            return 1
+
+    pid_path = os.path.join(state_dir, f"screenrecord-{serial}.pid")
+    with open(pid_path, "w") as f:
+        f.write(str(os.getpid()))
+
+    def finish(*_):
+        try:
+            os.unlink(pid_path)
+        except OSError:
+            pass
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, finish)
+    with open(config["stream"], "rb") as f:
+        frames = split_frames(f.read())
+    time.sleep(config["screenrecord_delay"])
+    tick = 1.0 / config["fps"]
+    started = next_at = time.monotonic()
+    try:
+        while time.monotonic() - started < config["duration"]:
+            for frame in frames:
+                out.write(frame)
+                out.flush()
+                next_at += tick
+                time.sleep(max(0.0, next_at - time.monotonic()))
+    except (BrokenPipeError, OSError):
+        pass
+    finish()
+
+
+def adb_main(argv: list) -> int:
+    state_dir = os.environ["QSC_FAKE_DIR"]
+    serial = os.environ.get("ANDROID_SERIAL", "")
+    if argv[:1] == ["-s"]:
+        serial, argv = argv[1], argv[2:]
+    if not argv:
+        return 1
+    command, args = argv[0], argv[1:]
+    if command == "get-state":
+        print("device")
+        return 0
+    if command in ("start-server", "kill-server", "reconnect"):
+        return 0
+    if command == "exec-out" and args[:1] == ["screenrecord"]:
+        return _screenrecord(state_dir, serial, args[1:])
+    if command in ("shell", "exec-out"):
+        # Through the fake server, like adb itself would.
+        sys.path.insert(0, ROOT)
+        from mirror_backend.adbclient import AdbClient
+        args = [a for a in args if a not in ("-T", "-t", "-x")]
+        if not args:
+            return 1  # interactive shell: the app uses the socket path
+        result = AdbClient().shell(serial, " ".join(args))
+        sys.stdout.write(result.stdout if isinstance(result.stdout, str) else result.stdout.decode())
+        return result.returncode
+    print(f"fake adb: unsupported command {command}", file=sys.stderr)
+    return 1
+
+
+# --- fake player ---
+
+def player_main(argv: list) -> int:
+    stdin = sys.stdin.buffer
+    err = sys.stderr
+    buf = b""
+    decoded = False
+    while not decoded:
+        chunk = stdin.read1(65536)
+        if not chunk:
+            return 0
+        buf += chunk
+        idr = re.search(rb"\x00\x00\x01[\x25\x45\x65]", buf)
+        # Complete once the next NAL after the IDR has started.
+        if idr and buf.find(b"\x00\x00\x01", idr.end()) != -1:
+            decoded = True
+    err.write(f"first-frame {time.monotonic():.6f}\n")
+    err.flush()
+    started = time.monotonic()
+    last_status = 0.0
+    while stdin.read1(65536):
+        now = time.monotonic()
+        if now - last_status >= 0.1:
+            last_status = now
+            err.write(f"{now - started:7.2f} M-V:  0.000 fd=   0 aq=    0KB vq=    0KB sq=    0B \r")
+            err.flush()
+    return 0
+
+
+# ffplay options with no ffmpeg equivalent (a window's), and whether they
+# take a value.
+_FFPLAY_ONLY = {"-framedrop": False, "-sync": True, "-window_title": True, "-fs": False,
+                "-noborder": False, "-alwaysontop": False, "-x": True, "-y": True,
+                "-left": True, "-top": True}
+
+
+def ffplay_args_to_ffmpeg(argv: list) -> list:
+    args = ["ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error"]
+    i = 0
+    while i < len(argv):
+        if argv[i] in _FFPLAY_ONLY:
+            i += 2 if _FFPLAY_ONLY[argv[i]] else 1
+            continue
+        args.append(argv[i])
+        i += 1
+    return args + ["-f", "null", "-"]
+
+
+def ffplay_main(argv: list) -> int:
+    args = ffplay_args_to_ffmpeg(argv)
+    os.execvp(args[0], args)  # same PID: the caller measures ffmpeg itself
+
+
+if __name__ == "__main__":
+    role, rest = sys.argv[1], sys.argv[2:]
+    try:
+        sys.exit({"adb": adb_main, "player": player_main, "ffplay": ffplay_main}[role](rest))
+    except KeyboardInterrupt:
+        sys.exit(130)
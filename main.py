@@ -6,10 +6,25 @@ import sys
 import configparser
 import re
 import atexit
+import threading
 from mirror_backend.scrcpy import ScrcpyBackend
 from mirror_backend.screenrecord import ScreenRecordBackend
 from mirror_backend.casting import CastingBackend, get_casting_exe
+from mirror_backend import virtual_camera
+from mirror_backend.virtual_camera import VirtualCameraBackend
+from mirror_backend import mosaic
+from mirror_backend import recorder
+from mirror_backend import replay
 from mirror_backend.utils import get_adb_path, get_scrcpy_path, get_base_path, get_user_config_path, NO_WINDOW
+from mirror_backend import adbclient
+from mirror_backend import shell as device_shell
+from mirror_backend import devinfo
+from mirror_backend import standby
+from mirror_backend import teardown
+from mirror_backend import tracing
+from mirror_backend.devicewatch import DeviceWatcher
+from mirror_backend.supervisor import get_supervisor
+from mirror_backend.exporter import MetricsExporter, DEFAULT_PORT as EXPORTER_PORT
 
 
 
@@ -42,24 +57,34 @@ default_size = config.get('scrcpy', 'size', fallback=1024)
 def get_connected_devices():
     devices_info = {}
     try:
-        result = subprocess.run([adb_path, "devices", "-l"], capture_output=True, text=True, timeout=10, creationflags=NO_WINDOW)
-    except (subprocess.TimeoutExpired, Exception) as e:
-        print(f"adb devices failed: {e}")
-        return devices_info
-    if result.returncode == 0:
-        for match in re.finditer(r'(\S+)\s+device .+ model:(\S+)\s+', result.stdout):
+        # Server socket first; the subprocess fallback also starts the server.
+        output = adbclient.get_client().devices(long=True)
+    except Exception:
+        try:
+            result = subprocess.run([adb_path, "devices", "-l"], capture_output=True, text=True, timeout=10, creationflags=NO_WINDOW)
+        except (subprocess.TimeoutExpired, Exception) as e:
+            print(f"adb devices failed: {e}")
+            return devices_info
+        output = result.stdout if result.returncode == 0 else ""
+    if output:
+        for match in re.finditer(r'(\S+)\s+device .+ model:(\S+)\s+', output):
             serial_number = match.group(1)
             device_name = match.group(2)
             devices_info[serial_number] = device_name
+        # A new transport id means the device reconnected: its cached
+        # metadata (devinfo) may be stale.
+        for match in re.finditer(r'^(\S+)\s.*transport_id:(\d+)', output, re.MULTILINE):
+            devinfo.note_transport(match.group(1), match.group(2))
+    devinfo.forget_missing(devices_info)
     return devices_info
 
 
 def get_real_model_name(serial):
     try:
-        # Get ro.product.model
-        result = subprocess.run([adb_path, "-s", serial, "shell", "getprop", "ro.product.model"], capture_output=True, text=True, timeout=5, creationflags=NO_WINDOW)
-        if result.returncode == 0:
-            model = result.stdout.strip()
+        # ro.product.model, from the per-connection device info cache
+        info = devinfo.get_info(serial)
+        if info is not None:
+            model = info.model
             # Map code names or explicit names
             if model in ["Quest 3", "Eureka"]:
                 return "Quest 3"
@@ -96,6 +121,7 @@ def main(page: ft.Page):
     page.scroll = ft.ScrollMode.AUTO
 
     casting_devices = {}
+    mosaic_view = None
     app_exiting = False
 
 
@@ -134,6 +160,77 @@ def main(page: ft.Page):
         models.update()
 
         connect_btn.update()
+        page.run_thread(warm_selected)
+
+    # Warm standby (mirror_backend/standby.py): selecting a ScreenRecord
+    # device already does the slow part of starting it; released again after
+    # [standby] idle seconds if 接続 isn't clicked.
+    standby_enabled = config.getboolean('standby', 'enabled', fallback=True)
+    standby_idle = config.getfloat('standby', 'idle', fallback=standby.DEFAULT_IDLE)
+
+    def in_mosaic(serial):
+        # Its capture belongs to the mosaic's broker: a private start (or a
+        # standby's prep, `killall screenrecord`) would kill that tile.
+        view = mosaic_view
+        return view is not None and view.is_running() and serial in view.serials()
+
+    def warm_selected():
+        if not standby_enabled or app_exiting:
+            return
+        device_name = str(device_dd.value)
+        serial = get_serial_number(device_name)
+        if (serial is None or backend_dd.value != 'ScreenRecord' or serial in casting_devices
+                or in_mosaic(serial)):
+            standby.release_all()
+            return
+        try:
+            ScreenRecordBackend().warm_standby(serial, build_options(device_name, 'ScreenRecord'), standby_idle)
+        except Exception as e:
+            print(f"Standby warm-up not started: {e}")
+
+    def _option_serial(option):
+        m = re.search(r'\((.*?)\)', option.text)
+        return m.group(1) if m else None
+
+    def on_devices_changed(changes):
+        """Apply track-devices changes to the dropdown row by row."""
+        with device_list_lock:
+            selected = next((_option_serial(o) for o in device_dd.options if o.text == device_dd.value), None)
+            for kind, serial, row in changes:
+                print(f"[{time.strftime('%H:%M:%S')}] Device {kind}: {serial} {row['state']}")
+                existing = next((o for o in device_dd.options if _option_serial(o) == serial), None)
+                show = kind != "removed" and row['state'] == 'device' and row['model']
+                if show and existing is None:
+                    # Drop the "読込中……" placeholder once real rows arrive.
+                    device_dd.options = [o for o in device_dd.options if _option_serial(o)]
+                    device_dd.options.append(ft.dropdown.Option(text=f"{row['model']} ({serial})"))
+                elif not show and existing is not None:
+                    device_dd.options.remove(existing)
+            reselected = False
+            if selected is None or not any(_option_serial(o) == selected for o in device_dd.options):
+                device_dd.value = device_dd.options[0].text if device_dd.options else None
+                reselected = bool(device_dd.value)
+            device_dd.update()
+        # Outside the lock: it queries the device.
+        if reselected:
+            on_device_change()
+
+    device_list_lock = threading.Lock()
+    supervisor = get_supervisor()
+    device_watcher = DeviceWatcher(on_change=on_devices_changed)
+
+    # Optional Prometheus endpoint for session health (exporter.py). It
+    # renders from its own refresh thread; a scrape never reaches the UI.
+    exporter = None
+    if config.getboolean('exporter', 'enabled', fallback=False):
+        try:
+            exporter = MetricsExporter(lambda: dict(casting_devices),
+                                       port=config.getint('exporter', 'port', fallback=EXPORTER_PORT))
+            exporter.start()
+            print(f"Metrics exporter on http://127.0.0.1:{exporter.port}/metrics")
+        except (OSError, ValueError) as e:
+            print(f"Metrics exporter disabled: {e}")
+            exporter = None
 
     def load_device(e=None):
         connected_devices = get_connected_devices()
@@ -145,7 +242,8 @@ def main(page: ft.Page):
             for serial, name 
             in connected_devices.items()
             ]
-        device_dd.options = options
+        with device_list_lock:
+            device_dd.options = options
 
         if len(device_dd.options) > 0:
             device_dd.value = device_dd.options[0].text
@@ -161,8 +259,7 @@ def main(page: ft.Page):
             return
         action = "com.oculus.vrpowermanager.prox_close" if not enabled else "com.oculus.vrpowermanager.automation_disable"
         try:
-            subprocess.run([adb_path, "-s", serial, "shell", "am", "broadcast", "-a", action],
-                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5, check=False, creationflags=NO_WINDOW)
+            device_shell.run(serial, ["am", "broadcast", "-a", action], timeout=5)
         except Exception as e:
             print(f"proximity toggle failed for {serial}: {e}")
 
@@ -186,12 +283,13 @@ def main(page: ft.Page):
 
     def get_ip_address(serial_number):
         try:
-            result = subprocess.run([adb_path, "-s", serial_number, "shell", "ip", "route"], capture_output=True, text=True, timeout=5, creationflags=NO_WINDOW)
-            if result.returncode == 0:
-                output = result.stdout
-                ip_match = re.search(r'src (\d+\.\d+\.\d+\.\d+)', output)
-                if ip_match:
-                    return ip_match.group(1)
+            info = devinfo.get_info(serial_number)
+            if info is not None and not info.ip:
+                # Wi-Fi may have come up since the info was cached.
+                info = devinfo.get_info(serial_number, refresh=True)
+            if info is not None:
+                if info.ip:
+                    return info.ip
                 else:
                     print("IPアドレスが見つかりません")
                     return None
@@ -212,17 +310,40 @@ def main(page: ft.Page):
             subprocess.run([adb_path, 'start-server'], timeout=10, check=False, creationflags=NO_WINDOW)
         except Exception as e:
             print(f"adb reset failed: {e}")
+        # Pre-connected sockets and device shells belonged to the old server.
+        adbclient.get_client().close()
+        device_shell.close_all()
+        devinfo.invalidate_all()
 
         load_device()
 
     def on_app_exit():
         nonlocal app_exiting
         app_exiting = True
+        device_watcher.stop()
+        supervisor.stop()
+        standby.release_all()
+        if exporter is not None:
+            exporter.stop()
+        if mosaic_view is not None:
+            mosaic_view.stop()
         print(f"[{time.strftime('%H:%M:%S')}] App closing: stopping all backends...")
-        # Only terminate processes, do NOT update UI (reset_adb)
-        for device in casting_devices.values():
-            if device['backend'].is_running():
-                device['backend'].stop()
+        # Only terminate processes, do NOT update UI (reset_adb). All
+        # sessions in parallel, bounded by [teardown] deadline seconds.
+        teardown.stop_all(
+            {serial: device['backend'] for serial, device in casting_devices.items()
+             if device['backend'].is_running()},
+            config.getfloat('teardown', 'deadline', fallback=teardown.STOP_DEADLINE),
+        )
+        # Startup traces of this run's sessions (Chrome trace JSON, open in
+        # chrome://tracing or ui.perfetto.dev); relative to config.ini's dir.
+        trace_path = config.get('tracing', 'path', fallback='')
+        if trace_path:
+            try:
+                path = tracing.dump(os.path.join(os.path.dirname(get_user_config_path()), trace_path))
+                print(f"Startup traces written to {path}")
+            except OSError as e:
+                print(f"Could not write startup traces: {e}")
 
     atexit.register(on_app_exit)
 
@@ -244,14 +365,12 @@ def main(page: ft.Page):
         page.window.on_event = on_window_event
 
     # プロセスを監視する (Backend wrapper)
-    def monitor_backend(serial_number, backend, connect_btn):
-        # Poll until stopped
-        print(f"[{time.strftime('%H:%M:%S')}] Monitor thread started for {serial_number}")
-        while backend.is_running():
-            time.sleep(1)
-        
+    # One supervisor for all sessions: it waits on the backends' processes
+    # and calls monitor_backend as soon as one stops (see supervisor.py).
+    def monitor_backend(serial_number, backend):
         print(f"[{time.strftime('%H:%M:%S')}] Monitor: backend stopped for {serial_number}")
-        if serial_number in casting_devices:
+        entry = casting_devices.get(serial_number)
+        if entry is not None and entry['backend'] is backend:
             casting_devices.pop(serial_number, None)
             if not app_exiting:
                 # Restore the proximity sensor on the device that actually
@@ -283,6 +402,87 @@ def main(page: ft.Page):
         time.sleep(2)
         load_device()
 
+    def build_options(device_name, backend_type):
+        """Start options for the current UI settings (also used to warm up
+        the selected device, so both see the same player command)."""
+        options = {
+            'bitrate': int(bitrate.value) if bitrate.value else 20,
+            'size': int(mirror_size.value) if mirror_size.value else 1024,
+            'window_title': device_name,
+            'video': is_cast_video.value,
+            'audio': is_cast_audio.value,
+            'audio_source': 'mic' if audiosource.value == "マイク" else None,
+            'model': models.value,
+            # Used by both ScrcpyBackend (crop selection) and ScreenRecordBackend.
+            'eye': eye_dd.value,
+        }
+        if backend_type in ('Scrcpy', 'Casting (MQDH)'):
+            return options
+        filter_section = f'Filters.{get_model_from_name(device_name)}' if f'Filters.{get_model_from_name(device_name)}' in config else 'Filters.Default'
+        # _cfg_get (defined below) tolerates a missing section/key --
+        # important because a packaged build can end up without
+        # config.ini (e.g. if it wasn't bundled), in which case
+        # `config[filter_section]` would raise KeyError and abort
+        # mirroring with a bare "エラー" on the connect button.
+        def _cf(key, default):
+            return _cfg_get(filter_section, key, default)
+        options.update({
+            'width': 1280,
+            'height': 720,
+            'mode': 'window',
+            # v360 fisheye->flat correction (see screenrecord.py)
+            'correction': 'v360',
+            # v360 sampling ('near' is much cheaper per frame), or ffmpeg
+            # remap with maps cached per calibration (mirror_backend/remap.py)
+            'interp': config.get('screenrecord', 'interp', fallback=''),
+            'remap': config.getboolean('screenrecord', 'remap', fallback=False),
+            'fov_in': _cf('fov_in', 150),
+            'fov_out': _cf('fov_out', 95),
+            'roll': _cf('roll', 0),
+            # per-device fisheye geometry (centered square crop)
+            'crop_size': _cf('crop_size', 640),
+            'eye_cx': _cf('eye_cx', 320),
+            'eye_cy': _cf('eye_cy', 360),
+            # legacy lens-correction params (used only if correction=='lens')
+            'rotation': _cf('rotation', 0),
+            'k1': _cf('k1', 0.0),
+            'k2': _cf('k2', 0.0),
+            # in-process adb->player relay (see mirror_backend/relay.py)
+            'relay': config.getboolean('screenrecord', 'relay', fallback=False),
+            # splice a fresh screenrecord in before its 180 s limit
+            'rollover': config.getboolean('screenrecord', 'rollover', fallback=True),
+            # play from the device's shared capture (mirror_backend/broker.py)
+            'shared': config.getboolean('screenrecord', 'shared', fallback=False),
+            # overlap independent start steps, log a per-phase trace
+            'async_start': config.getboolean('screenrecord', 'async_start', fallback=True),
+        })
+        # The last [replay] seconds kept in memory for リプレイ保存
+        # (mirror_backend/replay.py); 0 = off. Like recording, this puts the
+        # session on the relay.
+        options.update({
+            'replay_seconds': config.getfloat('replay', 'seconds', fallback=0.0),
+            'replay_bytes': config.getint('replay', 'max_mb', fallback=replay.DEFAULT_BYTES >> 20) << 20,
+        })
+        # Indexed recording segments (mirror_backend/recorder.py); the
+        # directory is relative to config.ini's, empty = off.
+        record_dir = config.get('recording', 'dir', fallback='')
+        if record_dir:
+            options.update({
+                'record_dir': os.path.join(os.path.dirname(get_user_config_path()), record_dir),
+                'record_segment_bytes': config.getint('recording', 'segment_mb', fallback=recorder.DEFAULT_SEGMENT_BYTES >> 20) << 20,
+                'record_segment_seconds': config.getfloat('recording', 'segment_seconds', fallback=recorder.DEFAULT_SEGMENT_SECONDS),
+            })
+        if backend_type == 'Virtual Camera':
+            # mirror_backend/virtual_camera.py (capture shared via broker.py)
+            options.update({
+                'vcam_width': config.getint('virtual_camera', 'width', fallback=virtual_camera.DEFAULT_SIZE[0]),
+                'vcam_height': config.getint('virtual_camera', 'height', fallback=virtual_camera.DEFAULT_SIZE[1]),
+                'vcam_fps': config.getfloat('virtual_camera', 'fps', fallback=virtual_camera.DEFAULT_FPS),
+                'vcam_device': config.get('virtual_camera', 'device', fallback=''),
+                'vcam_sink': config.get('virtual_camera', 'sink', fallback='pyvirtualcam'),
+            })
+        return options
+
     def toggle_mirroring(e):
         nonlocal casting_devices
 
@@ -298,6 +498,7 @@ def main(page: ft.Page):
         # Check if already running
         if serial_number in casting_devices and casting_devices[serial_number]['backend'].is_running():
              print("プロセスを停止")
+             supervisor.unwatch(serial_number)
              try:
                  casting_devices[serial_number]['backend'].stop()
              except Exception:
@@ -316,63 +517,32 @@ def main(page: ft.Page):
         print(f'Starting mirror for {serial_number}')
         
         backend_type = backend_dd.value
-        options = {
-            'bitrate': int(bitrate.value) if bitrate.value else 20,
-            'size': int(mirror_size.value) if mirror_size.value else 1024,
-            'window_title': device_name,
-            'video': is_cast_video.value,
-            'audio': is_cast_audio.value,
-            'audio_source': 'mic' if audiosource.value == "マイク" else None,
-            'model': models.value,
-            # Used by both ScrcpyBackend (crop selection) and ScreenRecordBackend.
-            'eye': eye_dd.value,
-        }
-        
         try:
+            options = build_options(device_name, backend_type)
+            if backend_type == 'ScreenRecord' and in_mosaic(serial_number):
+                # Play from the tile's broker instead of a second capture.
+                options['shared'] = True
             if backend_type == 'Scrcpy':
                 backend = ScrcpyBackend()
             elif backend_type == 'Casting (MQDH)':
                 backend = CastingBackend()
+            elif backend_type == 'Virtual Camera':
+                backend = VirtualCameraBackend()
             else: # ScreenRecord
                 backend = ScreenRecordBackend()
-                filter_section = f'Filters.{get_model_from_name(device_name)}' if f'Filters.{get_model_from_name(device_name)}' in config else 'Filters.Default'
-                # _cfg_get (defined below) tolerates a missing section/key --
-                # important because a packaged build can end up without
-                # config.ini (e.g. if it wasn't bundled), in which case
-                # `config[filter_section]` would raise KeyError and abort
-                # mirroring with a bare "エラー" on the connect button.
-                def _cf(key, default):
-                    return _cfg_get(filter_section, key, default)
-                options.update({
-                    'width': 1280,
-                    'height': 720,
-                    'mode': 'window',
-                    # v360 fisheye->flat correction (see screenrecord.py)
-                    'correction': 'v360',
-                    'fov_in': _cf('fov_in', 150),
-                    'fov_out': _cf('fov_out', 95),
-                    'roll': _cf('roll', 0),
-                    # per-device fisheye geometry (centered square crop)
-                    'crop_size': _cf('crop_size', 640),
-                    'eye_cx': _cf('eye_cx', 320),
-                    'eye_cy': _cf('eye_cy', 360),
-                    # legacy lens-correction params (used only if correction=='lens')
-                    'rotation': _cf('rotation', 0),
-                    'k1': _cf('k1', 0.0),
-                    'k2': _cf('k2', 0.0),
-                })
             
+            started_at = time.monotonic()
             backend.start(serial_number, options)
-            casting_devices[serial_number] = {'backend': backend, 'connect': True}
+            casting_devices[serial_number] = {
+                'backend': backend,
+                'connect': True,
+                'started_at': started_at,
+                'start_latency': time.monotonic() - started_at,
+            }
             
             update_connect_btn(icon=ft.Icons.STOP, text="切断")
 
-            # Start monitor via page.run_thread (NOT a raw threading.Thread):
-            # Flet binds the page to a context var per run_thread call, and
-            # page.update() only reaches the client when that context is set.
-            # A raw thread's update() calls are silently dropped, which is why
-            # the connect button never reverted after the window was closed.
-            page.run_thread(monitor_backend, serial_number, backend, connect_btn)
+            supervisor.watch(serial_number, backend, monitor_backend)
 
         except Exception as ex:
             import traceback
@@ -380,6 +550,69 @@ def main(page: ft.Page):
             print(f"Error starting mirror: {ex}")
             update_connect_btn(text="エラー")
     
+    def mosaic_closed(view):
+        """The mosaic window was closed (the view has stopped itself)."""
+        nonlocal mosaic_view
+        if mosaic_view is not view:
+            return  # already replaced or stopped from the button
+        mosaic_view = None
+        mosaic_btn.content = "モザイク"
+        page.update()
+
+    def toggle_mosaic(e):
+        """All listed devices that aren't mirroring already, in one grid
+        window (mirror_backend/mosaic.py); again to close it."""
+        nonlocal mosaic_view
+        if mosaic_view is not None and mosaic_view.is_running():
+            mosaic_view.stop()
+            mosaic_view = None
+            mosaic_btn.content = "モザイク"
+            page.update()
+            return
+        with device_list_lock:
+            names = [o.text for o in device_dd.options if _option_serial(o)]
+        devices = {}
+        for name in names:
+            serial = get_serial_number(name)
+            if serial and serial not in casting_devices:
+                devices[serial] = build_options(name, 'ScreenRecord')
+        if not devices:
+            return
+        standby.release_all()
+        view = mosaic_view = mosaic.MosaicView(
+            size=(config.getint('mosaic', 'width', fallback=mosaic.DEFAULT_SIZE[0]),
+                  config.getint('mosaic', 'height', fallback=mosaic.DEFAULT_SIZE[1])),
+            fps=config.getfloat('mosaic', 'fps', fallback=mosaic.DEFAULT_FPS),
+            sink=config.get('mosaic', 'sink', fallback='window'),
+            on_close=mosaic_closed,
+        )
+        try:
+            # Already set: in_mosaic() must hold while the tiles start.
+            view.start(devices)
+        except Exception as ex:
+            print(f"Error starting mosaic: {ex}")
+            view.stop()
+            mosaic_view = None
+            return
+        mosaic_btn.content = "モザイク終了"
+        page.update()
+
+    def save_replay(e):
+        """The selected device's last [replay] seconds to a file, without
+        touching the running mirror."""
+        serial = get_serial_number(str(device_dd.value))
+        if serial is None:
+            return
+        directory = os.path.join(os.path.dirname(get_user_config_path()),
+                                 config.get('replay', 'dir', fallback='replays'))
+        try:
+            saved = replay.save(serial, directory)
+        except (ValueError, OSError) as ex:
+            print(f"[{time.strftime('%H:%M:%S')}] Replay not saved: {ex}")
+            return
+        print(f"[{time.strftime('%H:%M:%S')}] Replay saved: {saved['path']} ({saved['seconds']:.1f} s, "
+              f"{saved['bytes'] / 2**20:.1f} MB in {saved['save_ms']:.0f} ms)")
+
     # Calibration UI (v360 fisheye->flat correction: see screenrecord.py)
     def _cfg_get(section, key, default):
         try:
@@ -513,6 +746,8 @@ def main(page: ft.Page):
         ft.dropdown.Option("ScreenRecord"),
     ]
     default_backend = "ScreenRecord"
+    if virtual_camera.available():
+        backend_options.append(ft.dropdown.Option("Virtual Camera"))
     if get_casting_exe():
         backend_options.append(ft.dropdown.Option("Casting (MQDH)"))
         default_backend = "Casting (MQDH)"
@@ -540,6 +775,7 @@ def main(page: ft.Page):
             eye_dd.update()
         except Exception:
             pass
+        page.run_thread(warm_selected)
 
     backend_dd.on_change = on_backend_change
     # 起動時の初期状態にも反映
@@ -559,10 +795,14 @@ def main(page: ft.Page):
         ),
         height=48,
     )
+    # One grid window for every listed headset (classroom supervision).
+    mosaic_btn = ft.Button("モザイク", icon=ft.Icons.GRID_VIEW, on_click=toggle_mosaic, height=48)
+    # The selected headset's replay buffer ([replay] seconds) to a file.
+    replay_btn = ft.IconButton(icon=ft.Icons.REPLAY, tooltip="リプレイ保存", on_click=save_replay)
     page.bottom_appbar = ft.BottomAppBar(
         padding=10,
         content=ft.Row(
-            [connect_btn],
+            [replay_btn, mosaic_btn, connect_btn],
             alignment=ft.MainAxisAlignment.END,
         ),
     )
@@ -631,6 +871,16 @@ def main(page: ft.Page):
     # 起動時に接続されているデバイスを読み込む
     load_device()
 
+    # After that, plug/unplug/state changes arrive from adb's track-devices
+    # stream.
+    # Both loops run via page.run_thread (NOT a raw threading.Thread): Flet
+    # binds the page to a context var per run_thread call, and page.update()
+    # only reaches the client when that context is set. A raw thread's
+    # update() calls are silently dropped, which is why the connect button
+    # never reverted after the window was closed.
+    page.run_thread(device_watcher.run)
+    page.run_thread(supervisor.run)
+
 
 
 
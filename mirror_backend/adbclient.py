@@ -0,0 +1,365 @@
+"""Talk to the adb server's socket protocol directly.
+
+Every `adb ...` subprocess costs a process spawn plus its own connection to
+the server -- tens of milliseconds on Windows. For the short queries the app
+issues all the time (get-state, getprop, pidof, display list, broadcasts) we
+open the server's socket ourselves instead. The wire protocol (see
+SERVICES.TXT / protocol.txt in the adb sources):
+
+    request:  4 hex digits of length + service name, e.g. "000chost:version"
+    reply:    "OKAY" or "FAIL" + 4-hex-length message
+    host:*    services answer with a length-prefixed payload and close
+    host:transport:<serial> switches the connection to the device, after
+              which one device service (shell:..., exec:...) runs on it and
+              its output is streamed until the device closes it.
+
+The server closes every connection after one service, so the "pool" keeps
+already-connected idle sockets ready rather than reusing finished ones; that
+takes the connect out of the request's critical path.
+
+If the server is unreachable (not started yet, or a different port) the
+`run()` helper falls back to spawning adb, which also starts the server.
+"""
+import os
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+from .utils import get_adb_path, NO_WINDOW
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+POOL_SIZE = 4
+# An idle pre-connected socket older than this is discarded instead of used.
+POOL_MAX_IDLE = 30.0
+
+# shell v2 packet ids
+_SHELL_STDOUT = 1
+_SHELL_STDERR = 2
+_SHELL_EXIT = 3
+
+
+class AdbError(RuntimeError):
+    """The adb server answered FAIL (message from the server)."""
+
+
+def _server_port() -> int:
+    # Same variable the adb client itself honours.
+    try:
+        return int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+    except ValueError:
+        return DEFAULT_PORT
+
+
+class AdbClient:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = None, timeout: float = 5.0,
+                 pool_size: int = POOL_SIZE):
+        self.server_host = host
+        self.port = port or _server_port()
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle = []  # [(socket, connected_at)]
+        self._lock = threading.Lock()
+        self._features = {}
+
+    # --- connections ---
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.server_host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _acquire(self):
+        """(socket, pooled) -- a pre-connected idle socket if there is one."""
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                sock, since = self._idle.pop()
+                if now - since < POOL_MAX_IDLE:
+                    return sock, True
+                sock.close()
+        return self._connect(), False
+
+    def prefill(self) -> None:
+        """Top the idle pool up to pool_size connected sockets."""
+        while True:
+            with self._lock:
+                if len(self._idle) >= self.pool_size:
+                    return
+            try:
+                sock = self._connect()
+            except OSError:
+                return
+            with self._lock:
+                self._idle.append((sock, time.monotonic()))
+
+    def _refill_async(self) -> None:
+        if len(self._idle) < self.pool_size:
+            threading.Thread(target=self.prefill, daemon=True).start()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock, _ in idle:
+            sock.close()
+
+    # --- protocol primitives ---
+
+    @staticmethod
+    def _send_request(sock, service: str) -> None:
+        data = service.encode("utf-8")
+        sock.sendall(b"%04x" % len(data) + data)
+
+    @staticmethod
+    def _recv_exact(sock, n: int) -> bytes:
+        chunks = []
+        while n:
+            chunk = sock.recv(n)
+            if not chunk:
+                raise ConnectionError("adb server closed the connection")
+            chunks.append(chunk)
+            n -= len(chunk)
+        return b"".join(chunks)
+
+    def _read_status(self, sock) -> None:
+        status = self._recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(self._read_string(sock).decode("utf-8", errors="replace"))
+        raise AdbError(f"unexpected adb server reply {status!r}")
+
+    def _read_string(self, sock) -> bytes:
+        length = int(self._recv_exact(sock, 4), 16)
+        return self._recv_exact(sock, length)
+
+    @staticmethod
+    def _recv_all(sock) -> bytes:
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def _request(self, service: str) -> socket.socket:
+        sock, pooled = self._acquire()
+        try:
+            self._send_request(sock, service)
+            self._read_status(sock)
+        except OSError:
+            sock.close()
+            if not pooled:
+                raise
+            # The idle socket went stale (server restarted); one fresh try.
+            sock = self._connect()
+            try:
+                self._send_request(sock, service)
+                self._read_status(sock)
+            except BaseException:
+                sock.close()
+                raise
+        except BaseException:
+            sock.close()
+            raise
+        finally:
+            self._refill_async()
+        return sock
+
+    def _open_device(self, serial: str, service: str, timeout: float = None) -> socket.socket:
+        """Connection switched to `serial` with `service` running on it."""
+        sock = self._request(f"host:transport:{serial}" if serial else "host:transport-any")
+        try:
+            sock.settimeout(timeout if timeout is not None else self.timeout)
+            self._send_request(sock, service)
+            self._read_status(sock)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    # --- host services ---
+
+    def host(self, service: str) -> str:
+        """Run a `host:` style service and return its payload."""
+        sock = self._request(service)
+        try:
+            return self._read_string(sock).decode("utf-8", errors="replace")
+        finally:
+            sock.close()
+
+    def version(self) -> int:
+        return int(self.host("host:version"), 16)
+
+    def devices(self, long: bool = False) -> str:
+        """Same text `adb devices [-l]` prints, minus the header line."""
+        return self.host("host:devices-l" if long else "host:devices")
+
+    def get_state(self, serial: str) -> str:
+        return self.host(f"host-serial:{serial}:get-state")
+
+    def forget(self, serial: str) -> None:
+        """Drop what was learned about `serial` (call when it reconnects)."""
+        self._features.pop(serial, None)
+
+    def features(self, serial: str) -> set:
+        if serial not in self._features:
+            self._features[serial] = set(self.host(f"host-serial:{serial}:features").split(","))
+        return self._features[serial]
+
+    def open_host_stream(self, service: str) -> socket.socket:
+        """Long-lived host service such as host:track-devices-l; the caller
+        reads length-prefixed payloads from the returned socket."""
+        sock = self._request(service)
+        sock.settimeout(None)
+        return sock
+
+    def read_payload(self, sock) -> str:
+        """Next length-prefixed payload from an open_host_stream() socket."""
+        return self._read_string(sock).decode("utf-8", errors="replace")
+
+    # --- device services ---
+
+    def shell(self, serial: str, command: str, timeout: float = None) -> subprocess.CompletedProcess:
+        """Run `command` with the device shell and collect its output.
+
+        Uses the shell v2 protocol when the device supports it (separate
+        stderr and a real exit code), otherwise v1 with returncode 0.
+        """
+        v2 = "shell_v2" in self._safe_features(serial)
+        service = f"shell,v2,raw:{command}" if v2 else f"shell:{command}"
+        sock = self._open_device(serial, service, timeout)
+        try:
+            if not v2:
+                return subprocess.CompletedProcess(command, 0, self._recv_all(sock), b"")
+            return self._read_shell_v2(sock, command)
+        finally:
+            sock.close()
+
+    def _safe_features(self, serial: str) -> set:
+        try:
+            return self.features(serial)
+        except (AdbError, OSError):
+            return set()
+
+    def _read_shell_v2(self, sock, command) -> subprocess.CompletedProcess:
+        out, err = [], []
+        code = 0
+        while True:
+            first = sock.recv(5)
+            if not first:
+                break  # closed without an exit packet
+            header = first + self._recv_exact(sock, 5 - len(first)) if len(first) < 5 else first
+            packet_id, length = struct.unpack("<BI", header)
+            payload = self._recv_exact(sock, length) if length else b""
+            if packet_id == _SHELL_STDOUT:
+                out.append(payload)
+            elif packet_id == _SHELL_STDERR:
+                err.append(payload)
+            elif packet_id == _SHELL_EXIT:
+                code = payload[0] if payload else 0
+                break
+        return subprocess.CompletedProcess(command, code, b"".join(out), b"".join(err))
+
+    def exec_out(self, serial: str, command: str) -> socket.socket:
+        """Start `exec:<command>` and return the socket carrying its raw
+        stdout (what `adb exec-out` pipes through)."""
+        sock = self._open_device(serial, f"exec:{command}")
+        sock.settimeout(None)
+        return sock
+
+    def open_shell(self, serial: str, raw: bool = True) -> socket.socket:
+        """Interactive shell without a PTY (no echo, no prompt). Commands are
+        written to the socket and their output read back from it."""
+        return self._open_device(serial, "shell,raw:" if raw else "shell:", None)
+
+
+_client = None
+_client_lock = threading.Lock()
+# After a failed connect, skip the socket path for a while instead of paying
+# a refused connect on every call.
+_SERVER_RETRY_AFTER = 5.0
+_server_down_until = 0.0
+
+
+def get_client() -> AdbClient:
+    global _client
+    with _client_lock:
+        if _client is None or _client.port != _server_port():
+            _client = AdbClient()
+        return _client
+
+
+def _quote(arg: str) -> str:
+    if arg and all(c.isalnum() or c in "@%+=:,./-_" for c in arg):
+        return arg
+    return "'" + arg.replace("'", "'\\''") + "'"
+
+
+def run(serial: str, args, timeout: float = 5.0, text: bool = True) -> subprocess.CompletedProcess:
+    """`adb -s <serial> shell <args>` through the server socket.
+
+    `args` is a command string or an argv list. Returns a CompletedProcess
+    like subprocess.run(capture_output=True), so call sites that used
+    subprocess keep working. Falls back to spawning adb when the server
+    can't be reached.
+    """
+    global _server_down_until
+    command = args if isinstance(args, str) else " ".join(_quote(a) for a in args)
+    if time.monotonic() >= _server_down_until:
+        try:
+            result = get_client().shell(serial, command, timeout=timeout)
+            return _as_text(result) if text else result
+        except socket.timeout:
+            raise subprocess.TimeoutExpired(command, timeout)
+        except AdbError as e:
+            # Device-level failure (not found, offline, unauthorized): what
+            # adb itself would print with a non-zero exit.
+            return subprocess.CompletedProcess(command, 1, "" if text else b"",
+                                               f"error: {e}" if text else f"error: {e}".encode())
+        except (ConnectionRefusedError, socket.gaierror):
+            _server_down_until = time.monotonic() + _SERVER_RETRY_AFTER
+        except OSError:
+            pass
+    return subprocess.run(
+        [get_adb_path(), "-s", serial, "shell", command],
+        capture_output=True, text=text, timeout=timeout, creationflags=NO_WINDOW,
+    )
+
+
+def get_state(serial: str, timeout: float = 3.0) -> str:
+    """"device", "offline", "unauthorized", ... or "" if unknown."""
+    return probe_state(serial, timeout)[0]
+
+
+def probe_state(serial: str, timeout: float = 3.0):
+    """(state, error): get_state() plus why it is "" -- the server's (or
+    adb's) message, e.g. "device 'X' not found" -- for start failures."""
+    global _server_down_until
+    if time.monotonic() >= _server_down_until:
+        try:
+            return get_client().get_state(serial).strip(), ""
+        except AdbError as e:
+            return "", str(e)
+        except (ConnectionRefusedError, socket.gaierror):
+            _server_down_until = time.monotonic() + _SERVER_RETRY_AFTER
+        except OSError:
+            pass
+    try:
+        res = subprocess.run([get_adb_path(), "-s", serial, "get-state"],
+                             capture_output=True, text=True, timeout=timeout, creationflags=NO_WINDOW)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        return "", str(e)
+    if res.returncode != 0:
+        return "", res.stderr.strip()
+    return res.stdout.strip(), ""
+
+
+def _as_text(result: subprocess.CompletedProcess) -> subprocess.CompletedProcess:
+    return subprocess.CompletedProcess(
+        result.args, result.returncode,
+        result.stdout.decode("utf-8", errors="replace"),
+        result.stderr.decode("utf-8", errors="replace"),
+    )
@@ -15,3 +15,8 @@ class MirrorBackend(ABC):
     def is_running(self) -> bool:
         """Check if mirroring is running."""
         pass
+
+    def processes(self) -> list:
+        """Child processes (Popen) whose exit may end this session; the
+        supervisor waits on these instead of polling is_running()."""
+        return []
@@ -0,0 +1,328 @@
+import collections
+import threading
+import time
+
+from .h264 import NAL_IDR, NAL_PPS, NAL_SPS, is_first_slice
+
+# What a subscriber that can't keep up gets:
+#  - drop_to_idr: its queue is discarded and delivery resumes at the next
+#    keyframe (with SPS/PPS), so it sees a jump rather than a corrupt stream.
+#  - disconnect: it is closed; whoever owns it decides what to do.
+POLICY_DROP_TO_IDR = "drop_to_idr"
+POLICY_DISCONNECT = "disconnect"
+
+DEFAULT_QUEUE_BYTES = 8 << 20
+# Encoded bytes since the last keyframe kept for late subscribers, so they can
+# start immediately instead of waiting up to screenrecord's 10 s I-frame
+# interval. Past this the cache is dropped and late joiners wait for an IDR.
+GOP_CACHE_LIMIT = 16 << 20
+
+
+class Subscriber:
+    """One consumer of a StreamBroker: a bounded queue of encoded NAL units.
+
+    Filled on the broker's relay thread; drained with `read()` or by a
+    `pipe_to()` thread. Data is plain Annex-B, so it can go straight into a
+    decoder's stdin or a file.
+    """
+
+    def __init__(self, broker, name: str, max_bytes: int, policy: str):
+        self.broker = broker
+        self.name = name
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._items = collections.deque()
+        self._bytes = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._resync = False
+        self.close_reason = None
+        self.delivered_bytes = 0
+        self.dropped_units = 0
+        self.overflows = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def queued_bytes(self) -> int:
+        return self._bytes
+
+    def read(self, timeout: float = None):
+        """Everything queued so far as one bytes object.
+
+        Blocks up to `timeout` for data; returns b"" on timeout and None once
+        the subscriber is closed and drained.
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None if self._closed else b""
+            data = b"".join(self._items)
+            self._items.clear()
+            self._bytes = 0
+        self.delivered_bytes += len(data)
+        return data
+
+    def pipe_to(self, fileobj, close: bool = True) -> threading.Thread:
+        """Copy this subscription into `fileobj` (e.g. a player's stdin) on a
+        daemon thread until either side closes."""
+        def _pump():
+            try:
+                while True:
+                    data = self.read()
+                    if data is None:
+                        break
+                    if data:
+                        fileobj.write(data)
+                        fileobj.flush()
+            except (OSError, ValueError):
+                pass  # consumer went away
+            finally:
+                self.close("consumer closed" if not self._closed else None)
+                if close:
+                    try:
+                        fileobj.close()
+                    except Exception:
+                        pass
+
+        thread = threading.Thread(target=_pump, name=f"Subscriber-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self, reason: str = None) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self.close_reason = reason
+            self._cond.notify_all()
+        self.broker.unsubscribe(self)
+
+    def _prime(self, units) -> None:
+        with self._cond:
+            for data in units:
+                self._items.append(data)
+                self._bytes += len(data)
+            self._resync = not units
+
+    def _offer(self, nal_type: int, data: bytes, entry: bool) -> None:
+        if self._queue(nal_type, data, entry) is False:
+            self.broker.unsubscribe(self)
+
+    def _queue(self, nal_type: int, data: bytes, entry: bool):
+        """Queue one NAL; returns False if this subscriber got disconnected."""
+        with self._cond:
+            if self._closed:
+                return
+            if self._resync:
+                if not entry:
+                    self.dropped_units += 1
+                    return
+                self._resync = False
+                if nal_type == NAL_IDR:
+                    # Resuming at a bare IDR: decoder needs the parameter sets.
+                    for ps in (self.broker.sps, self.broker.pps):
+                        if ps:
+                            self._items.append(ps)
+                            self._bytes += len(ps)
+            if self._bytes + len(data) > self.max_bytes:
+                self.overflows += 1
+                self.dropped_units += len(self._items) + 1
+                self._items.clear()
+                self._bytes = 0
+                if self.policy == POLICY_DISCONNECT:
+                    self._closed = True
+                    self.close_reason = "too slow"
+                    self._cond.notify_all()
+                    return False
+                self._resync = True
+                return
+            self._items.append(data)
+            self._bytes += len(data)
+            self._cond.notify()
+
+
+class StreamBroker:
+    """Owns the single screenrecord of one device and fans it out.
+
+    Android allows one screenrecord per device, so every consumer of a
+    headset's stream (preview window, recording, virtual camera, ...) goes
+    through the broker instead of starting its own. Capture runs through a
+    headless ScreenRecordBackend (device prep, display fallback and rollover
+    included); its relay hands each NAL to the broker, which copies it once
+    and queues the same bytes object on every subscriber.
+    """
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.backend = None
+        self.sps = None
+        self.pps = None
+        self._subs = []
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._refs = 0
+        self._gop = []
+        self._gop_bytes = 0
+        self._last_type = None
+        self.started_at = None
+
+    def start(self, options: dict) -> None:
+        from .screenrecord import ScreenRecordBackend
+        backend = ScreenRecordBackend()
+        opts = dict(options)
+        # The listener has to be on the relay before it starts, or the
+        # primer (the only SPS/PPS screenrecord sends) goes past it.
+        opts.update({'mode': 'headless', 'shared': False, 'relay_listeners': [self._on_nal]})
+        backend.start(self.serial, opts)
+        self.backend = backend
+        self.started_at = time.monotonic()
+        self._watch_capture(backend)
+
+    def _watch_capture(self, backend) -> None:
+        """Close every subscriber once `backend`'s relay ends for good
+        (rollover gave up, adb died, device unplugged), so their owners
+        see the stream is over instead of showing a frozen picture."""
+        relay = backend.relay
+        previous = relay.on_eof
+
+        def on_eof(r):
+            if previous:
+                previous(r)
+            self._capture_ended(backend)
+
+        relay.on_eof = on_eof
+        if not relay.is_alive():  # ended before the hook was in place
+            self._capture_ended(backend)
+
+    def _capture_ended(self, backend) -> None:
+        if self.backend is not backend:
+            return  # stopped on purpose (stop()/stop_capture())
+        with self._lock:
+            subs, self._subs = self._subs, []
+        for sub in subs:
+            sub.close("capture ended")
+
+    def stop_capture(self) -> None:
+        """Stop the screenrecord but keep the subscribers: a start() that
+        follows carries on feeding them from the new stream's keyframe."""
+        backend, self.backend = self.backend, None
+        if backend:
+            backend.stop()
+        with self._lock:
+            self._gop = []
+            self._gop_bytes = 0
+        self._last_type = None
+
+    def stop(self) -> None:
+        self.stop_capture()
+        with self._lock:
+            subs, self._subs = self._subs, []
+        for sub in subs:
+            sub.close("broker stopped")
+
+    def is_running(self) -> bool:
+        return self.backend is not None and self.backend.is_running()
+
+    def subscribe(self, name: str = "", max_bytes: int = DEFAULT_QUEUE_BYTES,
+                  policy: str = POLICY_DROP_TO_IDR) -> Subscriber:
+        sub = Subscriber(self, name, max_bytes, policy)
+        with self._lock:
+            # Late joiners start from the cached GOP so they can decode at once.
+            sub._prime(list(self._gop))
+            self._subs = self._subs + [sub]
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            self._subs = [s for s in self._subs if s is not sub]
+
+    def subscribers(self) -> list:
+        return list(self._subs)
+
+    def stats(self) -> dict:
+        return {
+            "serial": self.serial,
+            "running": self.is_running(),
+            "subscribers": [
+                {
+                    "name": s.name,
+                    "queued_bytes": s.queued_bytes(),
+                    "delivered_bytes": s.delivered_bytes,
+                    "dropped_units": s.dropped_units,
+                    "overflows": s.overflows,
+                }
+                for s in self._subs
+            ],
+        }
+
+    def _on_nal(self, nal_type, nal, ts) -> None:
+        data = bytes(nal)
+        entry = False
+        if nal_type == NAL_SPS:
+            self.sps = data
+            entry = True
+        elif nal_type == NAL_PPS:
+            self.pps = data
+        elif nal_type == NAL_IDR and is_first_slice(nal):
+            # An IDR right after its parameter sets was already an entry
+            # point at the SPS.
+            entry = self._last_type not in (NAL_SPS, NAL_PPS)
+        self._last_type = nal_type
+
+        with self._lock:
+            if entry:
+                self._gop = [data] if nal_type == NAL_SPS else [p for p in (self.sps, self.pps) if p] + [data]
+                self._gop_bytes = sum(len(d) for d in self._gop)
+            elif self._gop:
+                self._gop.append(data)
+                self._gop_bytes += len(data)
+                if self._gop_bytes > GOP_CACHE_LIMIT:
+                    self._gop = []
+                    self._gop_bytes = 0
+            subs = self._subs
+        for sub in subs:
+            sub._offer(nal_type, data, entry)
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def acquire_broker(serial: str, options: dict) -> StreamBroker:
+    """Get (starting it if needed) the broker for `serial`; pair with
+    release_broker(). The first caller's options decide the capture
+    settings (bitrate, size, display)."""
+    with _brokers_lock:
+        broker = _brokers.get(serial)
+        if broker is None:
+            broker = StreamBroker(serial)
+            _brokers[serial] = broker
+        broker._refs += 1
+    try:
+        with broker._start_lock:
+            if not broker.is_running():
+                # Restart only the capture; earlier consumers stay subscribed.
+                broker.stop_capture()
+                broker.start(options)
+    except Exception:
+        release_broker(broker)
+        raise
+    return broker
+
+
+def release_broker(broker: StreamBroker) -> None:
+    with _brokers_lock:
+        broker._refs -= 1
+        if broker._refs > 0:
+            return
+        if _brokers.get(broker.serial) is broker:
+            del _brokers[broker.serial]
+    broker.stop()
+
+
+def get_broker(serial: str):
+    """The running broker for `serial`, or None (does not start one)."""
+    return _brokers.get(serial)
@@ -9,6 +9,9 @@ from urllib.parse import quote
 from ctypes import wintypes
 from .base import MirrorBackend
 from .utils import get_adb_path, check_process_alive, NO_WINDOW
+from . import shell
+from . import tracing
+from .logreactor import get_reactor
 
 
 MQDH_PATH = os.path.join(os.environ.get("ProgramFiles", r"C:\Program Files"), "Meta Quest Developer Hub")
@@ -118,6 +121,8 @@ class CastingBackend(MirrorBackend):
         self._start_time = None
         self._last_window_check = 0.0
         self._last_window_result = True
+        self.trace = tracing.Trace("casting", None)
+        self._window_seen = False
 
     def start(self, serial: str, options: dict) -> None:
         with self._lock:
@@ -126,6 +131,7 @@ class CastingBackend(MirrorBackend):
 
             self.serial = serial
             self._session_uuid = str(uuid.uuid4())
+            self.trace = trace = tracing.start_trace("casting", serial)
 
             casting_exe = get_casting_exe()
             if not casting_exe:
@@ -141,7 +147,8 @@ class CastingBackend(MirrorBackend):
                 "Cache",
                 _cache_key_for_serial(serial),
             )
-            os.makedirs(cache_dir, exist_ok=True)
+            with trace.span("prep"):
+                os.makedirs(cache_dir, exist_ok=True)
 
             features = self._build_features(options)
 
@@ -160,29 +167,25 @@ class CastingBackend(MirrorBackend):
 
             print(f"[Casting] Launching: {' '.join(args)}")
 
-            self.process = subprocess.Popen(
-                args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=NO_WINDOW,
-            )
+            with trace.span("spawn"):
+                self.process = subprocess.Popen(
+                    args,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    creationflags=NO_WINDOW,
+                )
             self._start_time = time.time()
             self._last_window_check = 0.0
+            self._window_seen = False
             self._last_window_result = True
 
-            def _log_output(stream, label):
-                try:
-                    for line in stream:
-                        text = line.decode("utf-8", errors="replace").strip()
-                        if text:
-                            print(f"[Casting/{label}] {text}")
-                except Exception:
-                    pass
+            # Both pipes are drained by the shared reader thread.
+            reactor = get_reactor()
+            reactor.add(self.process.stdout, label="Casting/out", source=serial)
+            reactor.add(self.process.stderr, label="Casting/err", source=serial)
 
-            threading.Thread(target=_log_output, args=(self.process.stdout, "out"), daemon=True).start()
-            threading.Thread(target=_log_output, args=(self.process.stderr, "err"), daemon=True).start()
-
-            time.sleep(1.0)
+            with trace.span("confirm"):
+                time.sleep(1.0)
             if self.process.poll() is not None:
                 code = self.process.returncode
                 self.process = None
@@ -218,15 +221,12 @@ class CastingBackend(MirrorBackend):
 
         if self.serial:
             try:
-                adb = get_casting_adb()
-                subprocess.run(
-                    [adb, "-s", self.serial, "shell", "am", "broadcast",
-                     "-a", "com.oculus.magicislandcastingservice.STOP_CASTING"],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
+                # Same adb server Casting.exe uses (see get_casting_adb), so
+                # the socket client reaches the same device.
+                shell.run(
+                    self.serial,
+                    ["am", "broadcast", "-a", "com.oculus.magicislandcastingservice.STOP_CASTING"],
                     timeout=5,
-                    check=False,
-                    creationflags=NO_WINDOW,
                 )
             except Exception:
                 pass
@@ -240,18 +240,23 @@ class CastingBackend(MirrorBackend):
             if sys.platform != 'win32':
                 return True
 
+            now = time.time()
             # While starting up, the window may not exist yet. Trust the
             # process during the grace period so we don't kill a live session.
-            if self._start_time and (time.time() - self._start_time) < WINDOW_GRACE_SECONDS:
+            # No scan during it either (this runs on every supervisor sweep):
+            # the trace's window mark is set by the first check after it.
+            if self._start_time and (now - self._start_time) < WINDOW_GRACE_SECONDS:
                 return True
 
-            now = time.time()
             if now - self._last_window_check < WINDOW_CHECK_INTERVAL:
                 return self._last_window_result
             self._last_window_check = now
 
             if self._has_visible_window():
                 self._last_window_result = True
+                if not self._window_seen:
+                    self._window_seen = True
+                    self.trace.mark("window")
                 return True
 
             # Process alive but no visible window belonging to our tree: the
@@ -262,6 +267,9 @@ class CastingBackend(MirrorBackend):
             self._last_window_result = False
             return False
 
+    def processes(self) -> list:
+        return [self.process] if self.process else []
+
     def _has_visible_window(self) -> bool:
         try:
             pids = _collect_process_tree_pids(self.process.pid)
@@ -0,0 +1,140 @@
+"""Keep the device list current from the adb server's track-devices stream.
+
+`host:track-devices-l` stays open and the server sends the complete device
+list (same text as `adb devices -l`) whenever anything changes. The watcher
+diffs each list against its table and reports only what changed:
+
+    ("added",   serial, row)
+    ("removed", serial, row)
+    ("changed", serial, row)   # state / transport id / model changed
+
+where row is {"state", "model", "product", "device", "transport_id"}.
+If the server goes away (adb reset, crash) the watcher reconnects with a
+short backoff; the first list after reconnecting resyncs the table.
+"""
+import socket
+import threading
+
+from . import adbclient
+from . import devinfo
+from . import shell
+
+_PROPS = ("product", "model", "device", "transport_id", "usb")
+RECONNECT_DELAYS = (0.2, 0.5, 1.0, 2.0)
+
+
+def parse_devices(text: str) -> dict:
+    """{serial: row} from `adb devices -l` style text."""
+    table = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or line.startswith("List of devices"):
+            continue
+        row = {"state": "", "model": "", "product": "", "device": "", "transport_id": None}
+        state = []
+        for token in parts[1:]:
+            key, sep, value = token.partition(":")
+            if sep and key in _PROPS:
+                row[key] = value
+            elif not any(row[k] for k in ("product", "model", "transport_id")):
+                # State can be several words ("no permissions (...)").
+                state.append(token)
+        row["state"] = " ".join(state)
+        table[parts[0]] = row
+    return table
+
+
+def diff_devices(old: dict, new: dict) -> list:
+    changes = []
+    for serial, row in new.items():
+        if serial not in old:
+            changes.append(("added", serial, row))
+        elif old[serial] != row:
+            changes.append(("changed", serial, row))
+    for serial, row in old.items():
+        if serial not in new:
+            changes.append(("removed", serial, row))
+    return changes
+
+
+class DeviceWatcher:
+    """Background watcher; `on_change(changes)` is called from its thread
+    with the list of changes (never with an empty list)."""
+
+    def __init__(self, on_change=None, client: adbclient.AdbClient = None):
+        self.on_change = on_change
+        self._client = client
+        self._table = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sock = None
+        self._thread = None
+        self.connected = False
+
+    def devices(self) -> dict:
+        """Snapshot {serial: row} of the current table."""
+        with self._lock:
+            return dict(self._table)
+
+    def online(self) -> dict:
+        """{serial: model} for devices in the 'device' state."""
+        with self._lock:
+            return {s: r["model"] for s, r in self._table.items() if r["state"] == "device"}
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="DeviceWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def run(self) -> None:
+        """Watch until stop(); blocking (run it on its own thread)."""
+        failures = 0
+        while not self._stop.is_set():
+            client = self._client or adbclient.get_client()
+            try:
+                self._sock = client.open_host_stream("host:track-devices-l")
+            except (adbclient.AdbError, OSError):
+                self.connected = False
+                self._stop.wait(RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)])
+                failures += 1
+                continue
+            failures = 0
+            self.connected = True
+            try:
+                while not self._stop.is_set():
+                    self._apply(parse_devices(client.read_payload(self._sock)))
+            except (OSError, ValueError):
+                pass
+            finally:
+                self.connected = False
+                try:
+                    self._sock.close()
+                except OSError:
+                    pass
+                self._sock = None
+
+    def _apply(self, new: dict) -> None:
+        with self._lock:
+            changes = diff_devices(self._table, new)
+            self._table = new
+        if not changes:
+            return
+        for kind, serial, row in changes:
+            if kind == "removed" or row["state"] != "device":
+                devinfo.invalidate(serial)
+                shell.close_session(serial)
+            else:
+                devinfo.note_transport(serial, row["transport_id"])
+        if self.on_change is not None:
+            try:
+                self.on_change(changes)
+            except Exception as e:
+                print(f"Device watcher callback failed: {e}")
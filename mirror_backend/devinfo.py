@@ -0,0 +1,140 @@
+"""Per-device metadata, fetched once per connection in one shell round-trip.
+
+Model, build, display ids, screen size and IP used to be separate queries
+(getprop on every dropdown change, `cmd display list` on every start,
+`ip route` on demand). They are now collected by a single batched command
+on the device's shared shell and cached per serial until the device
+disconnects or reconnects (a reconnect shows up as a new adb transport id).
+"""
+import re
+import threading
+import time
+
+from . import shell
+
+# One command, sections separated by marker lines.
+_SECTIONS = (
+    ("model", "getprop ro.product.model"),
+    ("build", "getprop ro.build.display.id"),
+    ("sdk", "getprop ro.build.version.sdk"),
+    ("displays", "cmd display list"),
+    ("size", "wm size"),
+    ("route", "ip route"),
+)
+_MARK = "@@qsc:"
+BATCH_COMMAND = "; ".join(f"echo {_MARK}{name}; {cmd} 2>/dev/null" for name, cmd in _SECTIONS)
+
+
+class DeviceInfo:
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.model = ""
+        self.build = ""
+        self.sdk = None
+        self.display_ids = []
+        self.size = None  # (width, height) the display renders at
+        self.ip = None
+        self.transport_id = None
+        self.fetched_at = None
+
+    def __repr__(self):
+        return (f"DeviceInfo({self.serial!r}, model={self.model!r}, build={self.build!r}, "
+                f"displays={self.display_ids}, size={self.size}, ip={self.ip})")
+
+
+def parse_batch(serial: str, output: str) -> DeviceInfo:
+    sections = {}
+    current = None
+    for line in output.splitlines():
+        if line.startswith(_MARK):
+            current = line[len(_MARK):].strip()
+            sections[current] = []
+        elif current is not None:
+            sections[current].append(line)
+
+    def text(name):
+        return "\n".join(sections.get(name, [])).strip()
+
+    info = DeviceInfo(serial)
+    info.model = text("model")
+    info.build = text("build")
+    sdk = text("sdk")
+    info.sdk = int(sdk) if sdk.isdigit() else None
+    info.display_ids = sorted({int(m) for m in re.findall(r"Display\s+(\d+)", text("displays"))})
+    # "Override size" (wm size WxH) wins over the panel's physical size.
+    sizes = dict(re.findall(r"(Physical|Override) size:\s*(\d+x\d+)", text("size")))
+    size = sizes.get("Override") or sizes.get("Physical")
+    if size:
+        w, h = size.split("x")
+        info.size = (int(w), int(h))
+    ip = re.search(r"src (\d+\.\d+\.\d+\.\d+)", text("route"))
+    info.ip = ip.group(1) if ip else None
+    info.fetched_at = time.time()
+    return info
+
+
+_cache = {}
+_transports = {}
+_lock = threading.Lock()
+_fetch_locks = {}
+
+
+def get_info(serial: str, refresh: bool = False):
+    """Cached DeviceInfo for `serial`, fetching it if needed; None if the
+    device couldn't be queried."""
+    if not serial:
+        return None
+    if not refresh:
+        info = _cache.get(serial)
+        if info is not None:
+            return info
+    with _lock:
+        fetch_lock = _fetch_locks.setdefault(serial, threading.Lock())
+    # Concurrent first callers share one fetch.
+    with fetch_lock:
+        info = _cache.get(serial)
+        if info is not None and not refresh:
+            return info
+        try:
+            res = shell.run(serial, BATCH_COMMAND, timeout=5)
+        except Exception as e:
+            print(f"Device info fetch failed for {serial}: {e}")
+            return None
+        if res.returncode != 0 and _MARK not in res.stdout:
+            return None
+        info = parse_batch(serial, res.stdout)
+        with _lock:
+            info.transport_id = _transports.get(serial)
+            _cache[serial] = info
+        return info
+
+
+def invalidate(serial: str) -> None:
+    with _lock:
+        _cache.pop(serial, None)
+
+
+def invalidate_all() -> None:
+    with _lock:
+        _cache.clear()
+        _transports.clear()
+
+
+def note_transport(serial: str, transport_id) -> None:
+    """Record the adb transport id seen for `serial`; a different id means
+    the device reconnected (maybe rebooted), so its entry is dropped."""
+    with _lock:
+        if _transports.get(serial) != transport_id:
+            _transports[serial] = transport_id
+            _cache.pop(serial, None)
+
+
+def forget_missing(present) -> None:
+    """Drop entries for serials not in `present` (they disconnected)."""
+    with _lock:
+        for serial in list(_cache):
+            if serial not in present:
+                del _cache[serial]
+        for serial in list(_transports):
+            if serial not in present:
+                del _transports[serial]
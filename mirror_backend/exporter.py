@@ -0,0 +1,277 @@
+"""Session health on a localhost HTTP endpoint, in Prometheus text format.
+
+A refresh thread walks the app's sessions every REFRESH_INTERVAL seconds,
+reads the backends' own counters, the relay's stream metrics (metrics.py),
+ffplay's status (playerstats.py), the replay buffers' size (replay.py) and
+CPU time / RSS of their child processes, and renders the whole page once
+into a bytes object. Requests are served on the exporter's own thread and
+only write out that cached page, so a scrape never touches the sessions,
+the UI thread or the devices, however many sessions there are.
+
+    [exporter]
+    enabled = true
+    port = 9464
+
+Only binds 127.0.0.1 by default; put a proper scraper/agent in front of it
+to collect from several PCs.
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import metrics
+from . import playerstats
+from . import replay
+
+DEFAULT_PORT = 9464
+REFRESH_INTERVAL = 2.0
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (name, type, help)
+_METRICS = (
+    ("quest_caster_session_info", "gauge", "Active mirroring session (value 1), labelled with its backend."),
+    ("quest_caster_session_uptime_seconds", "gauge", "Seconds since the session was started."),
+    ("quest_caster_session_restarts_total", "counter", "Capture restarts within the session: screenrecord rollovers (a fresh screenrecord before its 180 s limit), not reconnects."),
+    ("quest_caster_session_start_latency_seconds", "gauge", "Time backend.start() took for this session."),
+    ("quest_caster_session_running", "gauge", "1 if the backend reported running at the last refresh."),
+    ("quest_caster_stream_bitrate_bps", "gauge", "Received video bitrate, last seconds (relay path only)."),
+    ("quest_caster_stream_fps", "gauge", "Received frames per second, last seconds (relay path only)."),
+    ("quest_caster_stream_frame_age_seconds", "gauge", "Seconds since the last received frame (relay path only)."),
+    ("quest_caster_player_dropped_frames_total", "counter", "Frames ffplay dropped."),
+    ("quest_caster_replay_buffer_bytes", "gauge", "Encoded bytes held in the instant-replay buffer."),
+    ("quest_caster_replay_buffer_seconds", "gauge", "Seconds of stream the instant-replay buffer covers."),
+    ("quest_caster_process_cpu_seconds_total", "counter", "CPU time of the session's live child processes, summed per program (drops when one is replaced, e.g. adb at a rollover)."),
+    ("quest_caster_process_resident_bytes", "gauge", "Resident memory of the session's child processes, summed per program."),
+    ("quest_caster_exporter_refresh_seconds", "gauge", "Time the last refresh took."),
+)
+
+
+def backend_type(backend) -> str:
+    """"screenrecord", "scrcpy", "casting", ... (the backend's module name)."""
+    return type(backend).__module__.rsplit(".", 1)[-1]
+
+
+# --- child process usage ---
+
+if sys.platform == "win32":
+    import ctypes
+    from ctypes import wintypes
+
+    class _MemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.GetProcessTimes.argtypes = [wintypes.HANDLE] + [ctypes.POINTER(wintypes.FILETIME)] * 4
+    _kernel32.K32GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(_MemoryCounters), wintypes.DWORD]
+
+    def process_usage(proc):
+        """(cpu_seconds, rss_bytes) of a Popen, or None once it's gone."""
+        handle = getattr(proc, "_handle", None)
+        if not handle or proc.returncode is not None:
+            return None
+        created, exited, kernel, user = (wintypes.FILETIME() for _ in range(4))
+        if not _kernel32.GetProcessTimes(int(handle), ctypes.byref(created), ctypes.byref(exited),
+                                         ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        ticks = sum((t.dwHighDateTime << 32) | t.dwLowDateTime for t in (kernel, user))
+        counters = _MemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not _kernel32.K32GetProcessMemoryInfo(int(handle), ctypes.byref(counters), counters.cb):
+            return None
+        return ticks / 1e7, counters.WorkingSetSize
+else:
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def process_usage(proc):
+        """(cpu_seconds, rss_bytes) of a Popen, or None once it's gone."""
+        try:
+            with open(f"/proc/{proc.pid}/stat", "rb") as f:
+                stat = f.read()
+            with open(f"/proc/{proc.pid}/statm", "rb") as f:
+                statm = f.read()
+        except OSError:
+            return None  # exited, or no procfs (macOS)
+        # comm (field 2) may contain spaces; the fields after it are fixed.
+        fields = stat[stat.rfind(b")") + 2:].split()
+        if fields[0] == b"Z":
+            return None
+        utime, stime = int(fields[11]), int(fields[12])
+        return (utime + stime) / _CLOCK_TICKS, int(statm.split()[1]) * _PAGE_SIZE
+
+
+# --- rendering ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def collect(sessions: dict, now: float = None) -> list:
+    """[(metric, labels, value)] for `sessions` ({serial: entry}, entries as
+    kept in main.py's casting_devices: {'backend', 'started_at',
+    'start_latency', ...})."""
+    now = time.monotonic() if now is None else now
+    stream = metrics.snapshots()
+    player = playerstats.snapshots()
+    buffers = replay.snapshots()
+    samples = []
+    for serial, entry in sessions.items():
+        backend = entry.get("backend")
+        if backend is None:
+            continue
+        labels = {"serial": serial}
+        add = lambda name, value, **extra: samples.append((name, {**labels, **extra}, value))
+        add("quest_caster_session_info", 1, backend=backend_type(backend))
+        started_at = entry.get("started_at")
+        if started_at is not None:
+            add("quest_caster_session_uptime_seconds", now - started_at)
+        add("quest_caster_session_restarts_total", getattr(backend, "rollovers", 0))
+        if entry.get("start_latency") is not None:
+            add("quest_caster_session_start_latency_seconds", entry["start_latency"])
+        try:
+            add("quest_caster_session_running", int(bool(backend.is_running())))
+        except Exception:
+            add("quest_caster_session_running", 0)
+
+        snap = stream.get(serial)
+        if snap is not None:
+            add("quest_caster_stream_bitrate_bps", snap["bitrate_bps"])
+            add("quest_caster_stream_fps", snap["fps"])
+            if snap["last_frame_age_s"] is not None:
+                add("quest_caster_stream_frame_age_seconds", snap["last_frame_age_s"])
+        snap = player.get(serial)
+        if snap is not None and snap["samples"]:
+            add("quest_caster_player_dropped_frames_total", snap["frames_dropped"])
+        snap = buffers.get(serial)
+        if snap is not None:
+            add("quest_caster_replay_buffer_bytes", snap["bytes"])
+            add("quest_caster_replay_buffer_seconds", snap["seconds"])
+
+        try:
+            procs = backend.processes()
+        except Exception:
+            procs = []
+        # Per program, not per pid: rollover starts a new adb every few
+        # minutes, and a pid label would make a new series each time.
+        totals = {}
+        for proc in procs:
+            if proc is None:
+                continue
+            usage = process_usage(proc)
+            if usage is None:
+                continue
+            name = os.path.basename(str(proc.args[0] if isinstance(proc.args, (list, tuple)) else proc.args))
+            cpu, rss = totals.get(name, (0.0, 0))
+            totals[name] = (cpu + usage[0], rss + usage[1])
+        for name, (cpu, rss) in totals.items():
+            add("quest_caster_process_cpu_seconds_total", cpu, process=name)
+            add("quest_caster_process_resident_bytes", rss, process=name)
+    return samples
+
+
+def render(samples: list) -> bytes:
+    """Prometheus text exposition of collect()'s samples."""
+    by_name = {}
+    for name, labels, value in samples:
+        by_name.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, kind, help_text in _METRICS:
+        rows = by_name.get(name)
+        if not rows:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in rows:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            series = f"{name}{{{label_text}}}" if label_text else name
+            lines.append(f"{series} {value:.6g}" if isinstance(value, float) else f"{series} {value}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class MetricsExporter:
+    """Serves the cached page on http://host:port/metrics.
+
+    `sessions` is a callable returning {serial: entry}; it is only called
+    from the refresh thread.
+    """
+
+    def __init__(self, sessions, port: int = DEFAULT_PORT, host: str = "127.0.0.1",
+                 interval: float = REFRESH_INTERVAL):
+        self.sessions = sessions
+        self.interval = interval
+        self.page = render([])
+        self.refreshed_at = None
+        self.refresh_seconds = 0.0
+        self.scrapes = 0
+        self._stop = threading.Event()
+        self._refresher = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._server_thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def _handler_class(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = exporter.page
+                exporter.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # no line per scrape in the console
+
+        return Handler
+
+    def refresh(self) -> None:
+        t0 = time.perf_counter()
+        try:
+            samples = collect(self.sessions())
+        except Exception as e:
+            print(f"Metrics exporter: refresh failed: {e}")
+            return
+        samples.append(("quest_caster_exporter_refresh_seconds", {}, self.refresh_seconds))
+        self.page = render(samples)
+        self.refresh_seconds = time.perf_counter() - t0
+        self.refreshed_at = time.monotonic()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self._refresher = threading.Thread(target=self._refresh_loop, name="MetricsRefresh", daemon=True)
+        self._refresher.start()
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="MetricsExporter", daemon=True)
+        self._server_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server_thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
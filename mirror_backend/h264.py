@@ -0,0 +1,168 @@
+"""Minimal Annex-B (raw H.264 byte stream) helpers.
+
+`adb exec-out screenrecord --output-format=h264` writes a plain Annex-B
+stream: NAL units separated by 00 00 01 / 00 00 00 01 start codes, no
+container. Only the little we need to relay and inspect that stream lives
+here -- NAL types and start-code splitting -- not a bitstream parser.
+"""
+
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+START_CODE = b"\x00\x00\x01"
+
+# 1 MiB comfortably holds the largest IDR screenrecord produces at 20 Mbps;
+# the buffer grows if a single NAL ever exceeds it.
+DEFAULT_BUFFER_SIZE = 1 << 20
+# Anything the device prints before the first start code (e.g.
+# "ERROR: INVALID_LAYER_STACK ...", see dump.h264) is kept up to this size.
+PREAMBLE_LIMIT = 4096
+
+
+def nal_type(nal) -> int:
+    """Type of a NAL unit that still carries its start code."""
+    offset = 4 if nal[2] == 0 else 3
+    return nal[offset] & 0x1F
+
+
+def is_first_slice(nal) -> bool:
+    """True if a slice NAL (with start code) begins a new picture.
+
+    first_mb_in_slice is the first ue(v) of the slice header; the value 0 is
+    coded as a single '1' bit, so the top bit of the byte after the NAL header
+    is set exactly when the slice starts the picture.
+    """
+    offset = 4 if nal[2] == 0 else 3
+    return len(nal) > offset + 1 and bool(nal[offset + 1] & 0x80)
+
+
+class AnnexBReader:
+    """Pull complete NAL units out of a byte stream through one reusable buffer.
+
+    `source` only needs `readinto()` (a raw pipe or socket file). Each call to
+    `read()` fills the buffer once and returns the NAL units that are now
+    complete as memoryview slices of that buffer -- no per-NAL copies. A NAL
+    is complete once the next start code has arrived, which is also the point
+    at which a decoder can consume it, so waiting for it adds no latency.
+
+    The returned views are only valid until the next `read()`; consumers that
+    keep data around must copy it.
+    """
+
+    def __init__(self, source, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._source = source
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._end = 0        # bytes of valid data in the buffer
+        self._scan = 0       # where the next start-code search resumes
+        self._nal_start = -1 # start of the pending (incomplete) NAL, -1 before the first
+        self._nal_type = 0
+        self.preamble = b""  # non-H.264 bytes seen before the first start code
+        self.bytes_read = 0
+
+    def set_source(self, source) -> None:
+        """Continue with a new stream; any incomplete NAL is discarded."""
+        self._source = source
+        self._end = 0
+        self._scan = 0
+        self._nal_start = -1
+
+    def read(self):
+        """Read once from the source.
+
+        Returns `(span, units)`: `units` is a list of `(nal_type, view)` for
+        every NAL completed by this read and `span` is the contiguous view
+        covering all of them (convenient for forwarding in one write). Returns
+        `None` at EOF.
+        """
+        self._make_room()
+        n = self._source.readinto(self._view[self._end:])
+        if not n:
+            return None
+        self.bytes_read += n
+        self._end += n
+        return self._split()
+
+    def flush(self):
+        """Return the trailing NAL at EOF (it has no following start code)."""
+        if self._nal_start < 0:
+            self._keep_preamble(self._end)
+            self._end = 0
+            return None
+        if self._nal_start >= self._end:
+            return None
+        tail = self._view[self._nal_start:self._end]
+        self._nal_start = self._end
+        return tail
+
+    def _split(self):
+        buf = self._buf
+        view = self._view
+        end = self._end
+        units = []
+        first = -1
+        last = -1
+        pos = self._scan
+        while True:
+            p = buf.find(START_CODE, pos, end)
+            if p < 0:
+                # Leave two bytes so a start code split across reads is found.
+                self._scan = max(pos, end - 2)
+                break
+            if p + 3 >= end:
+                # Header byte not here yet; revisit this start code next time.
+                self._scan = p
+                break
+            begin = p
+            if p > 0 and buf[p - 1] == 0 and (self._nal_start < 0 or p - 1 > self._nal_start + 3):
+                begin = p - 1  # 4-byte start code
+            if self._nal_start >= 0:
+                if first < 0:
+                    first = self._nal_start
+                units.append((self._nal_type, view[self._nal_start:begin]))
+                last = begin
+            elif begin > 0:
+                self._keep_preamble(begin)
+            self._nal_start = begin
+            self._nal_type = buf[p + 3] & 0x1F
+            pos = p + 3
+        if self._nal_start < 0 and self._scan > 1:
+            # No start code yet: what precedes the scan point is text (an error
+            # message), not video. Keep a copy and drop it from the buffer --
+            # all but the last byte, which may be the zero of a 4-byte code.
+            keep = self._scan - 1
+            self._keep_preamble(keep)
+            view[:end - keep] = view[keep:end]
+            self._end = end - keep
+            self._scan = 1
+        span = view[first:last] if units else view[0:0]
+        return span, units
+
+    def _keep_preamble(self, length: int) -> None:
+        room = PREAMBLE_LIMIT - len(self.preamble)
+        if room > 0:
+            self.preamble += bytes(self._view[:min(length, room)])
+
+    def _make_room(self) -> None:
+        if self._end < len(self._buf):
+            return
+        start = self._nal_start if self._nal_start >= 0 else self._scan
+        if start > 0:
+            # Slide the incomplete tail to the front (memoryview copies handle
+            # the overlap), so the buffer is reused rather than reallocated.
+            pending = self._end - start
+            self._view[:pending] = self._view[start:self._end]
+            self._end = pending
+            self._scan -= start
+            if self._nal_start >= 0:
+                self._nal_start = 0
+            return
+        # A single NAL larger than the whole buffer: grow it.
+        grown = bytearray(len(self._buf) * 2)
+        grown[:self._end] = self._view[:self._end]
+        self._buf = grown
+        self._view = memoryview(grown)
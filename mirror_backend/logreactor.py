@@ -0,0 +1,312 @@
+"""One reader for the stdout/stderr pipes of every child process.
+
+Each session used to start a daemon thread per pipe that decoded and
+printed every line; ffplay alone writes a status line several times a
+second, so 20 devices meant 40+ threads contending for stdout. Here one
+thread drains all registered pipes without blocking -- a selector on POSIX,
+PeekNamedPipe polling on Windows (anonymous pipes can't be selected there)
+-- splits the bytes into lines (on \\n and the \\r ffplay uses to redraw its
+status line) and turns them into LogRecords.
+
+Raw handlers see every record (e.g. to parse ffplay's status). Printing
+goes through a rate limit: a line with the same shape as the previous one
+from that pipe (same text apart from numbers) is printed at most every
+REPEAT_INTERVAL seconds with a count of what was skipped, and each pipe may
+print at most LINES_PER_SECOND lines on average.
+"""
+import os
+import re
+import selectors
+import socket
+import sys
+import threading
+import time
+
+REPEAT_INTERVAL = 5.0
+LINES_PER_SECOND = 20.0
+LINE_BURST = 50.0
+# Longest line kept; the rest of an overlong line is dropped.
+MAX_LINE = 4096
+READ_SIZE = 65536
+# Log output isn't latency sensitive: after each wake-up let the pipes fill
+# for this long, so one read picks up many lines instead of one wake-up per
+# status line per process. Also the polling interval on Windows.
+COALESCE_INTERVAL = 0.05
+
+# Numbers, with the padding in front of them (ffplay right-aligns its fields).
+_NUMBER = re.compile(rb"[ \t]*-?\d+(?:\.\d+)?")
+
+
+class LogRecord:
+    __slots__ = ("time", "source", "label", "text", "repeats")
+
+    def __init__(self, source, label, text, repeats=0):
+        self.time = time.time()
+        self.source = source
+        self.label = label
+        self.text = text
+        self.repeats = repeats
+
+    def __repr__(self):
+        return f"LogRecord({self.source!r}, {self.label!r}, {self.text!r})"
+
+
+class _Stream:
+    def __init__(self, fileobj, source, label, on_close):
+        self.fileobj = fileobj
+        self.fd = fileobj.fileno()
+        self.source = source
+        self.label = label
+        self.on_close = on_close
+        self.partial = b""
+        self.last_shape = None
+        self.last_printed = 0.0
+        self.repeats = 0
+        self.tokens = LINE_BURST
+        self.tokens_at = time.monotonic()
+        self.dropped = 0
+        self.handle = None  # Windows pipe handle
+
+
+class LogReactor:
+    def __init__(self):
+        self._streams = {}  # fd -> _Stream
+        self._pending = []
+        self._lock = threading.Lock()
+        self._handlers = []      # called for records that pass the rate limit
+        self._raw_handlers = []  # called for every record
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self.lines_in = 0
+        self.lines_out = 0
+        self.lines_suppressed = 0
+        self.bytes_in = 0
+        self.cpu_seconds = 0.0
+
+    def add_handler(self, fn, raw: bool = False) -> None:
+        """fn(record). raw=True: every line, before rate limiting."""
+        # Copy on write: handlers may remove themselves while being called.
+        with self._lock:
+            if raw:
+                self._raw_handlers = self._raw_handlers + [fn]
+            else:
+                self._handlers = self._handlers + [fn]
+
+    def remove_handler(self, fn) -> None:
+        with self._lock:
+            self._handlers = [h for h in self._handlers if h is not fn]
+            self._raw_handlers = [h for h in self._raw_handlers if h is not fn]
+
+    def add(self, fileobj, label: str, source: str = None, on_close=None) -> None:
+        """Drain `fileobj` (a pipe from Popen) until EOF; the reactor closes
+        it afterwards and calls on_close()."""
+        if fileobj is None:
+            return
+        stream = _Stream(fileobj, source, label, on_close)
+        with self._lock:
+            self._pending.append(stream)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="LogReactor", daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def stream_count(self) -> int:
+        return len(self._streams) + len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "streams": self.stream_count(),
+            "lines_in": self.lines_in,
+            "lines_out": self.lines_out,
+            "lines_suppressed": self.lines_suppressed,
+            "bytes_in": self.bytes_in,
+            "cpu_seconds": self.cpu_seconds,
+        }
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    # --- reading ---
+
+    def _take_pending(self) -> list:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def _run(self) -> None:
+        cpu0 = time.thread_time()
+        try:
+            if sys.platform == "win32":
+                self._run_windows(cpu0)
+            else:
+                self._run_selector(cpu0)
+        finally:
+            self.cpu_seconds = time.thread_time() - cpu0
+
+    def _run_selector(self, cpu0) -> None:
+        sel = selectors.DefaultSelector()
+        sel.register(self._wake_r, selectors.EVENT_READ, None)
+        try:
+            while not self._stop.is_set():
+                for stream in self._take_pending():
+                    os.set_blocking(stream.fd, False)
+                    self._streams[stream.fd] = stream
+                    sel.register(stream.fd, selectors.EVENT_READ, stream)
+                for key, _ in sel.select():
+                    stream = key.data
+                    if stream is None:
+                        try:
+                            while self._wake_r.recv(4096):
+                                pass
+                        except OSError:
+                            pass
+                        continue
+                    try:
+                        data = os.read(stream.fd, READ_SIZE)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        data = b""
+                    if data:
+                        self._feed(stream, data)
+                    else:
+                        sel.unregister(stream.fd)
+                        self._close(stream)
+                self.cpu_seconds = time.thread_time() - cpu0
+                self._stop.wait(COALESCE_INTERVAL)
+        finally:
+            sel.close()
+
+    def _run_windows(self, cpu0) -> None:
+        import msvcrt
+        import _winapi
+        while not self._stop.is_set():
+            for stream in self._take_pending():
+                stream.handle = msvcrt.get_osfhandle(stream.fd)
+                self._streams[stream.fd] = stream
+            for stream in list(self._streams.values()):
+                try:
+                    available, _ = _winapi.PeekNamedPipe(stream.handle, 0)
+                    data = os.read(stream.fd, min(available, READ_SIZE)) if available else None
+                except OSError:
+                    data = b""  # broken pipe: writer exited
+                if data:
+                    self._feed(stream, data)
+                elif data is not None:
+                    self._close(stream)
+            self.cpu_seconds = time.thread_time() - cpu0
+            self._stop.wait(COALESCE_INTERVAL)
+
+    def _close(self, stream) -> None:
+        self._streams.pop(stream.fd, None)
+        if stream.partial:
+            self._line(stream, stream.partial)
+            stream.partial = b""
+        self._flush_repeats(stream)
+        if stream.dropped:
+            self._emit(LogRecord(stream.source, stream.label, f"({stream.dropped} lines dropped)"))
+        try:
+            stream.fileobj.close()
+        except Exception:
+            pass
+        if stream.on_close:
+            try:
+                stream.on_close()
+            except Exception:
+                pass
+
+    # --- lines ---
+
+    def _feed(self, stream, data: bytes) -> None:
+        self.bytes_in += len(data)
+        data = stream.partial + data
+        lines = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n").split(b"\n")
+        stream.partial = lines.pop()[:MAX_LINE]
+        for raw in lines:
+            if raw.strip():
+                self._line(stream, raw[:MAX_LINE])
+
+    def _line(self, stream, raw: bytes) -> None:
+        self.lines_in += 1
+        record = None
+        if self._raw_handlers:
+            record = LogRecord(stream.source, stream.label, raw.decode("utf-8", errors="replace").strip())
+            for fn in self._raw_handlers:
+                try:
+                    fn(record)
+                except Exception:
+                    pass
+
+        now = time.monotonic()
+        shape = _NUMBER.sub(b"#", raw)
+        if shape == stream.last_shape:
+            if now - stream.last_printed < REPEAT_INTERVAL:
+                stream.repeats += 1
+                self.lines_suppressed += 1
+                return
+        else:
+            self._flush_repeats(stream)
+            stream.last_shape = shape
+
+        stream.tokens = min(LINE_BURST, stream.tokens + (now - stream.tokens_at) * LINES_PER_SECOND)
+        stream.tokens_at = now
+        if stream.tokens < 1.0:
+            stream.dropped += 1
+            self.lines_suppressed += 1
+            return
+        stream.tokens -= 1.0
+
+        if record is None:
+            record = LogRecord(stream.source, stream.label, raw.decode("utf-8", errors="replace").strip())
+        record.repeats = stream.repeats
+        if stream.dropped:
+            record.text += f" (+{stream.dropped} lines dropped)"
+            stream.dropped = 0
+        stream.repeats = 0
+        stream.last_printed = now
+        self._emit(record)
+
+    def _flush_repeats(self, stream) -> None:
+        """Report similar lines skipped since the last printed one."""
+        if stream.repeats:
+            self._emit(LogRecord(stream.source, stream.label, f"({stream.repeats} similar lines skipped)"))
+            stream.repeats = 0
+
+    def _emit(self, record) -> None:
+        self.lines_out += 1
+        for fn in self._handlers:
+            try:
+                fn(record)
+            except Exception:
+                pass
+
+
+def print_record(record) -> None:
+    text = record.text
+    if record.repeats:
+        text += f" (+{record.repeats} similar lines skipped)"
+    print(f"[{record.label}] {text}")
+
+
+_reactor = None
+_reactor_lock = threading.Lock()
+
+
+def get_reactor() -> LogReactor:
+    """Process-wide reactor, printing rate-limited lines by default."""
+    global _reactor
+    with _reactor_lock:
+        if _reactor is None:
+            _reactor = LogReactor()
+            _reactor.add_handler(print_record)
+        return _reactor
@@ -0,0 +1,221 @@
+"""Per-device stream metrics measured on the relay path.
+
+A StreamMetrics is a relay listener: for every NAL it sees it updates a few
+counters and fixed-size rings. Rings are `array.array`s written in place
+(no object per sample), so memory per device is fixed and the relay thread
+does a handful of arithmetic operations per NAL.
+
+Per frame: arrival time, encoded size and the gap to the previous frame.
+Per second: bytes and frames received. Per keyframe: interval and GOP
+length in frames. Plus a log2 histogram of NAL sizes.
+
+snapshot() turns that into plain numbers (bitrate, fps, IDR interval,
+largest frame, arrival jitter) for the UI or an exporter to poll.
+"""
+import array
+import math
+import threading
+import time
+
+from .h264 import NAL_IDR, NAL_SLICE, is_first_slice
+
+# Per-frame rings: ~10 s at 60 fps.
+FRAME_RING = 600
+# Per-second rings.
+SECOND_RING = 120
+# Per-keyframe rings.
+KEYFRAME_RING = 32
+# Seconds averaged for bitrate/fps in snapshot().
+RATE_WINDOW = 5
+# NAL size histogram buckets: bucket i counts sizes with bit_length() == i.
+HISTOGRAM_BUCKETS = 32
+
+
+class Ring:
+    """Fixed-size ring over an array.array of `typecode`."""
+
+    __slots__ = ("data", "size", "count", "pos")
+
+    def __init__(self, typecode: str, size: int):
+        self.data = array.array(typecode, bytes(array.array(typecode).itemsize * size))
+        self.size = size
+        self.count = 0
+        self.pos = 0
+
+    def append(self, value) -> None:
+        self.data[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def last(self, default=None):
+        if not self.count:
+            return default
+        return self.data[self.pos - 1]
+
+    def values(self, n: int = None) -> list:
+        """The last `n` (default all) values, oldest first."""
+        n = self.count if n is None else min(n, self.count)
+        start = self.pos - n
+        if start >= 0:
+            return self.data[start:self.pos].tolist()
+        return self.data[start:].tolist() + self.data[:self.pos].tolist()
+
+    def __len__(self):
+        return self.count
+
+
+class StreamMetrics:
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.started_at = time.monotonic()
+        self.frame_arrival = Ring("d", FRAME_RING)
+        self.frame_gap = Ring("d", FRAME_RING)
+        self.frame_bytes = Ring("I", FRAME_RING)
+        self.second_bytes = Ring("Q", SECOND_RING)
+        self.second_frames = Ring("I", SECOND_RING)
+        self.idr_interval = Ring("d", KEYFRAME_RING)
+        self.gop_frames = Ring("I", KEYFRAME_RING)
+        self.nal_histogram = array.array("Q", bytes(8 * HISTOGRAM_BUCKETS))
+
+        self.bytes = 0
+        self.frames = 0
+        self.keyframes = 0
+        self.max_frame_bytes = 0
+        self._frame_open = False
+        self._frame_size = 0
+        self._last_frame_at = None
+        self._last_idr_at = None
+        self._frames_since_idr = 0
+        self._second = int(self.started_at)
+        self._second_bytes = 0
+        self._second_frames = 0
+
+    # --- relay listener (relay thread) ---
+
+    def on_nal(self, t: int, nal, ts: float) -> None:
+        size = len(nal)
+        self.bytes += size
+        self.nal_histogram[min(size.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        second = int(ts)
+        if second != self._second:
+            self._roll(second)
+        self._second_bytes += size
+
+        if t == NAL_SLICE or t == NAL_IDR:
+            if is_first_slice(nal):
+                self._close_frame()
+                self._frame_open = True
+                self.frames += 1
+                self._second_frames += 1
+                if self._last_frame_at is not None:
+                    self.frame_gap.append(ts - self._last_frame_at)
+                self._last_frame_at = ts
+                self.frame_arrival.append(ts)
+                if t == NAL_IDR:
+                    self.keyframes += 1
+                    if self._last_idr_at is not None:
+                        self.idr_interval.append(ts - self._last_idr_at)
+                        self.gop_frames.append(self._frames_since_idr)
+                    self._last_idr_at = ts
+                    self._frames_since_idr = 0
+                self._frames_since_idr += 1
+            self._frame_size += size
+        else:
+            # SPS/PPS/SEI/AUD: the previous frame is complete.
+            self._close_frame()
+
+    def _close_frame(self) -> None:
+        if self._frame_open:
+            self.frame_bytes.append(self._frame_size)
+            if self._frame_size > self.max_frame_bytes:
+                self.max_frame_bytes = self._frame_size
+            self._frame_open = False
+        self._frame_size = 0
+
+    def _roll(self, second: int) -> None:
+        self.second_bytes.append(self._second_bytes)
+        self.second_frames.append(self._second_frames)
+        # Seconds without any data count as zero.
+        for _ in range(min(second - self._second - 1, SECOND_RING)):
+            self.second_bytes.append(0)
+            self.second_frames.append(0)
+        self._second = second
+        self._second_bytes = 0
+        self._second_frames = 0
+
+    # --- readers ---
+
+    @staticmethod
+    def _recent(ring: Ring, pending: int, missing: int) -> list:
+        if not missing:
+            return ring.values(RATE_WINDOW)
+        zeros = min(missing - 1, RATE_WINDOW)
+        values = ring.values(max(0, RATE_WINDOW - 1 - zeros)) + [pending] + [0] * zeros
+        return values[-RATE_WINDOW:]
+
+    def snapshot(self, now: float = None) -> dict:
+        now = time.monotonic() if now is None else now
+        # Complete seconds only. If the stream stalled, the bucket still open
+        # and the seconds since then (zero) are complete too.
+        missing = max(0, int(now) - self._second)
+        recent_bytes = self._recent(self.second_bytes, self._second_bytes, missing)
+        recent_frames = self._recent(self.second_frames, self._second_frames, missing)
+        window = max(1, len(recent_bytes))
+        gaps = self.frame_gap.values()
+        jitter = 0.0
+        if len(gaps) > 1:
+            mean = sum(gaps) / len(gaps)
+            jitter = math.sqrt(sum((g - mean) ** 2 for g in gaps) / (len(gaps) - 1))
+        sizes = self.frame_bytes.values()
+        return {
+            "serial": self.serial,
+            "uptime_s": now - self.started_at,
+            "bytes": self.bytes,
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "bitrate_bps": 8 * sum(recent_bytes) / window,
+            "fps": sum(recent_frames) / window,
+            "idr_interval_s": self.idr_interval.last(),
+            "gop_frames": self.gop_frames.last(),
+            "max_frame_bytes": max(sizes) if sizes else 0,
+            "max_frame_bytes_total": self.max_frame_bytes,
+            "mean_frame_bytes": sum(sizes) / len(sizes) if sizes else 0,
+            "frame_gap_ms": 1000 * (sum(gaps) / len(gaps)) if gaps else None,
+            "jitter_ms": 1000 * jitter,
+            "last_frame_age_s": now - self._last_frame_at if self._last_frame_at is not None else None,
+            "nal_size_histogram": {1 << (i - 1) if i else 0: n for i, n in enumerate(self.nal_histogram) if n},
+        }
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def attach(serial: str, relay) -> StreamMetrics:
+    """Start collecting for `serial` from `relay` (replaces earlier metrics
+    for that serial)."""
+    m = StreamMetrics(serial)
+    relay.add_listener(m.on_nal)
+    with _metrics_lock:
+        _metrics[serial] = m
+    return m
+
+
+def detach(serial: str, metrics: StreamMetrics = None) -> None:
+    """Forget `serial` (only if it still maps to `metrics`, when given)."""
+    with _metrics_lock:
+        if metrics is None or _metrics.get(serial) is metrics:
+            _metrics.pop(serial, None)
+
+
+def get(serial: str):
+    return _metrics.get(serial)
+
+
+def snapshots() -> dict:
+    """{serial: snapshot()} for every device being measured."""
+    with _metrics_lock:
+        items = list(_metrics.items())
+    now = time.monotonic()
+    return {serial: m.snapshot(now) for serial, m in items}
@@ -0,0 +1,269 @@
+"""Mosaic view: many headsets in one grid window (classroom supervision).
+
+Instead of one ffplay per headset (its own decoder, v360, SDL window), every
+device gets a headless decoder that shrinks its stream to one tile of the
+grid, and one compositor thread lays the newest frame of each tile into a
+single canvas:
+
+    per device: broker subscription -> ffmpeg (decode, eye crop, downscale,
+                correction at tile size) -> rgb24 tile -> FrameRing
+    compositor: newest frame of each ring -> canvas -> sink (one window)
+
+Per-tile downscaling happens before the correction, so v360 interpolates a
+tile's worth of pixels instead of a full 720x720 frame per headset. Tiles
+that haven't changed since the last canvas are not copied again, and a
+canvas with no new tile isn't sent; a device that can't start keeps a black
+tile and the others run on. The sink is the
+virtual camera's (virtual_camera.py: null, file:<path>, pyvirtualcam) or
+"window": an ffplay showing the rawvideo canvas.
+"""
+import math
+import subprocess
+import threading
+import time
+
+from .broker import acquire_broker, release_broker, POLICY_DROP_TO_IDR
+from .logreactor import get_reactor
+from . import procgroup
+from .screenrecord import ScreenRecordBackend
+from .utils import get_player_path
+from . import virtual_camera
+from .virtual_camera import FrameRing, read_frames
+
+DEFAULT_SIZE = (1920, 1080)
+DEFAULT_FPS = 30
+# Tile decoders: one thread each (N of them already use the cores; frame
+# threads would add a frame of latency and their own buffers per device)
+# and no deblocking, which is invisible once the frame is a tile.
+TILE_DECODER_ARGS = ("-threads", "1", "-skip_loop_filter", "all")
+
+
+def grid(n: int, width: int, height: int):
+    """(cols, rows, tile_w, tile_h) for n tiles on a width x height canvas;
+    tile sizes are even (yuv420p decoders)."""
+    cols = max(1, math.ceil(math.sqrt(n)))
+    rows = max(1, math.ceil(n / cols))
+    return cols, rows, (width // cols) & ~1, (height // rows) & ~1
+
+
+def tile_filters(options: dict, tile_w: int, tile_h: int) -> list:
+    """The player's -vf chain for `options`, shrunk to a tile: the eye crop
+    is downscaled first, the correction then renders at tile size, and the
+    result is letterboxed into tile_w x tile_h."""
+    side = min(tile_w, tile_h)
+    vf = ScreenRecordBackend._build_video_filters(dict(options, out_size=side, remap=False))
+    vf = [f for f in vf if f != "setpts=0"]
+    if vf and vf[0].startswith("crop="):
+        crop_size = int(vf[0][len("crop="):].split(":")[0])
+        if crop_size > side:
+            vf.insert(1, f"scale={side}:{side}:flags=area")
+    vf.append(f"scale={tile_w}:{tile_h}:force_original_aspect_ratio=decrease")
+    vf.append(f"pad={tile_w}:{tile_h}:(ow-iw)/2:(oh-ih)/2")
+    return vf
+
+
+class WindowSink:
+    """The canvas in one ffplay window (rawvideo on its stdin)."""
+
+    def __init__(self, width: int, height: int, fps: float, title: str, group: procgroup.ProcessGroup):
+        self.proc = group.popen(
+            [get_player_path(), "-f", "rawvideo", "-pixel_format", "rgb24",
+             "-video_size", f"{width}x{height}", "-framerate", f"{fps:g}",
+             "-framedrop", "-sync", "ext", "-i", "-", "-window_title", title],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        get_reactor().add(self.proc.stderr, label="MosaicPlayer", source=title)
+
+    @property
+    def closed(self) -> bool:
+        """The window was closed (ffplay exited)."""
+        return self.proc.poll() is not None
+
+    def send(self, frame) -> None:
+        self.proc.stdin.write(frame)
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+
+class Tile:
+    def __init__(self, serial: str, index: int, rect):
+        self.serial = serial
+        self.index = index
+        self.rect = rect  # (x, y, w, h) on the canvas
+        self.ring = FrameRing(rect[2], rect[3])
+        self.broker = None
+        self.subscriber = None
+        self.decoder = None
+        self.error = None
+        self.shown = 0  # seq of the frame on the canvas
+
+    @property
+    def running(self) -> bool:
+        return self.decoder is not None and self.decoder.poll() is None
+
+
+class MosaicView:
+    def __init__(self, size=DEFAULT_SIZE, fps: float = DEFAULT_FPS, sink="window",
+                 title: str = "Mosaic", on_close=None):
+        self.width, self.height = size
+        self.fps = fps
+        self.sink_spec = sink
+        self.title = title
+        self.tiles = []
+        self.sink = None
+        self.canvas = None
+        self.composed = 0
+        self._group = procgroup.ProcessGroup()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._active = False
+        self._stop_lock = threading.Lock()  # stop() runs from the UI or the compositor
+        # on_close(view), on the compositor thread, after the output was
+        # closed from outside (window closed) and the view stopped itself.
+        self.on_close = on_close
+
+    def start(self, devices: dict) -> None:
+        """Show {serial: start options} (per-device filters, capture
+        settings) as one grid."""
+        import numpy as np
+        self._active = True
+        cols, rows, tile_w, tile_h = grid(len(devices), self.width, self.height)
+        self.tiles = []
+        self.composed = 0
+        self.canvas = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        if self.sink_spec == "window":
+            self.sink = WindowSink(self.width, self.height, self.fps, self.title, self._group)
+        else:
+            self.sink = virtual_camera.make_sink({"vcam_sink": self.sink_spec},
+                                                 self.width, self.height, self.fps)
+        # Captures start in parallel: a classroom's worth would take ~0.5 s
+        # each one after the other.
+        threads = []
+        for i, (serial, options) in enumerate(devices.items()):
+            rect = ((i % cols) * tile_w, (i // cols) * tile_h, tile_w, tile_h)
+            tile = Tile(serial, i, rect)
+            self.tiles.append(tile)
+            t = threading.Thread(target=self._start_tile, args=(tile, options),
+                                 name=f"MosaicStart-{serial}", daemon=True)
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        print(f"[{time.strftime('%H:%M:%S')}] Mosaic: {len(devices)} device(s) in a {cols}x{rows} grid "
+              f"of {tile_w}x{tile_h} tiles")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._compose, name="Mosaic", daemon=True)
+        self._thread.start()
+
+    def _start_tile(self, tile: Tile, options: dict) -> None:
+        try:
+            self._open_tile(tile, options)
+        except Exception as e:
+            tile.error = str(e)
+            print(f"[{time.strftime('%H:%M:%S')}] Mosaic: {tile.serial} not shown: {e}")
+
+    def _open_tile(self, tile: Tile, options: dict) -> None:
+        _, _, w, h = tile.rect
+        tile.broker = acquire_broker(tile.serial, options)
+        try:
+            tile.decoder = self._group.popen(
+                virtual_camera.build_decoder_cmd(options, w, h, tile_filters(options, w, h),
+                                                 TILE_DECODER_ARGS),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except Exception:
+            release_broker(tile.broker)
+            tile.broker = None
+            raise
+        threading.Thread(target=read_frames, args=(tile.ring, tile.decoder.stdout),
+                         name=f"MosaicRead-{tile.serial}", daemon=True).start()
+        tile.subscriber = tile.broker.subscribe(name=f"mosaic {tile.serial}", policy=POLICY_DROP_TO_IDR)
+        tile.subscriber.pipe_to(tile.decoder.stdin)
+        get_reactor().add(tile.decoder.stderr, label="MosaicDecoder", source=tile.serial)
+
+    def _compose(self) -> None:
+        interval = 1.0 / self.fps
+        next_at = time.monotonic()
+        while not self._stopping.is_set():
+            changed = False
+            for tile in self.tiles:
+                item = tile.ring.take(0)
+                if item is not None:
+                    x, y, w, h = tile.rect
+                    self.canvas[y:y + h, x:x + w] = item[1]
+                    tile.shown = item[0]
+                    changed = True
+            if getattr(self.sink, "closed", False):
+                self._output_closed("window closed")
+                return
+            if changed:
+                try:
+                    self.sink.send(self.canvas)
+                except (OSError, ValueError) as e:
+                    self._output_closed(e)
+                    return
+                self.composed += 1
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                self._stopping.wait(delay)
+            else:
+                next_at = time.monotonic()  # behind: don't try to catch up
+
+    def _output_closed(self, reason) -> None:
+        # Nobody is watching: release the captures and decoders too.
+        if self._stopping.is_set():
+            return  # being stopped already
+        print(f"[{time.strftime('%H:%M:%S')}] Mosaic output closed: {reason}")
+        self.stop()
+        if self.on_close is not None:
+            self.on_close(self)
+
+    def is_running(self) -> bool:
+        """From start() until stop(), including the view stopping itself
+        when its output is closed."""
+        return self._active
+
+    def serials(self) -> set:
+        """The devices shown (their captures are the brokers')."""
+        return {tile.serial for tile in self.tiles}
+
+    def stop(self) -> None:
+        with self._stop_lock:
+            self._stop()
+
+    def _stop(self) -> None:
+        self._active = False
+        self._stopping.set()
+        for tile in self.tiles:
+            if tile.subscriber is not None:
+                tile.subscriber.close()
+                tile.subscriber = None
+            if tile.broker is not None:
+                release_broker(tile.broker)
+                tile.broker = None
+        self._group.kill()
+        self._group.wait(1.0)
+        self._group.close()
+        self._group = procgroup.ProcessGroup()
+        if self._thread is not None:
+            if self._thread is not threading.current_thread():
+                self._thread.join(2.0)
+            self._thread = None
+        for tile in self.tiles:
+            tile.ring.close()
+            tile.decoder = None
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def stats(self) -> dict:
+        return {
+            "composed": self.composed,
+            "tiles": [{"serial": t.serial, "frames": t.ring.published, "dropped": t.ring.dropped,
+                       "error": t.error} for t in self.tiles],
+        }
@@ -0,0 +1,165 @@
+"""Decoder-side metrics from ffplay's status line.
+
+ffplay redraws a status line on stderr about every 30 ms:
+
+     12.34 M-V:  0.003 fd=   5 aq=    0KB vq=   12KB sq=    0B f=0/0
+
+clock time, clock drift (M-V with -sync ext), frames dropped so far (fd,
+cumulative; -framedrop), audio/video/subtitle queue sizes and, in older
+builds, pts/dts faults. The log reactor hands every stderr line of a
+"Player" pipe to this module (raw handler), and each device gets a
+PlayerStats with the latest values and bounded rings of recent samples.
+
+Next to the relay's input-side metrics (metrics.py) that tells where a
+laggy headset is limited: frames not arriving (network/device), arriving
+but queueing up in ffplay (decoder too slow), or dropped at display (host
+CPU / render loop); see classify().
+"""
+import re
+import threading
+import time
+
+from .metrics import Ring
+
+STATUS_RE = re.compile(
+    r"^\s*(?P<clock>-?[\d.]+|nan)\s+(?P<kind>M-V|A-V|M-A|   |\s*):\s*(?P<drift>-?[\d.]+|nan)\s+"
+    r"fd=\s*(?P<fd>\d+)\s+aq=\s*(?P<aq>\d+)KB\s+vq=\s*(?P<vq>\d+)KB\s+sq=\s*(?P<sq>\d+)B"
+    r"(?:\s+f=(?P<faults>\d+)/(?P<faults2>\d+))?"
+)
+
+# ~10 s of samples at ffplay's ~30 status lines/s.
+SAMPLE_RING = 320
+# Seconds of samples used for rates and averages in snapshot().
+RATE_WINDOW = 5.0
+
+
+def parse_status(text: str):
+    """(clock, drift_s, frames_dropped, aq_kb, vq_kb, sq_bytes) or None."""
+    m = STATUS_RE.match(text)
+    if not m:
+        return None
+    try:
+        drift = float(m.group("drift"))
+    except ValueError:
+        drift = 0.0
+    if drift != drift:  # nan before the clocks are set
+        drift = 0.0
+    return (m.group("clock"), drift, int(m.group("fd")), int(m.group("aq")),
+            int(m.group("vq")), int(m.group("sq")))
+
+
+class PlayerStats:
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.samples = 0
+        self.frames_dropped = 0
+        self.drift_s = 0.0
+        self.vq_kb = 0
+        self.aq_kb = 0
+        self.updated_at = None
+        self.sample_time = Ring("d", SAMPLE_RING)
+        self.drift = Ring("d", SAMPLE_RING)
+        self.dropped = Ring("I", SAMPLE_RING)
+        self.video_queue = Ring("I", SAMPLE_RING)
+
+    def update(self, parsed, ts: float) -> None:
+        _, drift, fd, aq, vq, _ = parsed
+        self.samples += 1
+        self.frames_dropped = fd
+        self.drift_s = drift
+        self.vq_kb = vq
+        self.aq_kb = aq
+        self.updated_at = ts
+        self.sample_time.append(ts)
+        self.drift.append(drift)
+        self.dropped.append(fd)
+        self.video_queue.append(vq)
+
+    def snapshot(self, now: float = None) -> dict:
+        now = time.monotonic() if now is None else now
+        times = self.sample_time.values()
+        recent = sum(1 for t in times if now - t <= RATE_WINDOW)
+        drops = self.dropped.values(recent)
+        queue = self.video_queue.values(recent)
+        drift = self.drift.values(recent)
+        span = times[-1] - times[-recent] if recent > 1 else 0.0
+        return {
+            "serial": self.serial,
+            "samples": self.samples,
+            "frames_dropped": self.frames_dropped,
+            "drop_rate": (drops[-1] - drops[0]) / span if span > 0 else 0.0,
+            "drift_ms": 1000 * self.drift_s,
+            "max_abs_drift_ms": 1000 * max((abs(d) for d in drift), default=0.0),
+            "vq_kb": self.vq_kb,
+            "mean_vq_kb": sum(queue) / len(queue) if queue else 0.0,
+            "aq_kb": self.aq_kb,
+            "status_age_s": now - self.updated_at if self.updated_at is not None else None,
+        }
+
+
+def classify(stream: dict, player: dict, expected_fps: float = None) -> str:
+    """Rough bottleneck from a metrics.py snapshot and a PlayerStats one.
+
+    "input"   -- too few frames arrive (network, USB or the device encoder)
+    "decoder" -- frames arrive but pile up in ffplay's video queue
+    "render"  -- frames are decoded but dropped at display (host CPU/GPU)
+    "ok"
+    """
+    fps = stream.get("fps") or 0.0
+    if expected_fps is None:
+        gap = stream.get("frame_gap_ms")
+        expected_fps = 1000.0 / gap if gap else fps
+    if player and player.get("drop_rate", 0.0) > max(1.0, 0.05 * fps):
+        return "render"
+    if player and player.get("mean_vq_kb", 0.0) > 1024:
+        return "decoder"
+    if expected_fps and fps < 0.7 * expected_fps:
+        return "input"
+    if (stream.get("last_frame_age_s") or 0.0) > 1.0:
+        return "input"
+    return "ok"
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+_reactors = []  # reactors _on_record is registered with
+
+
+def _on_record(record) -> None:
+    if record.label != "Player" or not record.source:
+        return
+    parsed = parse_status(record.text)
+    if parsed is None:
+        return
+    stats = _stats.get(record.source)
+    if stats is not None:
+        stats.update(parsed, time.monotonic())
+
+
+def attach(serial: str, reactor) -> PlayerStats:
+    """Collect status lines of `serial`'s player from `reactor` (its pipe
+    must be registered with label "Player" and source=serial)."""
+    stats = PlayerStats(serial)
+    with _stats_lock:
+        _stats[serial] = stats
+        if not any(r is reactor for r in _reactors):
+            reactor.add_handler(_on_record, raw=True)
+            _reactors.append(reactor)
+    return stats
+
+
+def detach(serial: str, stats: PlayerStats = None) -> None:
+    with _stats_lock:
+        if stats is None or _stats.get(serial) is stats:
+            _stats.pop(serial, None)
+
+
+def get(serial: str):
+    return _stats.get(serial)
+
+
+def snapshots() -> dict:
+    with _stats_lock:
+        items = list(_stats.items())
+    now = time.monotonic()
+    return {serial: s.snapshot(now) for serial, s in items}
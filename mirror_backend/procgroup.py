@@ -0,0 +1,174 @@
+"""Kill a session's processes as one unit.
+
+A session's processes (adb exec-out, rollover replacements, the player) are
+started in a process group of their own on POSIX (start_new_session) and
+put in one job object per session on Windows. stop() then kills each of
+them together with anything they started using one killpg() or a single
+TerminateJobObject(). There is no tasklist/taskkill round-trip, no window
+title lookup and no settle sleep. When a job object can't be created (or a
+process can't be assigned to one), the Windows fallback is
+`taskkill /F /T /PID` per process.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .utils import NO_WINDOW
+
+
+def popen(args, **kwargs) -> subprocess.Popen:
+    """subprocess.Popen in a new process group (POSIX), so the process and
+    its children can later be killed together via ProcessGroup."""
+    if sys.platform != "win32":
+        kwargs.setdefault("start_new_session", True)
+    kwargs.setdefault("creationflags", NO_WINDOW)
+    return subprocess.Popen(args, **kwargs)
+
+
+# How a member is killed.
+_JOB = "job"          # TerminateJobObject (Windows)
+_GROUP = "group"      # killpg (POSIX, started by popen())
+_PROCESS = "process"  # the process (tree) alone
+
+
+def _leads_group(proc) -> bool:
+    # Only a process started with start_new_session may be killpg()'d --
+    # anything else shares the app's own group.
+    try:
+        return os.getpgid(proc.pid) == proc.pid
+    except OSError:
+        return False
+
+
+def _group_alive(pgid: int) -> bool:
+    # The kernel doesn't hand out a pid that is still some group's id, so
+    # while this says True the group is still ours.
+    try:
+        os.killpg(pgid, 0)
+    except OSError:  # ProcessLookupError: empty; PermissionError: not ours
+        return False
+    return True
+
+
+class ProcessGroup:
+    def __init__(self):
+        self._members = []  # [(Popen, how it is killed)]
+        self._lock = threading.Lock()
+        self._job = _create_job() if sys.platform == "win32" else None
+
+    def popen(self, args, **kwargs) -> subprocess.Popen:
+        proc = popen(args, **kwargs)
+        self.add(proc)
+        return proc
+
+    def add(self, proc) -> None:
+        """Make `proc` (e.g. an adopted standby player) a member."""
+        if self._job is not None and _assign(self._job, proc):
+            how = _JOB
+        elif sys.platform != "win32" and _leads_group(proc):
+            how = _GROUP
+        else:
+            how = _PROCESS
+        with self._lock:
+            self._members = [m for m in self._members if self._live(m)]
+            self._members.append((proc, how))
+
+    @staticmethod
+    def _live(member) -> bool:
+        # An exited group leader stays while its group has members, so
+        # kill() can still killpg() children it left behind; after that its
+        # pid may be reused and it has to go.
+        proc, how = member
+        if proc.poll() is None:
+            return True
+        return how == _GROUP and _group_alive(proc.pid)
+
+    def kill(self) -> None:
+        """Kill every member and its descendants; doesn't wait (see
+        wait())."""
+        with self._lock:
+            self._members = [m for m in self._members if self._live(m)]
+            members = list(self._members)
+        if any(how == _JOB for _, how in members):
+            _terminate_job(self._job)
+        for proc, how in members:
+            try:
+                if how == _GROUP:
+                    # Also reaches children left behind by a leader that
+                    # already exited: the group id stays reserved while any
+                    # member is alive.
+                    os.killpg(proc.pid, signal.SIGKILL)
+                elif how == _PROCESS and proc.poll() is None:
+                    if sys.platform == "win32":
+                        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                       check=False, creationflags=NO_WINDOW)
+                    else:
+                        proc.kill()
+            except (OSError, subprocess.SubprocessError):
+                pass
+
+    def wait(self, timeout: float) -> bool:
+        """Reap the members; False if any is still alive after `timeout`."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            members = list(self._members)
+        for proc, _ in members:
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                return False
+        return True
+
+    def close(self) -> None:
+        """Forget the members (after kill()/wait()) and free the job."""
+        with self._lock:
+            self._members = []
+        if self._job is not None:
+            _close_job(self._job)
+            self._job = None
+
+
+# --- Windows job objects ---
+
+def _kernel32():
+    import ctypes
+    from ctypes import wintypes
+    k = ctypes.WinDLL("kernel32", use_last_error=True)
+    k.CreateJobObjectW.restype = wintypes.HANDLE
+    k.CreateJobObjectW.argtypes = (ctypes.c_void_p, wintypes.LPCWSTR)
+    k.AssignProcessToJobObject.argtypes = (wintypes.HANDLE, wintypes.HANDLE)
+    k.TerminateJobObject.argtypes = (wintypes.HANDLE, wintypes.UINT)
+    k.CloseHandle.argtypes = (wintypes.HANDLE,)
+    return k
+
+
+def _create_job():
+    try:
+        return _kernel32().CreateJobObjectW(None, None) or None
+    except (OSError, AttributeError):
+        return None
+
+
+def _assign(job, proc) -> bool:
+    try:
+        return bool(_kernel32().AssignProcessToJobObject(job, int(proc._handle)))
+    except (OSError, AttributeError):
+        return False
+
+
+def _terminate_job(job) -> bool:
+    try:
+        return bool(_kernel32().TerminateJobObject(job, 1))
+    except (OSError, AttributeError):
+        return False
+
+
+def _close_job(job) -> None:
+    try:
+        _kernel32().CloseHandle(job)
+    except (OSError, AttributeError):
+        pass
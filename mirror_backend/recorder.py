@@ -0,0 +1,297 @@
+"""Session recording: the encoded stream in bounded, indexed segments.
+
+screenrecord's output is bare Annex-B H.264: no container, no index, so a
+player can only find a frame by parsing from the start. SegmentRecorder is a
+relay listener that writes the stream, without re-encoding, to segment
+files and notes where each keyframe went:
+
+    <dir>/<serial>-<YYYYmmdd-HHMMSS>-<n>.h264   the stream
+    <dir>/<serial>-<YYYYmmdd-HHMMSS>-<n>.idx    its keyframe index
+
+The relay thread only copies each NAL onto a queue; a writer thread does
+the file I/O. A segment is closed at the first keyframe after it passes
+`max_bytes` or `max_seconds`, so each one starts with SPS/PPS + IDR and
+plays on its own. The stream is written as received, except that the
+parameter sets are repeated before an IDR that doesn't carry them
+(MediaCodec sends them once per screenrecord): any indexed keyframe is a
+point a decoder can start from.
+
+Index: a 16-byte header (b"QSCIDX1\\0", then the segment's start as
+microseconds since the epoch, uint64 LE) and one (byte offset, microseconds
+since the start) uint64 LE pair per keyframe. Pairs are appended as the
+keyframe is written, so a recording cut short still has an index for
+everything it wrote.
+
+Segment reads one back: the .h264 mmap'd, the index as array('Q'). seek,
+trim and thumbnails go straight to the nearest keyframe.
+"""
+import array
+import bisect
+import mmap
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from .h264 import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS, is_first_slice
+from .utils import get_ffmpeg_path
+
+INDEX_MAGIC = b"QSCIDX1\0"
+INDEX_HEADER = 16
+INDEX_RECORD = 16
+DEFAULT_SEGMENT_BYTES = 256 << 20
+DEFAULT_SEGMENT_SECONDS = 600.0
+# Encoded bytes waiting for the writer before the recorder drops to the next
+# keyframe (a stalled disk must not grow memory without bound).
+MAX_QUEUE_BYTES = 64 << 20
+
+
+def index_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".idx"
+
+
+def _pack(values) -> bytes:
+    a = array.array("Q", values)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tobytes()
+
+
+def write_index(path: str, start_time: float, offsets, times) -> None:
+    """A whole index at once (`times` in microseconds into the segment)."""
+    with open(path, "wb") as f:
+        f.write(INDEX_MAGIC + _pack((int(start_time * 1e6),)))
+        f.write(_pack(v for pair in zip(offsets, times) for v in pair))
+
+
+def file_stem(serial: str) -> str:
+    """`serial` usable in a file name (wireless serials are host:port)."""
+    return serial.replace(":", "_")
+
+
+def read_index(path: str):
+    """(start time in seconds since the epoch, offsets, times) of an index;
+    offsets and times (microseconds into the segment) are array('Q')."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < INDEX_HEADER or data[:8] != INDEX_MAGIC:
+        raise ValueError(f"not a segment index: {path}")
+    body = array.array("Q")
+    # A record cut off by a crash is ignored.
+    body.frombytes(data[8:len(data) - (len(data) - INDEX_HEADER) % INDEX_RECORD])
+    if sys.byteorder == "big":
+        body.byteswap()
+    return body[0] / 1e6, body[1::2], body[2::2]
+
+
+class SegmentRecorder:
+    def __init__(self, directory: str, serial: str, max_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 max_seconds: float = DEFAULT_SEGMENT_SECONDS):
+        self.directory = directory
+        self.serial = serial
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.paths = []      # segments started, oldest first
+        self.bytes_written = 0
+        self.keyframes = 0
+        self.dropped = 0     # NALs not recorded (queue full, until the next keyframe)
+        self.error = None
+        self._queue = queue.SimpleQueue()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._resync = False
+        self._closed = False
+        self._stamp = time.strftime("%Y%m%d-%H%M%S")
+        # Writer thread state.
+        self._f = None
+        self._idx = None
+        self._seg_bytes = 0
+        self._seg_start = 0.0
+        self._rotate = False
+        self._pending = []   # non-slice NALs since the last slice
+        self._sps = None
+        self._pps = None
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"Recorder-{serial}", daemon=True)
+        self._thread.start()
+
+    # --- relay listener (relay thread) ---
+
+    def on_nal(self, t: int, nal, ts: float) -> None:
+        if self._closed:
+            return
+        if self._resync:
+            if t != NAL_SPS and not (t == NAL_IDR and is_first_slice(nal)):
+                self.dropped += 1
+                return
+            self._resync = False
+        size = len(nal)
+        with self._lock:
+            if self._queued + size > MAX_QUEUE_BYTES:
+                self._resync = True
+                self.dropped += 1
+                return
+            self._queued += size
+        self._queue.put((t, bytes(nal), ts))
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write what is queued and close the current segment."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # --- writer thread ---
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                t, data, ts = item
+                with self._lock:
+                    self._queued -= len(data)
+                if self.error is None:
+                    try:
+                        self._write(t, data, ts)
+                    except OSError as e:
+                        self.error = e
+                        print(f"[{time.strftime('%H:%M:%S')}] Recording of {self.serial} stopped: {e}")
+        finally:
+            self._close_segment()
+
+    def _write(self, t: int, data: bytes, ts: float) -> None:
+        if t == NAL_SPS:
+            self._sps = data
+        elif t == NAL_PPS:
+            self._pps = data
+        if t != NAL_SLICE and t != NAL_IDR:
+            self._pending.append((t, data))
+            return
+        if t == NAL_IDR and is_first_slice(data):
+            if self._f is None or self._rotate:
+                self._open_segment(ts)
+            types = {pt for pt, _ in self._pending}
+            lead = [ps for pt, ps in ((NAL_SPS, self._sps), (NAL_PPS, self._pps))
+                    if ps is not None and pt not in types]
+            offset = self._seg_bytes
+            self._emit(*lead, *(d for _, d in self._pending), data)
+            self._idx.write(_pack((offset, int((ts - self._seg_start) * 1e6))))
+            self._idx.flush()
+            self._f.flush()
+            self.keyframes += 1
+        elif self._f is None:
+            self._pending.clear()  # before the first keyframe: not decodable
+            return
+        else:
+            self._emit(*(d for _, d in self._pending), data)
+        self._pending.clear()
+        if self._seg_bytes >= self.max_bytes or ts - self._seg_start >= self.max_seconds:
+            self._rotate = True
+
+    def _emit(self, *chunks) -> None:
+        for chunk in chunks:
+            self._f.write(chunk)
+            self._seg_bytes += len(chunk)
+            self.bytes_written += len(chunk)
+
+    def _open_segment(self, ts: float) -> None:
+        self._close_segment()
+        base = os.path.join(self.directory, f"{file_stem(self.serial)}-{self._stamp}-{len(self.paths) + 1:04d}")
+        self._f = open(base + ".h264", "wb")
+        self._idx = open(base + ".idx", "wb")
+        # The wall-clock time the first keyframe arrived.
+        wall = time.time() - (time.monotonic() - ts)
+        self._idx.write(INDEX_MAGIC + _pack((int(wall * 1e6),)))
+        self._seg_start = ts
+        self._seg_bytes = 0
+        self._rotate = False
+        self.paths.append(base + ".h264")
+
+    def _close_segment(self) -> None:
+        for f in (self._f, self._idx):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+        self._f = self._idx = None
+
+    def stats(self) -> dict:
+        return {
+            "segments": len(self.paths),
+            "bytes": self.bytes_written,
+            "keyframes": self.keyframes,
+            "dropped": self.dropped,
+            "error": str(self.error) if self.error else None,
+        }
+
+
+class Segment:
+    """A recorded segment opened for reading (mmap'd, indexed)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.start_time, self.offsets, self.times = read_index(index_path(path))
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.size = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the first to the last keyframe."""
+        return self.times[-1] / 1e6 if self.times else 0.0
+
+    def keyframe(self, seconds: float) -> int:
+        """Index of the last keyframe at or before `seconds` into the segment
+        (the first one for earlier times)."""
+        if not self.offsets:
+            raise ValueError(f"no keyframes in {self.path}")
+        return max(0, bisect.bisect_right(self.times, int(seconds * 1e6)) - 1)
+
+    def _end(self, i: int) -> int:
+        return self.offsets[i + 1] if i + 1 < len(self.offsets) else self.size
+
+    def gop(self, i: int) -> memoryview:
+        """Keyframe `i` and the frames up to the next one."""
+        return memoryview(self.data)[self.offsets[i]:self._end(i)]
+
+    def seek(self, seconds: float) -> memoryview:
+        """The stream from the keyframe at or before `seconds` to the end."""
+        return memoryview(self.data)[self.offsets[self.keyframe(seconds)]:]
+
+    def trim(self, start: float, end: float, out_path: str) -> tuple:
+        """Copy [start, end] to `out_path`, widened to whole GOPs (keyframe at
+        or before `start` to the keyframe after `end`). Returns the actual
+        (start, end) in seconds; end is None if it ran to the segment's end."""
+        first = self.keyframe(start)
+        last = bisect.bisect_right(self.times, int(end * 1e6))
+        stop = self.offsets[last] if last < len(self.offsets) else self.size
+        with open(out_path, "wb") as f:
+            f.write(memoryview(self.data)[self.offsets[first]:stop])
+        return self.times[first] / 1e6, (self.times[last] / 1e6 if last < len(self.offsets) else None)
+
+    def thumbnail(self, seconds: float, out_path: str, width: int = 320) -> None:
+        """The keyframe at or before `seconds` as an image (format from the
+        extension), decoding that one GOP only."""
+        subprocess.run(
+            [get_ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-y",
+             "-f", "h264", "-i", "-", "-frames:v", "1", "-vf", f"scale={width}:-2", out_path],
+            input=self.gop(self.keyframe(seconds)), check=True, timeout=10,
+        )
@@ -0,0 +1,226 @@
+import threading
+import time
+
+from .h264 import AnnexBReader, DEFAULT_BUFFER_SIZE, NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS, is_first_slice, nal_type
+
+
+class StreamRelay:
+    """Relay an Annex-B H.264 stream from `source` to `sink`, NAL by NAL.
+
+    Sits between `adb exec-out screenrecord` and the player so the app can see
+    the stream it is forwarding. Bytes are read into one reusable buffer by
+    AnnexBReader, complete NAL units are forwarded to the sink in a single
+    write per read, and every NAL is offered to the registered listeners as a
+    memoryview (valid only for the duration of the call -- copy to keep).
+
+    A listener is `fn(nal_type, nal, timestamp)` with `timestamp` from
+    time.monotonic(); it runs on the relay thread, so it must be quick.
+
+    `source` may also be an AnnexBReader that has already been read from
+    (e.g. up to the first keyframe, to confirm the stream is up); `primer`
+    is then the `(nal_type, bytes)` list it returned, forwarded first.
+    """
+
+    def __init__(self, source, sink=None, name: str = "relay", buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 primer=None):
+        self.name = name
+        self.sink = sink
+        self._reader = source if isinstance(source, AnnexBReader) else AnnexBReader(source, buffer_size)
+        self._primer = primer
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.on_eof = None  # callable(relay), run on the relay thread at EOF
+        # Called as fn(relay, reader) on the relay thread whenever a source
+        # ends, even if the relay then keeps going on a spliced-in replacement.
+        self.on_source_end = None
+        # Seconds to wait for splice() after the source ends before giving up.
+        self.hold_on_eof = 0.0
+        self._splice = None
+        self._splice_ready = threading.Event()
+        self.splice_gaps = []  # seconds between last old frame and first new one
+        self._bytes_before_splice = 0
+
+        # Counters (written by the relay thread only).
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.nal_units = 0
+        self.frames = 0
+        self.keyframes = 0
+        self.started_at = None
+        self.first_bytes_at = None
+        self.last_frame_at = None
+        self.last_keyframe_at = None
+        self.sps = None
+        self.pps = None
+        self.sink_error = None
+
+    @property
+    def reader(self):
+        """The AnnexBReader for the stream currently being relayed."""
+        return self._reader
+
+    @property
+    def preamble(self) -> bytes:
+        """Non-video text the device wrote before the first start code."""
+        return self._reader.preamble
+
+    def add_listener(self, fn) -> None:
+        with self._lock:
+            self._listeners = self._listeners + [fn]
+
+    def remove_listener(self, fn) -> None:
+        with self._lock:
+            self._listeners = [l for l in self._listeners if l is not fn]
+
+    def splice(self, reader, primer) -> None:
+        """Continue from another stream at a keyframe.
+
+        `reader` is an AnnexBReader already positioned just after `primer`,
+        a list of `(nal_type, bytes)` that starts the new stream (SPS/PPS and
+        the IDR). The switch happens on the relay thread as soon as it next
+        looks -- after its current read, or when the old source ends -- so the
+        sink sees old frames up to the splice and then the new keyframe, and
+        the player never notices the source changed.
+        """
+        self._splice = (reader, primer)
+        self._splice_ready.set()
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"StreamRelay-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        # The read is blocking; callers stop the relay by terminating the
+        # source process (EOF). The flag only keeps it from forwarding more.
+        self._stop.set()
+        self._splice_ready.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "nal_units": self.nal_units,
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "first_bytes_at": self.first_bytes_at,
+            "last_frame_at": self.last_frame_at,
+            "last_keyframe_at": self.last_keyframe_at,
+        }
+
+    def _run(self) -> None:
+        try:
+            if self._primer:
+                primer, self._primer = self._primer, None
+                self.first_bytes_at = time.monotonic()
+                self.bytes_in = self._reader.bytes_read
+                data = b"".join(nal for _, nal in primer)
+                self._forward(memoryview(data), [(t, memoryview(nal)) for t, nal in primer])
+            while not self._stop.is_set():
+                if self._splice is not None:
+                    self._apply_splice()
+                reader = self._reader
+                try:
+                    result = reader.read()
+                except (OSError, ValueError):
+                    # Source closed underneath us (process terminated).
+                    result = None
+                if result is None:
+                    tail = reader.flush()
+                    if tail is not None:
+                        self._forward(tail, [(nal_type(tail), tail)])
+                    if self.on_source_end:
+                        try:
+                            self.on_source_end(self, reader)
+                        except Exception as e:
+                            print(f"[{self.name}] relay source-end handler error: {e}")
+                    if self._splice is None and self.hold_on_eof > 0 and not self._stop.is_set():
+                        self._splice_ready.wait(self.hold_on_eof)
+                    if self._splice is not None and not self._stop.is_set():
+                        continue
+                    break
+                if self.first_bytes_at is None:
+                    self.first_bytes_at = time.monotonic()
+                self.bytes_in = self._bytes_before_splice + reader.bytes_read
+                span, units = result
+                if units:
+                    self._forward(span, units)
+        finally:
+            if self.on_eof:
+                try:
+                    self.on_eof(self)
+                except Exception as e:
+                    print(f"[{self.name}] relay EOF handler error: {e}")
+
+    def _apply_splice(self) -> None:
+        reader, primer = self._splice
+        self._splice = None
+        self._splice_ready.clear()
+        old = self._reader
+        # Splicing mid-stream, the old stream's pending NAL has no start code
+        # after it yet, so it may be cut short (that adb is about to be
+        # killed): drop it rather than hand a broken slice to the decoder and
+        # the listeners. A stream that reached EOF was flushed already.
+        old.flush()
+        # Carry the parameter sets over if the new stream's prefix lacks them;
+        # the decoder needs SPS/PPS before the IDR.
+        types = {t for t, _ in primer}
+        lead = []
+        if NAL_SPS not in types and self.sps:
+            lead.append((NAL_SPS, self.sps))
+        if NAL_PPS not in types and self.pps:
+            lead.append((NAL_PPS, self.pps))
+        primer = lead + list(primer)
+        last_frame = self.last_frame_at
+        self._bytes_before_splice += old.bytes_read
+        self._reader = reader
+        data = b"".join(nal for _, nal in primer)
+        self._forward(memoryview(data), [(t, memoryview(nal)) for t, nal in primer])
+        if last_frame is not None and self.last_frame_at is not None:
+            gap = self.last_frame_at - last_frame
+            self.splice_gaps.append(gap)
+            print(f"[{self.name}] spliced in new stream, frame gap {gap * 1000:.0f} ms")
+
+    def _forward(self, span, units) -> None:
+        sink = self.sink
+        if sink is not None:
+            try:
+                sink.write(span)
+                sink.flush()
+                self.bytes_out += len(span)
+            except (OSError, ValueError) as e:
+                # Player went away (window closed). Keep draining the source so
+                # listeners still see the stream and adb doesn't block.
+                self.sink_error = e
+                self.sink = None
+
+        now = time.monotonic()
+        listeners = self._listeners
+        for t, nal in units:
+            self.nal_units += 1
+            if t == NAL_SLICE or t == NAL_IDR:
+                if is_first_slice(nal):
+                    self.frames += 1
+                    self.last_frame_at = now
+                    if t == NAL_IDR:
+                        self.keyframes += 1
+                        self.last_keyframe_at = now
+            elif t == NAL_SPS:
+                if self.sps is None or self.sps != nal:
+                    self.sps = bytes(nal)
+            elif t == NAL_PPS:
+                if self.pps is None or self.pps != nal:
+                    self.pps = bytes(nal)
+            for fn in listeners:
+                try:
+                    fn(t, nal, now)
+                except Exception as e:
+                    print(f"[{self.name}] relay listener error: {e}")
+
@@ -0,0 +1,149 @@
+"""Precomputed fisheye->flat maps for ffmpeg's `remap` filter.
+
+The correction's projection depends only on the calibration. This module
+computes it once per calibration with NumPy and stores it as two 16-bit PGM
+images: for each output pixel, the x and y of the crop pixel to copy. The
+ScreenRecord path can hand these to ffplay as the inputs of
+`[eye][xmap][ymap]remap` (option 'remap'), and Python-side consumers can
+index frames with the arrays directly.
+
+The geometry is v360's: an equidistant fisheye of `fov_in` degrees filling
+the square crop, seen through a rectilinear camera of `fov_out` degrees and
+rolled by `roll` degrees. remap copies the nearest pixel; v360 interpolates
+bilinearly by default.
+
+Measured with ffmpeg 7.0, one thread, 640x640 -> 720x720
+(benchmarks/bench_remap.py). The figures are correction cost per frame
+above the crop alone:
+
+    v360             2.9 ms
+    v360 interp=near 0.6 ms
+    remap            3.1 ms
+
+v360 already builds its own lookup table once at init. Its per-frame cost is
+the interpolation, not the projection math. remap also pays for a yuv420p ->
+yuv444p conversion in front of it (it takes no subsampled input) and has no
+SIMD path. It is therefore off by default. The cheap option for many
+headsets on one CPU is v360's own `interp=near` (option 'interp').
+
+Maps are cached on disk (next to config.ini) under a key of the [Filters.*]
+values they depend on, so a calibration is computed once -- later sessions,
+and machines without NumPy, just read the files.
+"""
+import hashlib
+import os
+import threading
+
+from .utils import get_user_config_path
+
+# Bump when the map math changes so stale cache files are not used.
+MAP_VERSION = 1
+# Cache entries kept (a pair of files each); the oldest go first.
+MAX_ENTRIES = 32
+# Map value for output pixels outside the fisheye circle: past the input's
+# edge, so remap fills them (black).
+OUTSIDE = 65535
+
+_lock = threading.Lock()
+
+
+def default_cache_dir() -> str:
+    return os.path.join(os.path.dirname(get_user_config_path()), "remap_cache")
+
+
+def cache_key(crop_size: int, fov_in: float, fov_out: float, roll: float, out_size: int) -> str:
+    params = f"v{MAP_VERSION}:{int(crop_size)}:{float(fov_in):g}:{float(fov_out):g}:{float(roll):g}:{int(out_size)}"
+    return hashlib.sha1(params.encode()).hexdigest()[:16]
+
+
+def build_maps(crop_size: int, fov_in: float, fov_out: float, roll: float, out_size: int):
+    """(xmap, ymap): uint16 arrays of shape (out_size, out_size) with the
+    crop pixel each output pixel is taken from."""
+    import numpy as np
+
+    # Rectilinear camera: output pixel centres on the z=1 plane.
+    half = np.tan(np.radians(fov_out) / 2)
+    axis = half * ((2 * np.arange(out_size) + 1) / out_size - 1)
+    x, y = np.meshgrid(axis, axis)
+    if roll:
+        r = np.radians(roll)
+        x, y = x * np.cos(r) - y * np.sin(r), x * np.sin(r) + y * np.cos(r)
+    # Equidistant fisheye: distance from the centre grows linearly with the
+    # angle off the optical axis, fov_in / 2 reaching the crop's edge.
+    h = np.hypot(x, y)
+    theta = np.arctan(h)
+    radius = theta / (np.radians(fov_in) / 2)
+    scale = np.divide(radius, h, out=np.zeros_like(h), where=h > 0) * (crop_size / 2)
+    xmap = np.rint(crop_size / 2 + x * scale - 0.5)
+    ymap = np.rint(crop_size / 2 + y * scale - 0.5)
+    outside = (radius > 1) | (xmap < 0) | (ymap < 0) | (xmap >= crop_size) | (ymap >= crop_size)
+    xmap[outside] = OUTSIDE
+    ymap[outside] = OUTSIDE
+    return xmap.astype(np.uint16), ymap.astype(np.uint16)
+
+
+def write_pgm(path: str, array) -> None:
+    """16-bit binary PGM (big-endian samples), written atomically."""
+    height, width = array.shape
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"P5\n%d %d\n65535\n" % (width, height))
+        f.write(array.astype(">u2").tobytes())
+    os.replace(tmp, path)
+
+
+def get_maps(crop_size: int, fov_in: float, fov_out: float, roll: float, out_size: int,
+             cache_dir: str = None):
+    """(xmap_path, ymap_path) for this calibration, computing and caching
+    them if needed; None if they can't be had (no NumPy and nothing cached,
+    or the cache isn't writable) -- the caller then uses v360."""
+    cache_dir = cache_dir or default_cache_dir()
+    key = cache_key(crop_size, fov_in, fov_out, roll, out_size)
+    paths = (os.path.join(cache_dir, f"{key}_x.pgm"), os.path.join(cache_dir, f"{key}_y.pgm"))
+    with _lock:
+        if all(os.path.exists(p) for p in paths):
+            return paths
+        try:
+            xmap, ymap = build_maps(crop_size, fov_in, fov_out, roll, out_size)
+        except ImportError:
+            return None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            for path, array in zip(paths, (xmap, ymap)):
+                write_pgm(path, array)
+        except OSError as e:
+            print(f"Could not cache remap maps in {cache_dir}: {e}")
+            return None
+        _prune(cache_dir)
+    return paths
+
+
+def _prune(cache_dir: str) -> None:
+    try:
+        names = [n for n in os.listdir(cache_dir) if n.endswith("_x.pgm")]
+    except OSError:
+        return
+    if len(names) <= MAX_ENTRIES:
+        return
+    names.sort(key=lambda n: os.path.getmtime(os.path.join(cache_dir, n)))
+    for name in names[:-MAX_ENTRIES]:
+        key = name[:-len("_x.pgm")]
+        for suffix in ("_x.pgm", "_y.pgm"):
+            try:
+                os.remove(os.path.join(cache_dir, key + suffix))
+            except OSError:
+                pass
+
+
+def _filter_path(path: str) -> str:
+    # Filter-graph escaping: forward slashes, `:` escaped (Windows drive
+    # letters), the whole value quoted.
+    return "'" + path.replace("\\", "/").replace(":", "\\:") + "'"
+
+
+def filter_graph(crop: str, xmap_path: str, ymap_path: str) -> str:
+    """-vf fragment: the map images as sources, the crop feeding remap. Its
+    output is unlabelled, so more filters can follow after a comma."""
+    return (f"movie={_filter_path(xmap_path)}[xmap];"
+            f"movie={_filter_path(ymap_path)}[ymap];"
+            f"[in]{crop}[eye];[eye][xmap][ymap]remap")
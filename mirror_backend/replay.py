@@ -0,0 +1,181 @@
+"""Instant replay: the last N seconds of each device's stream, in memory.
+
+A ReplayBuffer is a relay listener that keeps the encoded stream as a deque
+of GOPs, each a list of the NALs' bytes. It never re-encodes or decodes. It
+is bounded two ways:
+
+    max_seconds  GOPs are dropped from the front once the next one still
+                 starts at least max_seconds before the newest NAL, so the
+                 buffer covers the last max_seconds plus at most one GOP
+    max_bytes    a hard cap on the encoded bytes held; the oldest GOPs go
+                 first, and a single GOP larger than the cap empties the
+                 buffer until the next keyframe
+
+Eviction is always by whole GOPs, so the buffer starts at SPS/PPS + IDR
+(the cached parameter sets are put in front of a bare IDR, as the broker
+does). save() copies the list of references under the lock, then writes
+outside it: the live mirror is never stopped or held up. The file is plain
+Annex-B, playable by ffplay/VLC, with a keyframe index next to it in
+recorder.py's format, so recorder.Segment can seek, trim and thumbnail it.
+
+Buffers are kept per serial (attach/detach) so the UI can save the selected
+device's and the exporter can report their memory use.
+"""
+import collections
+import os
+import threading
+import time
+
+from . import recorder
+from .h264 import NAL_IDR, NAL_PPS, NAL_SPS, is_first_slice
+
+DEFAULT_SECONDS = 30.0
+# 30 s at the default 20 Mbps is ~75 MB, plus one GOP.
+DEFAULT_BYTES = 96 << 20
+
+
+class ReplayBuffer:
+    def __init__(self, serial: str, max_seconds: float = DEFAULT_SECONDS, max_bytes: int = DEFAULT_BYTES):
+        self.serial = serial
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self._gops = collections.deque()  # [start ts, bytes, [NAL bytes, ...]]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sps = None
+        self._pps = None
+        self._last_type = None
+        self._last_ts = None
+        self.peak_bytes = 0
+        self.evicted_bytes = 0
+        self.saves = 0
+
+    # --- relay listener (relay thread) ---
+
+    def on_nal(self, t: int, nal, ts: float) -> None:
+        data = bytes(nal)
+        entry = False
+        if t == NAL_SPS:
+            self._sps = data
+            entry = True
+        elif t == NAL_PPS:
+            self._pps = data
+        elif t == NAL_IDR and is_first_slice(nal):
+            entry = self._last_type not in (NAL_SPS, NAL_PPS)
+        self._last_type = t
+
+        with self._lock:
+            if entry:
+                chunks = [data] if t == NAL_SPS else [ps for ps in (self._sps, self._pps) if ps] + [data]
+                size = sum(len(c) for c in chunks)
+                self._gops.append([ts, size, chunks])
+            elif self._gops:
+                gop = self._gops[-1]
+                gop[2].append(data)
+                size = len(data)
+                gop[1] += size
+            else:
+                return  # not decodable until the next keyframe
+            self._bytes += size
+            self._last_ts = ts
+            self._evict(ts)
+            if self._bytes > self.peak_bytes:
+                self.peak_bytes = self._bytes
+
+    def _evict(self, now: float) -> None:
+        gops = self._gops
+        while len(gops) > 1 and gops[1][0] <= now - self.max_seconds:
+            self._drop()
+        while gops and self._bytes > self.max_bytes:
+            self._drop()
+
+    def _drop(self) -> None:
+        size = self._gops.popleft()[1]
+        self._bytes -= size
+        self.evicted_bytes += size
+
+    # --- UI / exporter ---
+
+    def save(self, path: str) -> dict:
+        """Write the buffer to `path` (Annex-B H.264) plus its keyframe index;
+        raises ValueError if there is nothing to save yet."""
+        t0 = time.perf_counter()
+        with self._lock:
+            # References only: the bytes are immutable, the lists are not.
+            gops = [(start, list(chunks)) for start, _, chunks in self._gops]
+            last = self._last_ts
+        if not gops:
+            raise ValueError(f"Nothing buffered for {self.serial} yet")
+        first = gops[0][0]
+        offsets, times = [], []
+        offset = 0
+        with open(path, "wb") as f:
+            for start, chunks in gops:
+                offsets.append(offset)
+                times.append(int((start - first) * 1e6))
+                f.writelines(chunks)
+                offset += sum(len(c) for c in chunks)
+        # The wall-clock time the first keyframe arrived.
+        recorder.write_index(recorder.index_path(path), time.time() - (time.monotonic() - first),
+                             offsets, times)
+        self.saves += 1
+        return {
+            "path": path,
+            "seconds": last - first,
+            "bytes": offset,
+            "keyframes": len(offsets),
+            "save_ms": (time.perf_counter() - t0) * 1000,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            seconds = self._last_ts - self._gops[0][0] if self._gops else 0.0
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "peak_bytes": self.peak_bytes,
+                "seconds": seconds,
+                "keyframes": len(self._gops),
+                "evicted_bytes": self.evicted_bytes,
+            }
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def attach(serial: str, relay, max_seconds: float = DEFAULT_SECONDS, max_bytes: int = DEFAULT_BYTES) -> ReplayBuffer:
+    """Start buffering `serial` from `relay` (replaces an earlier buffer for
+    that serial)."""
+    buf = ReplayBuffer(serial, max_seconds, max_bytes)
+    relay.add_listener(buf.on_nal)
+    with _buffers_lock:
+        _buffers[serial] = buf
+    return buf
+
+
+def detach(serial: str, buf: ReplayBuffer = None) -> None:
+    """Forget `serial` (only if it still maps to `buf`, when given)."""
+    with _buffers_lock:
+        if buf is None or _buffers.get(serial) is buf:
+            _buffers.pop(serial, None)
+
+
+def get(serial: str):
+    return _buffers.get(serial)
+
+
+def snapshots() -> dict:
+    """{serial: stats()} for every device being buffered."""
+    with _buffers_lock:
+        items = list(_buffers.items())
+    return {serial: buf.stats() for serial, buf in items}
+
+
+def save(serial: str, directory: str) -> dict:
+    """Save `serial`'s buffer as <directory>/<serial>-<YYYYmmdd-HHMMSS>.h264."""
+    buf = get(serial)
+    if buf is None:
+        raise ValueError(f"No replay buffer for {serial}")
+    os.makedirs(directory, exist_ok=True)
+    return buf.save(os.path.join(directory, f"{recorder.file_stem(serial)}-{time.strftime('%Y%m%d-%H%M%S')}.h264"))
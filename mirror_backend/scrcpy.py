@@ -1,5 +1,7 @@
 from .base import MirrorBackend
 from .utils import get_scrcpy_path, check_process_alive, NO_WINDOW
+from . import tracing
+from .logreactor import get_reactor
 import subprocess
 import re
 
@@ -48,13 +50,25 @@ MODEL_CROP = {
     # native resolution -- an incorrect crop rectangle can clip into black.
 }
 
+# scrcpy's log lines for the trace: device connected, window created, first
+# frame decoded (it logs the texture size when the first frame arrives).
+_TRACE_PATTERNS = {
+    "device-connected": "Device:",
+    "window": "Renderer:",
+    "first-frame": "Texture:",
+}
+
+
 class ScrcpyBackend(MirrorBackend):
     def __init__(self):
         self.process = None
+        self.trace = tracing.Trace("scrcpy", None)
+        self._trace_watch = None
 
     def start(self, serial: str, options: dict) -> None:
         if self.is_running():
             self.stop()
+        self.trace = trace = tracing.start_trace("scrcpy", serial)
 
         scrcpy_path = get_scrcpy_path()
         size = options.get('size', 1024)
@@ -86,15 +100,28 @@ class ScrcpyBackend(MirrorBackend):
             elif eye == '右眼':
                 command.append(f'--crop={crop_size}:{crop_size}:{full_w // 2}:{offset_y}')
             # eye == '両眼' -> no crop, show the raw SBS frame uncorrected
-            if angle and _supports_angle(scrcpy_path):
-                command.append(f'--angle={angle}')
+            if angle:
+                with trace.span("probe-version"):
+                    if _supports_angle(scrcpy_path):
+                        command.append(f'--angle={angle}')
 
-        self.process = subprocess.Popen(
-            command,
-            creationflags=NO_WINDOW
-        )
+        with trace.span("spawn"):
+            self.process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                creationflags=NO_WINDOW
+            )
+        # Its log goes through the shared reader (printed rate-limited) so
+        # the trace can pick up connection, window and first frame.
+        reactor = get_reactor()
+        self._trace_watch = tracing.watch_log(trace, reactor, serial, ["scrcpy"], _TRACE_PATTERNS)
+        reactor.add(self.process.stdout, label="scrcpy", source=serial)
 
     def stop(self) -> None:
+        if self._trace_watch is not None:
+            get_reactor().remove_handler(self._trace_watch)
+            self._trace_watch = None
         if self.process:
             self.process.terminate()
             try:
@@ -105,3 +132,6 @@ class ScrcpyBackend(MirrorBackend):
 
     def is_running(self) -> bool:
         return check_process_alive(self.process)
+
+    def processes(self) -> list:
+        return [self.process] if self.process else []
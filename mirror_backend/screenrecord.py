@@ -1,11 +1,59 @@
 from .base import MirrorBackend
-from .utils import get_adb_path, check_process_alive, NO_WINDOW
+from .utils import get_adb_path, get_player_path, check_process_alive
+from .relay import StreamRelay
+from .h264 import AnnexBReader, NAL_IDR, NAL_SPS
+from . import adbclient
+from . import shell
+from . import devinfo
+from . import metrics
+from . import procgroup
+from . import remap
+from . import playerstats
+from . import recorder
+from . import replay
+from . import tracing
+from . import standby
+from . import startfail
+from .supervisor import get_supervisor
+from .logreactor import get_reactor
+import asyncio
 import subprocess
 import threading
-import re
-import sys
 import time
 
+# Android's screenrecord stops on its own after 180 s. With rollover enabled
+# the next screenrecord is started this long into the current one, leaving a
+# margin for it to come up and deliver its first keyframe before the limit.
+ROLLOVER_AFTER = 170.0
+# How long the replacement may take to produce SPS/PPS + IDR.
+ROLLOVER_KEYFRAME_TIMEOUT = 8.0
+# How long the relay keeps the player's input open after a feed ends while a
+# replacement is being started (covers the fallback respawn path).
+ROLLOVER_HOLD = 10.0
+# How long a fresh screenrecord may take to produce its first keyframe before
+# the start counts as failed (option 'ready_timeout'). The first IDR normally
+# arrives within a few hundred ms; a display that is still waking up is slower.
+READY_TIMEOUT = 5.0
+
+# Must finish before screenrecord starts: the device allows only one
+# screenrecord, and a sleeping display captures a black/invalid frame.
+CRITICAL_PREP = "killall screenrecord 2>/dev/null; input keyevent WAKEUP"
+BACKGROUND_PREP = (
+    "am broadcast -a com.oculus.vrpowermanager.automation_disable; "
+    "am broadcast -a com.oculus.vrpowermanager.prox_close; "
+    "svc power stayon true; wm dismiss-keyguard"
+)
+# stop()'s device cleanup, one shell round-trip: any screenrecord left behind,
+# proximity sensor handed back. A device that is gone fails it at once.
+STOP_CLEANUP = (
+    "killall screenrecord 2>/dev/null; "
+    "am broadcast -a com.oculus.vrpowermanager.automation_disable"
+)
+STOP_CLEANUP_TIMEOUT = 2.0
+# How long stop() waits for the killed processes to be reaped.
+STOP_WAIT = 1.0
+
+
 class ScreenRecordBackend(MirrorBackend):
     def __init__(self):
         self.adb_process = None
@@ -13,92 +61,340 @@ class ScreenRecordBackend(MirrorBackend):
         self.window_title = None
         self.player_pid = None
         self.serial = None
+        self.relay = None
+        self.rollovers = 0
+        self._adb_cmd = None
+        self._adb_started_at = None
+        self._next_adb = None
+        self._feed_reader = None
+        self._feed_ended = threading.Event()
+        self._stopping = threading.Event()
+        self._proc_lock = threading.Lock()
+        self._broker = None
+        self._subscriber = None
+        self.trace = tracing.Trace("screenrecord", None)
+        self._trace_watch = None
+        self.metrics = None
+        self.recorder = None
+        self.replay = None
+        self.player_stats = None
+        self._standby = None
+        self._group = procgroup.ProcessGroup()
+        self.stop_latency = None
 
     def start(self, serial: str, options: dict) -> None:
-        self.serial = serial
         if self.is_running():
             self.stop()
+        self.serial = serial
+        self.trace = tracing.start_trace("screenrecord", serial)
+        # What selecting the device already did (standby.py): prep, device
+        # info, a player waiting on its pipe. Only the first attempt uses it.
+        self._standby = standby.claim(serial)
+        try:
+            self._start(serial, options)
+        finally:
+            self._drop_standby()
+
+    def _drop_standby(self) -> None:
+        if self._standby is not None:
+            self._standby.discard()
+            self._standby = None
+
+    def warm_standby(self, serial: str, options: dict, idle: float = standby.DEFAULT_IDLE) -> None:
+        """Warm `serial` up for a later start(serial, options) (standby.py).
+        The player is pre-spawned only where start() feeds it from a pipe."""
+        headless = options.get('mode') == 'headless'
+        piped = options.get('shared') or options.get('rollover') or self._needs_relay(options)
+        player_cmd = self._build_player_cmd(serial, options) if piped and not headless else None
+        standby.warm(serial, player_cmd, idle)
+
+    def _warm_player(self, player_cmd: list):
+        """The standby's player, if it was started with `player_cmd`."""
+        if self._standby is None:
+            return None
+        proc = self._standby.take_player(player_cmd)
+        if proc is not None:
+            self.trace.mark("standby-player")
+            self._group.add(proc)
+        return proc
+
+    def _start(self, serial: str, options: dict) -> None:
+        if options.get('shared'):
+            self._start_shared(serial, options)
+            return
             
         max_retries = 3
         import time
-        
+
+        # Settings the encoder rejected on this device a moment ago fail the
+        # same way again; say so now instead of after a round of attempts.
+        known = startfail.known_bad(serial, startfail.ENCODER, self._encoder_key(options))
+        if known:
+            raise startfail.StartFailure(
+                startfail.ENCODER, "The encoder rejected this size/bit rate on this device recently; "
+                                   "change them and start again.", known)
+
+        # Failures are classified (startfail.py): hopeless ones end the loop
+        # at once, a rejected --display-id is retried inside the attempt,
+        # transient ones back off before a fresh attempt (whose prep kills a
+        # stale screenrecord and wakes the device).
+        trace = self.trace
+        failure = None
         for attempt in range(max_retries):
+            if failure is not None:
+                with trace.span("retry-wait", kind=failure.kind):
+                    time.sleep(startfail.backoff_delay(attempt - 1))
             try:
-                self._start_attempt(serial, options)
-
-                # Check if process died immediately (e.g. INVALID_LAYER_STACK).
-                # _start_attempt already polls until screenrecord appears on the
-                # device, so a short confirm here is enough (was a fixed 0.8s).
-                time.sleep(0.3)
-                if self.adb_process and self.adb_process.poll() is not None:
-                     # It died, likely checking stderr would confirm INVALID_LAYER_STACK
-                     raise RuntimeError("Screenrecord process terminated early.")
-                
+                with trace.span("attempt", n=attempt + 1):
+                    if options.get('async_start'):
+                        asyncio.run(self._start_attempt_async(serial, options))
+                    else:
+                        self._start_attempt(serial, options)
+
+                    # Check if process died immediately (e.g. INVALID_LAYER_STACK).
+                    # With the relay the first keyframe has already confirmed
+                    # the stream; only the pidof-polled direct path needs this.
+                    if self.relay is None:
+                        with trace.span("confirm"):
+                            time.sleep(0.3)
+                    if self.adb_process and self.adb_process.poll() is not None:
+                        raise startfail.StartFailure(
+                            startfail.classify(None, self.adb_process.returncode),
+                            "Screenrecord process terminated early.")
+
                 # If still running, we assume success
+                print(f"[{time.strftime('%H:%M:%S')}] Start trace for {serial}: {trace.summary()}")
                 return
             except Exception as e:
-                print(f"Mirror start attempt {attempt+1} failed: {e}")
+                failure = e if isinstance(e, startfail.StartFailure) else \
+                    startfail.StartFailure(startfail.classify(str(e)), str(e))
+                print(f"Mirror start attempt {attempt+1} failed ({failure.kind}, {failure.policy}): {e}")
                 self.stop()
-                if attempt < max_retries - 1:
-                    print(f"Retrying in 1s...")
-                    time.sleep(1.0)
-                    
-        raise RuntimeError(f"Failed to start mirror after {max_retries} attempts")
+                self.serial = serial  # stop() clears it; the next attempt needs it
+                self._drop_standby()  # a retry does the full prep again
+                if failure.kind == startfail.ENCODER:
+                    startfail.record(serial, startfail.ENCODER, self._encoder_key(options), failure.detail)
+                if failure.policy == startfail.FAST_FAIL:
+                    break
 
-    def _start_attempt(self, serial: str, options: dict, use_display_flag: bool = True) -> None:
-        # 0. Check if device is ADB-online
-        import time
-        adb = get_adb_path()
-        device_online = False
-        for _ in range(5): # Try for ~1s
-            res = subprocess.run([adb, "-s", serial, "get-state"], capture_output=True, text=True, timeout=3, creationflags=NO_WINDOW)
-            if res.returncode == 0 and res.stdout.strip() == "device":
-                device_online = True
+        self.serial = None
+        raise startfail.StartFailure(
+            failure.kind, f"Failed to start mirror after {attempt + 1} attempt(s) ({failure.kind}).",
+            failure.detail or str(failure)) from failure
+
+    @staticmethod
+    def _encoder_key(options: dict):
+        return options.get('width', 1280), options.get('height', 720), options.get('bitrate', 5)
+
+    def _wait_online(self, serial: str):
+        """None once `serial` is online, else the StartFailure to raise:
+        at once when the server says it can't be (not found, unauthorized),
+        after ~1 s if it stays offline."""
+        state = error = ""
+        for _ in range(5):
+            state, error = adbclient.probe_state(serial, timeout=3)
+            if state == "device":
+                return None
+            if startfail.POLICY.get(startfail.classify_text(f"{state} {error}")) == startfail.FAST_FAIL:
                 break
             time.sleep(0.2)
+        return startfail.StartFailure(
+            startfail.classify_text(f"{state} {error}") or startfail.OFFLINE,
+            f"Device {serial} is not online or not found in ADB.", error or state)
 
-        if not device_online:
-            raise RuntimeError(f"Device {serial} is not online or not found in ADB.")
+    def _choose_display(self, serial: str, display_id):
+        """`display_id`, unless the device rejected it recently (then the
+        default display, skipping the failing --display-id attempt)."""
+        if display_id is not None and startfail.known_bad(serial, startfail.DISPLAY, display_id):
+            self.trace.mark("skip-display-id", display_id=display_id)
+            return None
+        return display_id
+
+    def _note_display_failure(self, serial: str, display_id, failure) -> None:
+        print("Retrying screenrecord without --display-id due to display stack error...")
+        self.trace.mark("retry-without-display-id", detail=failure.detail)
+        startfail.record(serial, startfail.DISPLAY, display_id, failure.detail)
+        devinfo.invalidate(serial)  # display list may have changed
+
+    def _start_attempt(self, serial: str, options: dict, use_display_flag: bool = True) -> None:
+        # 0. Check if device is ADB-online
+        import time
+        tl = self.trace
+        with tl.span("adb-online"):
+            offline = self._wait_online(serial)
+        if offline is not None:
+            raise offline
 
         # --- CRITICAL prep, one round-trip ---
         # Only the things that must happen *before* screenrecord starts:
         #  - kill any stale screenrecord (device allows only one at a time)
         #  - WAKEUP (a sleeping display captures a black/invalid frame)
-        # Batching into a single `adb shell` avoids ~5 separate adb.exe spawns.
+        # Batched into a single command on the device's persistent shell
+        # (see shell.py) rather than an adb.exe spawn.
+        if self._standby is not None and self._standby.woken_at is not None:
+            tl.mark("standby-prep")
+        else:
+            with tl.span("prep"):
+                try:
+                    shell.run(serial, CRITICAL_PREP, timeout=5)
+                except Exception as e:
+                    print(f"Warning: critical prep failed: {e}")
+
+            # --- NON-CRITICAL prep, off the critical path ---
+            # Proximity-off (always-on screen), stay-on and dismiss-keyguard don't
+            # need to complete before the window appears. `svc power stayon` alone
+            # takes ~1s on Quest, so running these in the background shaves that off
+            # the perceived startup latency. They are detached on the device, so
+            # the shared shell is free again immediately for the probes below.
+            self._background_prep(serial)
+
+        with tl.span("display"):
+            display_id = self._resolve_display_id(serial, options.get('display_id')) if use_display_flag else None
+        display_id = self._choose_display(serial, display_id)
+        self._print_display_choice(display_id)
+
+        # 'headless' captures without a player: the relay is the only
+        # consumer (used by the per-device StreamBroker in broker.py).
+        headless = options.get('mode') == 'headless'
+        player_cmd = None if headless else self._build_player_cmd(serial, options)
+
+        # Optional in-process relay between adb and the player (see relay.py).
+        # Without it adb's stdout is handed straight to ffplay and the app
+        # never sees the stream.
+        # Rollover splices successive screenrecords into the relay, and
+        # recording (recorder.py) and the replay buffer (replay.py) listen
+        # on it, so all of them imply the relay.
+        rollover = bool(options.get('rollover', False))
+        use_relay = headless or rollover or self._needs_relay(options)
+
+        # Start Processes
+        # 1. Start ADB
+        with tl.span("adb-spawn"):
+            self._spawn_adb(serial, options, display_id, use_relay)
+
+        # --- GUARD: Check if screenrecord is actually running ---
+        reader = primer = None
+        if use_relay:
+            # The player reads from our pipe, so its startup can overlap the
+            # wait (kept across the --display-id retry below).
+            if player_cmd is not None and self.player_process is None:
+                with tl.span("player-spawn"):
+                    self._spawn_player(player_cmd, subprocess.PIPE)
+            # The stream itself is the signal: its first keyframe, or the
+            # error text screenrecord prints instead.
+            with tl.span("ready"):
+                reader, primer, failure = self._await_stream(float(options.get('ready_timeout', READY_TIMEOUT)))
+        else:
+            # adb's stdout goes straight to the player, so all we can do is
+            # poll for screenrecord to appear on the device.
+            with tl.span("ready"):
+                running, adb_died = self._poll_screenrecord(serial)
+            failure = None if running else self._direct_start_failure(adb_died)
+
+        if failure is not None:
+            # Retry once without display-id if that might be the culprit
+            if use_display_flag and display_id is not None and failure.policy == startfail.RETRY_NO_DISPLAY:
+                self._note_display_failure(serial, display_id, failure)
+                return self._start_attempt(serial, options, use_display_flag=False)
+            raise failure
+        # --------------------------------------------------------
+
+        # 2. Start Player (ffplay)
+        if player_cmd is not None and not use_relay:
+            with tl.span("player-spawn"):
+                self._spawn_player(player_cmd, self.adb_process.stdout)
+
+        self._start_feed(options, use_relay, rollover, reader, primer)
+
+    async def _start_attempt_async(self, serial: str, options: dict, use_display_flag: bool = True) -> None:
+        """_start_attempt with the independent steps overlapped.
+
+        The display lookup runs while the device wakes, and with the relay
+        the player is spawned right away (its stdin is our pipe, and
+        ffplay's own startup then overlaps the device prep). Without the
+        relay it reads adb's stdout, so as in _start_attempt it waits for
+        screenrecord to be confirmed: started earlier, it would swallow the
+        error text the --display-id retry is decided on. Failure handling
+        is the same as the sequential path.
+        """
+        tl = self.trace
+        headless = options.get('mode') == 'headless'
+        player_cmd = None if headless else self._build_player_cmd(serial, options)
+        rollover = bool(options.get('rollover', False))
+        use_relay = headless or rollover or self._needs_relay(options)
+
+        with tl.span("adb-online"):
+            offline = await asyncio.to_thread(self._wait_online, serial)
+        if offline is not None:
+            raise offline
+
+        async def wake():
+            if self._standby is not None and self._standby.woken_at is not None:
+                tl.mark("standby-prep")
+                return
+            # Own transport (adbclient, not the shared shell) so the wake
+            # doesn't queue behind `cmd display list` on the device shell.
+            with tl.span("prep"):
+                try:
+                    await asyncio.to_thread(adbclient.run, serial, CRITICAL_PREP, 5)
+                except Exception as e:
+                    print(f"Warning: critical prep failed: {e}")
+            await asyncio.to_thread(self._background_prep, serial)
+
+        async def display():
+            if not use_display_flag:
+                return None
+            with tl.span("display"):
+                return await asyncio.to_thread(self._resolve_display_id, serial, options.get('display_id'))
+
+        async def player():
+            # Kept across the --display-id retry below.
+            if player_cmd is None or not use_relay or self.player_process is not None:
+                return
+            with tl.span("player-spawn"):
+                await asyncio.to_thread(self._spawn_player, player_cmd, subprocess.PIPE)
+
+        _, display_id, _ = await asyncio.gather(wake(), display(), player())
+        display_id = self._choose_display(serial, display_id)
+        self._print_display_choice(display_id)
+
+        with tl.span("adb-spawn"):
+            self._spawn_adb(serial, options, display_id, use_relay)
+
+        reader = primer = None
+        if use_relay:
+            with tl.span("ready"):
+                reader, primer, failure = await asyncio.to_thread(
+                    self._await_stream, float(options.get('ready_timeout', READY_TIMEOUT)))
+        else:
+            with tl.span("ready"):
+                running, adb_died = await asyncio.to_thread(self._poll_screenrecord, serial)
+            failure = None if running else self._direct_start_failure(adb_died)
+
+        if failure is not None:
+            if use_display_flag and display_id is not None and failure.policy == startfail.RETRY_NO_DISPLAY:
+                self._note_display_failure(serial, display_id, failure)
+                return await self._start_attempt_async(serial, options, use_display_flag=False)
+            raise failure
+
+        if player_cmd is not None and not use_relay:
+            with tl.span("player-spawn"):
+                self._spawn_player(player_cmd, self.adb_process.stdout)
+
+        self._start_feed(options, use_relay, rollover, reader, primer)
+
+    @staticmethod
+    def _needs_relay(options: dict) -> bool:
+        return bool(options.get('relay', False) or options.get('record_dir') or options.get('replay_seconds'))
+
+    def _background_prep(self, serial: str) -> None:
         try:
-            subprocess.run(
-                [adb, "-s", serial, "shell",
-                 "killall screenrecord 2>/dev/null; input keyevent WAKEUP"],
-                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, timeout=5,
-                creationflags=NO_WINDOW
-            )
+            shell.run(serial, BACKGROUND_PREP, timeout=5, background=True)
         except Exception as e:
-            print(f"Warning: critical prep failed: {e}")
-
-        # --- NON-CRITICAL prep, off the critical path ---
-        # Proximity-off (always-on screen), stay-on and dismiss-keyguard don't
-        # need to complete before the window appears. `svc power stayon` alone
-        # takes ~1s on Quest, so running these in the background shaves that off
-        # the perceived startup latency.
-        def _bg_prep():
-            try:
-                subprocess.run(
-                    [adb, "-s", serial, "shell",
-                     "am broadcast -a com.oculus.vrpowermanager.automation_disable; "
-                     "am broadcast -a com.oculus.vrpowermanager.prox_close; "
-                     "svc power stayon true; wm dismiss-keyguard"],
-                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, timeout=15,
-                    creationflags=NO_WINDOW
-                )
-            except Exception as e:
-                print(f"Background prep error: {e}")
-        threading.Thread(target=_bg_prep, daemon=True).start()
-
-        width = options.get('width', 1280)
-        height = options.get('height', 720)
-        bitrate = options.get('bitrate', 5) # Mbps
-        display_id = self._resolve_display_id(serial, options.get('display_id')) if use_display_flag else None
+            print(f"Background prep error: {e}")
 
+    @staticmethod
+    def _print_display_choice(display_id) -> None:
         # (Display list was already queried inside _resolve_display_id; avoid a
         # second `cmd display list` round-trip here.)
         if display_id is not None:
@@ -106,6 +402,11 @@ class ScreenRecordBackend(MirrorBackend):
         else:
             print(f"[{time.strftime('%H:%M:%S')}] Using default display (no display-id flag)")
 
+    def _spawn_adb(self, serial: str, options: dict, display_id, use_relay: bool) -> None:
+        width = options.get('width', 1280)
+        height = options.get('height', 720)
+        bitrate = options.get('bitrate', 5) # Mbps
+
         # ADB Command
         adb_cmd = [
             get_adb_path(), "-s", serial, "exec-out", "screenrecord",
@@ -115,10 +416,191 @@ class ScreenRecordBackend(MirrorBackend):
         if display_id is not None:
             adb_cmd.extend(["--display-id", str(display_id)])
         adb_cmd.extend(["--size", f"{width}x{height}", "-"])
-        
-        # Build ffplay command
+
+        # bufsize=0: the relay needs a raw pipe whose readinto() returns as
+        # soon as any data is available instead of waiting to fill its buffer.
+        self.adb_process = self._group.popen(
+            adb_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            bufsize=0 if use_relay else -1
+        )
+        self._adb_cmd = adb_cmd
+        self._adb_started_at = time.monotonic()
+
+    def _spawn_player(self, player_cmd: list, stdin) -> None:
+        proc = self._warm_player(player_cmd) if stdin is subprocess.PIPE else None
+        self.player_process = proc or self._group.popen(
+            player_cmd, stdin=stdin,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        self.player_pid = self.player_process.pid
+        print(f"[{time.strftime('%H:%M:%S')}] Player process started (PID {self.player_pid}): {player_cmd}")
+
+    @staticmethod
+    def _screenrecord_running(serial: str) -> bool:
+        try:
+            res = shell.run(serial, ["pidof", "screenrecord"], timeout=2)
+            return res.returncode == 0 and bool(res.stdout.strip())
+        except Exception:
+            return False
+
+    def _poll_screenrecord(self, serial: str):
+        """Direct path only: poll until screenrecord shows up on the device
+        (normally ~50 ms, up to ~2 s on a slow one). Returns (running,
+        adb_died)."""
+        for _ in range(20):
+            if self.adb_process.poll() is not None:
+                return False, True
+            if self._screenrecord_running(serial):
+                return True, False
+            time.sleep(0.1)
+        return False, False
+
+    def _await_stream(self, timeout: float):
+        """Relay path: read adb's stdout up to screenrecord's first keyframe.
+
+        Returns `(reader, primer, None)` once SPS/PPS + IDR have arrived (the
+        reader continues right after them, see StreamRelay), or `(None,
+        None, StartFailure)` when the stream ended, began with known error
+        text (no need to wait for adb to exit) or had no keyframe after
+        `timeout` seconds. adb is gone in the failure case.
+        """
+        proc = self.adb_process
+        reader = AnnexBReader(proc.stdout)
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            proc.kill()
+
+        # read() blocks, so the deadline is enforced by killing the process.
+        watchdog = threading.Timer(timeout, expire)
+        watchdog.start()
+        try:
+            primer = self._read_until_keyframe(
+                reader, give_up=lambda r: bool(r.preamble)
+                and startfail.classify_text(r.preamble.decode(errors="replace")) is not None)
+        finally:
+            watchdog.cancel()
+        if primer is not None:
+            return reader, primer, None
+
+        preamble = reader.preamble.decode(errors="replace")
+        returncode = None
+        if not timed_out.is_set() and startfail.classify_text(preamble) is None:
+            # The stream just ended: adb's exit code says a little more.
+            try:
+                returncode = proc.wait(timeout=0.2)
+            except subprocess.TimeoutExpired:
+                pass
+        try:
+            proc.kill()
+        except Exception:
+            pass
+        _, err = self._collect_process_output(proc)
+        self.adb_process = None
+        detail = (preamble + err).strip()
+        kind = startfail.classify(detail, returncode, timed_out.is_set())
+        if timed_out.is_set():
+            return None, None, startfail.StartFailure(kind, f"screenrecord produced no keyframe within {timeout:g} s.", detail)
+        return None, None, startfail.StartFailure(kind, f"screenrecord produced no video ({kind}).", detail)
+
+    def _failed_start_detail(self, adb_died: bool) -> str:
+        # Collect output *before* tearing the process down, otherwise we
+        # pass None to _collect_process_output and the INVALID_LAYER_STACK
+        # retry can never trigger.
+        adb_out, adb_err = self._collect_process_output(self.adb_process)
+        if not adb_died:
+            try:
+                self.adb_process.terminate()
+            except Exception:
+                pass
+            self.adb_process = None
+        detail = adb_err or adb_out
+        return detail.strip() if detail else detail
+
+    def _direct_start_failure(self, adb_died: bool):
+        returncode = self.adb_process.returncode if adb_died else None
+        detail = self._failed_start_detail(adb_died) or ""
+        kind = startfail.classify(detail, returncode)
+        # Check if adb process itself died (e.g. device not found)
+        if adb_died:
+            return startfail.StartFailure(kind, "ADB process terminated immediately (device disconnected?).", detail)
+        return startfail.StartFailure(kind, "screenrecord process failed to start on device (pidof verification failed).", detail)
+
+    def _start_feed(self, options: dict, use_relay: bool, rollover: bool, reader=None, primer=None) -> None:
+        if use_relay:
+            sink = self.player_process.stdin if self.player_process else None
+            self.relay = StreamRelay(reader if reader is not None else self.adb_process.stdout, sink, name=self.serial, primer=primer)
+            # The relay ending isn't a process exit; have the supervisor
+            # re-check right away rather than at its next sweep.
+            self.relay.on_eof = lambda relay: get_supervisor().wake()
+            # Received bitrate/fps/GOP/jitter for this device (metrics.py).
+            self.metrics = metrics.attach(self.serial, self.relay)
+            self.relay.add_listener(self._first_data_listener())
+            # Indexed segments of the encoded stream, no re-encoding.
+            if options.get('record_dir'):
+                self.recorder = recorder.SegmentRecorder(
+                    options['record_dir'], self.serial,
+                    max_bytes=int(options.get('record_segment_bytes', recorder.DEFAULT_SEGMENT_BYTES)),
+                    max_seconds=float(options.get('record_segment_seconds', recorder.DEFAULT_SEGMENT_SECONDS)),
+                )
+                self.relay.add_listener(self.recorder.on_nal)
+            # The last replay_seconds in memory, for an instant save.
+            if options.get('replay_seconds'):
+                self.replay = replay.attach(
+                    self.serial, self.relay, float(options['replay_seconds']),
+                    int(options.get('replay_bytes', replay.DEFAULT_BYTES)),
+                )
+            # The caller's own listeners (the broker's fan-out). Added before
+            # the relay starts: it forwards the primer at once, and
+            # MediaCodec sends SPS/PPS only in it.
+            for listener in options.get('relay_listeners', ()):
+                self.relay.add_listener(listener)
+            if rollover:
+                self._start_rollover(float(options.get('rollover_after', ROLLOVER_AFTER)))
+            self.relay.start()
+
+        # Debug logging threads
+        self._log_stderr(self.adb_process, "ADB")
+        if self.player_process:
+            self._log_stderr(self.player_process, "Player")
+
+    def _start_shared(self, serial: str, options: dict) -> None:
+        """Play from the device's StreamBroker instead of a private screenrecord.
+
+        The broker owns the one screenrecord the device allows; this backend
+        only runs the player, fed by a broker subscription. Several consumers
+        (preview window, recording, virtual camera) can then share a device.
+        """
+        from .broker import acquire_broker, release_broker, POLICY_DROP_TO_IDR
+        with self.trace.span("broker"):
+            broker = acquire_broker(serial, options)
+        try:
+            player_cmd = self._build_player_cmd(serial, options)
+            with self.trace.span("player-spawn"):
+                self.player_process = self._warm_player(player_cmd) or self._group.popen(
+                    player_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+                )
+        except Exception:
+            release_broker(broker)
+            raise
+        self.player_pid = self.player_process.pid
+        self._broker = broker
+        self._subscriber = broker.subscribe(
+            name=self.window_title, policy=options.get('slow_consumer', POLICY_DROP_TO_IDR)
+        )
+        self._subscriber.pipe_to(self.player_process.stdin)
+        print(f"[{time.strftime('%H:%M:%S')}] Shared player started (PID {self.player_pid}) on broker for {serial}")
+        self._log_stderr(self.player_process, "Player")
+
+    @staticmethod
+    def _build_video_filters(options: dict) -> list:
+        """ffmpeg -vf chain (as a list) for the selected eye and correction
+        (also used by virtual_camera.py's decoder)."""
+        width = options.get('width', 1280)
+        height = options.get('height', 720)
         eye = options.get('eye', 'both')
-        
+
         # VF filters.
         # The Quest screenrecord feed is a raw stereo *fisheye* passthrough
         # image (side-by-side, one circular fisheye per eye). We crop a SQUARE
@@ -159,12 +641,23 @@ class ScreenRecordBackend(MirrorBackend):
                 fov_out = options.get('fov_out', 95)  # output flat FOV (deg)
                 roll = options.get('roll', 0)         # tilt correction (deg)
                 out = int(options.get('out_size', 720))
-                vf.append(
-                    "v360=input=fisheye:output=flat"
-                    f":ih_fov={fov_in}:iv_fov={fov_in}"
-                    f":h_fov={fov_out}:v_fov={fov_out}"
-                    f":roll={roll}:w={out}:h={out}"
-                )
+                # Same projection as a table lookup: maps computed once per
+                # calibration (remap.py). v360 if they can't be had.
+                maps = None
+                if options.get('remap', False):
+                    maps = remap.get_maps(crop_size, fov_in, fov_out, roll, out,
+                                          options.get('remap_cache'))
+                if maps is not None:
+                    vf[-1] = remap.filter_graph(vf[-1], *maps)
+                else:
+                    vf.append(
+                        "v360=input=fisheye:output=flat"
+                        f":ih_fov={fov_in}:iv_fov={fov_in}"
+                        f":h_fov={fov_out}:v_fov={fov_out}"
+                        f":roll={roll}:w={out}:h={out}"
+                        # 'near' cuts most of v360's per-frame cost (see remap.py)
+                        + (f":interp={options['interp']}" if options.get('interp') else "")
+                    )
             elif correction == 'lens':
                 # Legacy path (rotate + polynomial lens correction).
                 rotation = options.get('rotation', 0)
@@ -180,15 +673,19 @@ class ScreenRecordBackend(MirrorBackend):
         # Add setpts=0 to avoid buffering/sync issues
         vf.append("setpts=0")
 
+        return vf
+
+    def _build_player_cmd(self, serial: str, options: dict) -> list:
+        vf = self._build_video_filters(options)
         vf_str = ",".join(vf)
-        
+
         # Use ffplay.
         # IMPORTANT: do NOT pass `-fflags nobuffer`. Despite its name, on this
         # raw-h264-over-pipe input it makes ffplay/ffmpeg spend ~11s before the
         # first frame is decoded (measured), which was the "window takes 10s+ to
         # appear" bug. `-flags low_delay` keeps latency low without that stall.
         player_cmd = [
-            "ffplay",
+            get_player_path(),
             "-f", "h264",
             "-flags", "low_delay",
             "-framedrop",
@@ -204,94 +701,162 @@ class ScreenRecordBackend(MirrorBackend):
         self.window_title = title
         player_cmd.extend(["-window_title", title])
 
-        # Start Processes
-        # 1. Start ADB
-        self.adb_process = subprocess.Popen(
-            adb_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            creationflags=NO_WINDOW
-        )
-        
-        # --- GUARD: Check if screenrecord is actually running ---
-        # Poll for screenrecord to appear on the device instead of a fixed
-        # 0.5s sleep. It normally shows up in ~50ms, so this returns almost
-        # immediately on a healthy device, while still waiting up to ~2s on a
-        # slow one (which avoids spurious "failed to start" retries that used
-        # to add several seconds to startup).
-        is_screenrecord_running = False
-        adb_died = False
-        for _ in range(20):  # up to ~2s
-            if self.adb_process.poll() is not None:
-                adb_died = True
-                break
-            try:
-                res = subprocess.run([get_adb_path(), "-s", serial, "shell", "pidof", "screenrecord"],
-                                   capture_output=True, text=True, timeout=2, creationflags=NO_WINDOW)
-                if res.returncode == 0 and res.stdout.strip():
-                    is_screenrecord_running = True
-                    break
-            except Exception:
-                pass
-            time.sleep(0.1)
+        return player_cmd
 
-        # Check if adb process itself died (e.g. device not found)
-        if adb_died:
-            adb_out, adb_err = self._collect_process_output(self.adb_process)
-            detail = adb_err or adb_out
-            if detail:
-                detail = detail.strip()
-            # Retry once without display-id if that might be the culprit
-            if use_display_flag and detail and ("INVALID_LAYER_STACK" in detail or "Invalid physical display ID" in detail):
-                print("Retrying screenrecord without --display-id due to display stack error...")
-                return self._start_attempt(serial, options, use_display_flag=False)
-            raise RuntimeError("ADB process terminated immediately (device disconnected?). " + (f"Details: {detail}" if detail else ""))
+    def _log_stderr(self, process, name):
+        # Drained by the shared reader thread (see logreactor.py).
+        reactor = get_reactor()
+        if name == "Player":
+            # ffplay's status line -> dropped frames, drift, queue depth.
+            self.player_stats = playerstats.attach(self.serial, reactor)
+            # Its first status line with a clock: the first frame is shown.
+            self._trace_watch = tracing.watch_log(
+                self.trace, reactor, self.serial, ["Player"],
+                {"player-first-frame": lambda text: (p := playerstats.parse_status(text)) is not None
+                                                    and p[0] != "nan"})
+        reactor.add(process.stderr, label=name, source=self.serial)
+
+    def _first_data_listener(self):
+        """Relay listener marking the first bytes and the first keyframe on
+        the trace; removes itself after that."""
+        trace, relay = self.trace, self.relay
+
+        def listener(t, nal, ts):
+            if not listener.seen_bytes:
+                listener.seen_bytes = True
+                trace.mark("first-bytes", at_ns=int(ts * 1e9))
+            if t == NAL_IDR:  # the first frame a decoder can show
+                trace.mark("first-frame", at_ns=int(ts * 1e9))
+                relay.remove_listener(listener)
+
+        listener.seen_bytes = False
+        return listener
+
+    # --- Rollover across screenrecord's time limit ---
+    # The relay keeps ffplay's stdin open while a fresh screenrecord is started
+    # next to the old one; once the new stream has produced SPS/PPS + IDR it is
+    # spliced into the relay at that keyframe and the old adb is terminated.
+    # ffplay just sees a new keyframe, so its window never closes. If the
+    # device refuses a second concurrent screenrecord, the replacement is
+    # started as soon as the old one ends instead (longer, but still no
+    # player restart).
 
-        if not is_screenrecord_running:
-            # Collect output *before* tearing the process down, otherwise we
-            # pass None to _collect_process_output and the INVALID_LAYER_STACK
-            # retry below can never trigger.
-            adb_out, adb_err = self._collect_process_output(self.adb_process)
+    def _start_rollover(self, after: float) -> None:
+        # Fresh events per session, so a rollover thread left over from a
+        # previous session can't be revived by this one clearing them.
+        self._stopping = threading.Event()
+        self._feed_ended = threading.Event()
+        self._feed_reader = self.relay.reader
+        self.relay.hold_on_eof = ROLLOVER_HOLD
+        self.relay.on_source_end = self._on_source_end
+        threading.Thread(
+            target=self._rollover_loop, args=(after, self._stopping, self._feed_ended), daemon=True
+        ).start()
+
+    def _on_source_end(self, relay, reader):
+        # Only the feed currently in use counts; the old one ending after a
+        # splice is expected.
+        if reader is self._feed_reader:
+            self._feed_ended.set()
+
+    def _rollover_loop(self, after: float, stopping, feed_ended) -> None:
+        while not stopping.is_set():
+            remaining = self._adb_started_at + after - time.monotonic()
+            feed_ended.wait(max(0.0, remaining))
+            if stopping.is_set():
+                return
+            if self._roll_over(stopping):
+                continue
+            if not feed_ended.is_set():
+                # Pre-spawn refused while the old screenrecord still runs:
+                # start the replacement the moment the old one ends.
+                feed_ended.wait()
+                if stopping.is_set():
+                    return
+                if self._roll_over(stopping):
+                    continue
+            print(f"[{time.strftime('%H:%M:%S')}] Rollover failed for {self.serial}; feed will end.")
+            return
+
+    def _roll_over(self, stopping) -> bool:
+        print(f"[{time.strftime('%H:%M:%S')}] Rolling over screenrecord for {self.serial}...")
+        started = time.monotonic()
+        try:
+            proc = self._group.popen(
+                self._adb_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0
+            )
+        except Exception as e:
+            print(f"Rollover spawn failed: {e}")
+            return False
+        self._next_adb = proc
+        reader = AnnexBReader(proc.stdout)
+        # read() blocks, so the deadline is enforced by killing the process.
+        watchdog = threading.Timer(ROLLOVER_KEYFRAME_TIMEOUT, proc.kill)
+        watchdog.start()
+        try:
+            primer = self._read_until_keyframe(reader)
+        finally:
+            watchdog.cancel()
+
+        with self._proc_lock:
+            self._next_adb = None
+            if primer is None or stopping.is_set():
+                _, err = self._collect_process_output(proc)
+                if primer is None and err.strip():
+                    print(f"Rollover screenrecord failed: {err.strip()}")
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+                return False
+            old = self.adb_process
+            self.adb_process = proc
+            self._adb_started_at = started
+            self._feed_reader = reader
+            self._feed_ended.clear()
+            self.relay.splice(reader, primer)
+
+        self._log_stderr(proc, "ADB")
+        if old is not None:
             try:
-                self.adb_process.terminate()
+                old.terminate()
+                old.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                old.kill()
             except Exception:
                 pass
-            self.adb_process = None
-            detail = adb_err or adb_out
-            if detail:
-                detail = detail.strip()
-            if use_display_flag and detail and ("INVALID_LAYER_STACK" in detail or "Invalid physical display ID" in detail):
-                print("Retrying screenrecord without --display-id due to display stack error...")
-                return self._start_attempt(serial, options, use_display_flag=False)
-            raise RuntimeError("screenrecord process failed to start on device (pidof verification failed). " + (f"Details: {detail}" if detail else ""))
-        # --------------------------------------------------------
-
-        
-        # 2. Start Player (ffplay)
-        self.player_process = subprocess.Popen(
-            player_cmd, stdin=self.adb_process.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
-            creationflags=NO_WINDOW
-        )
-        self.player_pid = self.player_process.pid
-        print(f"[{time.strftime('%H:%M:%S')}] Player process started (PID {self.player_pid}): {player_cmd}")
+        self.rollovers += 1
+        print(f"[{time.strftime('%H:%M:%S')}] Rollover #{self.rollovers} ready in "
+              f"{(time.monotonic() - started) * 1000:.0f} ms")
+        return True
 
-        # Debug logging threads
-        def log_stderr(process, name):
+    @staticmethod
+    def _read_until_keyframe(reader, give_up=None):
+        """Read a fresh stream up to its first IDR; returns its NALs from the
+        first SPS (or IDR) on as `(type, bytes)`, or None if it ended first
+        (or `give_up(reader)` said so after a read)."""
+        primer = []
+        while True:
             try:
-                for line in process.stderr:
-                    print(f"[{name}] {line.decode('utf-8', errors='replace').strip()}")
-            except Exception as e:
-                print(f"Error reading {name} stderr: {e}")
-
-        threading.Thread(target=log_stderr, args=(self.adb_process, "ADB"), daemon=True).start()
-        if self.player_process:
-            threading.Thread(target=log_stderr, args=(self.player_process, "Player"), daemon=True).start()
+                result = reader.read()
+            except (OSError, ValueError):
+                result = None
+            if result is None or (give_up is not None and give_up(reader)):
+                return None
+            keyframe = False
+            for t, nal in result[1]:
+                if not primer and t != NAL_SPS and t != NAL_IDR:
+                    continue
+                primer.append((t, bytes(nal)))
+                if t == NAL_IDR:
+                    keyframe = True
+            if keyframe:
+                return primer
 
     def _log_display_info(self, serial: str, chosen_display_id):
         """Print available displays and chosen id to aid troubleshooting."""
         try:
-            res = subprocess.run(
-                [get_adb_path(), "-s", serial, "shell", "cmd", "display", "list"],
-                capture_output=True, text=True, timeout=2.0, creationflags=NO_WINDOW
-            )
+            res = shell.run(serial, ["cmd", "display", "list"], timeout=2.0)
             summary = res.stdout.strip().splitlines()
             if len(summary) > 10:
                 summary = summary[:10] + ["..."]
@@ -331,24 +896,11 @@ class ScreenRecordBackend(MirrorBackend):
         return primary
 
     def _list_display_ids(self, serial: str):
-        """Parse display ids from `cmd display list`; fallback to [0] on error."""
-        try:
-            res = subprocess.run(
-                [get_adb_path(), "-s", serial, "shell", "cmd", "display", "list"],
-                capture_output=True, text=True, timeout=2.0, creationflags=NO_WINDOW
-            )
-            if res.returncode != 0:
-                return [0]
-
-            ids = set()
-            for line in res.stdout.splitlines():
-                m = re.search(r"Display\s+(\d+)", line)
-                if m:
-                    ids.add(int(m.group(1)))
-            if ids:
-                return sorted(ids)
-        except Exception as e:
-            print(f"Warning: failed to list display ids: {e}")
+        """Display ids from the cached device info (one batched query per
+        connection, see devinfo.py); fallback to [0] if unknown."""
+        info = devinfo.get_info(serial)
+        if info is not None and info.display_ids:
+            return info.display_ids
         return [0]
 
     def _collect_process_output(self, process):
@@ -371,123 +923,105 @@ class ScreenRecordBackend(MirrorBackend):
         return stdout_data.decode(errors="replace"), stderr_data.decode(errors="replace")
 
     def stop(self) -> None:
-        # 1) Stop ADB first so ffplay gets EOF
-        if self.adb_process:
-            print(f"[{time.strftime('%H:%M:%S')}] Stopping adb screenrecord...")
-            try:
-                self.adb_process.terminate()
-                self.adb_process.wait(timeout=1)
-            except subprocess.TimeoutExpired:
-                self.adb_process.kill()
-            except Exception:
-                pass
-            self.adb_process = None
-            time.sleep(0.3)
+        started = time.monotonic()
+        # 0) Cancel rollover first so nothing respawns screenrecord under us
+        self._stopping.set()
+        self._feed_ended.set()
+        if self.relay:
+            self.relay.hold_on_eof = 0.0
 
-        # 2) Then stop ffplay/ffmpeg player
-        if self.player_process:
-            print(f"[{time.strftime('%H:%M:%S')}] Stopping player process (PID {self.player_pid})...")
+        # Shared mode: leave the broker's screenrecord alone (other consumers
+        # may still use it); just drop our subscription before the player.
+        shared = self._broker is not None
+        if shared:
+            from .broker import release_broker
+            self._subscriber.close()
+            release_broker(self._broker)
+            self._broker = None
+            self._subscriber = None
 
-            # Try to resolve PID by window title via tasklist /V (more reliable)
-            if sys.platform == 'win32' and self.window_title:
-                try:
-                    tl = subprocess.run(["tasklist", "/V", "/FI", "IMAGENAME eq ffplay.exe"], capture_output=True, text=True, creationflags=NO_WINDOW)
-                    matched_pid = None
-                    for line in tl.stdout.splitlines():
-                        if self.window_title in line:
-                            m = re.search(r"ffplay\.exe\s+(\d+)", line, re.IGNORECASE)
-                            if m:
-                                matched_pid = m.group(1)
-                                break
-                    if matched_pid:
-                        print(f"[{time.strftime('%H:%M:%S')}] Found ffplay PID by title: {matched_pid}")
-                        subprocess.run(["taskkill", "/F", "/T", "/PID", matched_pid], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, creationflags=NO_WINDOW)
-                except Exception as e:
-                    print(f"[{time.strftime('%H:%M:%S')}] tasklist parse error: {e}")
+        # 1) Kill adb, a rollover replacement and the player -- with anything
+        # they started -- in one go (process group / job object, see
+        # procgroup.py). The title/PID-scoped kill never touches other
+        # devices' players or an unrelated ffplay.
+        with self._proc_lock:
+            self._group.kill()
+        if not self._group.wait(STOP_WAIT):
+            print(f"[{time.strftime('%H:%M:%S')}] WARNING: processes of {self.serial} still running after kill")
+        self._group.close()
+        self._group = procgroup.ProcessGroup()
+        self._next_adb = None
+        self.adb_process = None
 
-            # On Windows, try killing by window title directly
-            if sys.platform == 'win32' and self.window_title:
-                try:
-                    result = subprocess.run(
-                        ["taskkill", "/F", "/FI", f"WINDOWTITLE eq {self.window_title}"],
-                        capture_output=True, text=True, check=False, creationflags=NO_WINDOW
-                    )
-                    print(f"[{time.strftime('%H:%M:%S')}] taskkill by title result: rc={result.returncode}, out={result.stdout.strip()}, err={result.stderr.strip()}")
-                except Exception as e:
-                    print(f"[{time.strftime('%H:%M:%S')}] taskkill by title error: {e}")
+        # The relay ends once adb's stdout hits EOF (or the player's pipe
+        # breaks).
+        if self.relay:
+            self.relay.stop()
+            self.relay = None
+            if self.metrics is not None:
+                metrics.detach(self.metrics.serial, self.metrics)
+                self.metrics = None
+        if self.replay is not None:
+            replay.detach(self.replay.serial, self.replay)
+            self.replay = None
+        if self.recorder is not None:
+            self.recorder.close()
+            rec = self.recorder.stats()
+            print(f"[{time.strftime('%H:%M:%S')}] Recorded {self.serial}: {rec['segments']} segment(s), "
+                  f"{rec['bytes'] / 2**20:.1f} MB, {rec['dropped']} NAL(s) dropped")
+            self.recorder = None
 
-            # Then try by PID and process tree
-            if sys.platform == 'win32' and self.player_pid:
+        if self.player_process:
+            if self.player_process.stdin:
                 try:
-                    result = subprocess.run(
-                        ["taskkill", "/F", "/T", "/PID", str(self.player_pid)],
-                        capture_output=True, text=True, check=False, creationflags=NO_WINDOW
-                    )
-                    print(f"[{time.strftime('%H:%M:%S')}] taskkill result: returncode={result.returncode}, stdout={result.stdout.strip()}, stderr={result.stderr.strip()}")
-
-                    # Double-check if process is really gone
-                    time.sleep(0.2)
-                    check_result = subprocess.run(
-                        ["tasklist", "/FI", f"PID eq {self.player_pid}"],
-                        capture_output=True, text=True, creationflags=NO_WINDOW
-                    )
-                    if str(self.player_pid) in check_result.stdout:
-                        print(f"[{time.strftime('%H:%M:%S')}] WARNING: Process {self.player_pid} still running after taskkill!")
-                        # Try one more time with absolute force
-                        subprocess.run(["taskkill", "/F", "/PID", str(self.player_pid)],
-                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=NO_WINDOW)
-                    else:
-                        print(f"[{time.strftime('%H:%M:%S')}] Successfully killed player process {self.player_pid}")
-                        
-                except Exception as e:
-                    print(f"[{time.strftime('%H:%M:%S')}] taskkill error: {e}")
-            
-            # Fallback termination
-            try:
-                if self.player_process.poll() is None:
-                    self.player_process.terminate()
-                    self.player_process.wait(timeout=1)
-            except:
-                pass
-
-            # NOTE: We deliberately do NOT `taskkill /IM ffplay.exe` here. That
-            # would kill *every* ffplay instance on the machine, which breaks
-            # multi-device mirroring (stopping one device closes all the others)
-            # and any unrelated ffplay the user has open. The title/PID-scoped
-            # kills above are sufficient to stop this backend's own player.
-
+                    self.player_process.stdin.close()
+                except Exception:
+                    pass
+            print(f"[{time.strftime('%H:%M:%S')}] Stopped player process (PID {self.player_pid})")
             self.player_process = None
             self.player_pid = None
             self.window_title = None
-            
-        
-        
-        # Safe Device Cleanup
+            if self._trace_watch is not None:
+                get_reactor().remove_handler(self._trace_watch)
+                self._trace_watch = None
+            if self.player_stats is not None:
+                playerstats.detach(self.player_stats.serial, self.player_stats)
+                self.player_stats = None
+
+        # 2) Device cleanup: one shell command, no get-state first.
+        serial = self.serial
+        if shared:
+            self.serial = None
         if self.serial:
             try:
-                # Check online first
-                res = subprocess.run([get_adb_path(), "-s", self.serial, "get-state"],
-                                   capture_output=True, text=True, timeout=1.0, creationflags=NO_WINDOW)
-                if res.returncode == 0 and res.stdout.strip() == "device":
-                    # Device is online, try to cleanup
-                    subprocess.run([get_adb_path(), "-s", self.serial, "shell", "killall", "screenrecord"],
-                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, creationflags=NO_WINDOW)
-                    # Restore proximity sensor state
-                    subprocess.run([get_adb_path(), "-s", self.serial, "shell", "am", "broadcast", "-a", "com.oculus.vrpowermanager.automation_disable"],
-                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False, creationflags=NO_WINDOW)
+                shell.run(self.serial, STOP_CLEANUP, timeout=STOP_CLEANUP_TIMEOUT)
             except Exception:
                 # Ignore any errors during stop cleanup (device might be gone)
                 pass
             self.serial = None
+        self.stop_latency = time.monotonic() - started
+        if serial:
+            print(f"[{time.strftime('%H:%M:%S')}] Stopped {serial} in {self.stop_latency * 1000:.0f} ms")
+
+    def processes(self) -> list:
+        return [p for p in (self.adb_process, self.player_process) if p is not None]
 
     def is_running(self) -> bool:
-        if not check_process_alive(self.player_process):
+        if self._subscriber is not None:
+            return (check_process_alive(self.player_process) and not self._subscriber.closed
+                    and self._broker is not None and self._broker.is_running())
+        headless = self.player_process is None and self.relay is not None
+        if not headless and not check_process_alive(self.player_process):
             return False
         # The player (ffplay) keeps its window open showing the last frame even
         # after the device-side screenrecord/adb feed dies (e.g. screenrecord's
         # ~3 minute limit, or the headset going to sleep). Treat a dead feed as
         # "not running" so the monitor can clean up instead of leaving a frozen
         # window that still looks connected.
+        if self.relay is not None and self.relay.hold_on_eof > 0:
+            # With rollover, adb processes come and go; the relay only ends
+            # once no replacement feed could be spliced in.
+            return self.relay.is_alive()
         if self.adb_process is not None and not check_process_alive(self.adb_process):
             return False
         return True
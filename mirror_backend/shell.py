@@ -0,0 +1,208 @@
+"""One long-lived device shell per headset, shared by all short commands.
+
+Even over the server socket (adbclient.py) every command is a new transport
+connection plus a fresh `sh` on the device. Here a single interactive shell
+(`shell,raw:` -- no PTY, so no echo or prompt) stays open per device and
+commands are written to its stdin, each followed by a sentinel line:
+
+    { <command>
+    } </dev/null 2>&1; printf '\\n<marker> <id> %d\\n' $?
+
+The reader thread cuts the output at the sentinel, which also carries the
+exit code. The shell runs commands strictly in order, so requests from
+several threads are answered FIFO: callers queue a future under the write
+lock and the reader resolves them one by one. stdin is redirected away from
+the command so it can't swallow the commands queued after it; stderr is
+folded into stdout.
+
+A command that never finishes would block everything behind it, so a
+timeout closes the session (the next call opens a new one). Slow prep that
+nobody waits for is started in the background on the device instead (see
+`run(..., background=True)`).
+"""
+import subprocess
+import threading
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from . import adbclient
+from .utils import get_adb_path, NO_WINDOW
+
+
+class ShellClosed(ConnectionError):
+    """The device shell went away (device disconnected, adb restarted)."""
+
+
+class ShellSession:
+    def __init__(self, serial: str, client: adbclient.AdbClient = None):
+        self.serial = serial
+        self._marker = b"__qsc_" + uuid.uuid4().hex[:12].encode()
+        self._pending = []  # [(id, Future)] in the order written
+        self._next_id = 0
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._proc = None
+        self._sock = None
+        try:
+            self._sock = (client or adbclient.get_client()).open_shell(serial)
+        except (adbclient.AdbError, OSError):
+            # No server socket: `adb shell -T` gives the same PTY-less shell.
+            self._proc = subprocess.Popen(
+                [get_adb_path(), "-s", serial, "shell", "-T"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                bufsize=0, creationflags=NO_WINDOW,
+            )
+        self._reader = threading.Thread(target=self._read_loop, name=f"Shell-{serial}", daemon=True)
+        self._reader.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _send(self, data: bytes) -> None:
+        if self._sock is not None:
+            self._sock.sendall(data)
+        else:
+            self._proc.stdin.write(data)
+
+    def _recv(self) -> bytes:
+        if self._sock is not None:
+            return self._sock.recv(65536)
+        return self._proc.stdout.read(65536)
+
+    def submit(self, command: str) -> Future:
+        """Queue `command`; the future resolves to (exit code, output bytes)."""
+        future = Future()
+        with self._write_lock:
+            if self._closed:
+                raise ShellClosed(f"shell for {self.serial} is closed")
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending.append((request_id, future))
+            script = (
+                "{ %s\n} </dev/null 2>&1; printf '\\n%s %d %%d\\n' $?\n"
+                % (command, self._marker.decode(), request_id)
+            )
+            try:
+                self._send(script.encode("utf-8"))
+            except (OSError, ValueError) as e:
+                self._pending.remove((request_id, future))
+                self.close()
+                raise ShellClosed(str(e))
+        return future
+
+    def run(self, command: str, timeout: float = 5.0, text: bool = True) -> subprocess.CompletedProcess:
+        try:
+            code, output = self.submit(command).result(timeout)
+        except FutureTimeout:
+            # The shell is stuck in this command; everything queued behind it
+            # would wait too. Start over with a new session next time.
+            self.close()
+            raise subprocess.TimeoutExpired(command, timeout)
+        if text:
+            output = output.decode("utf-8", errors="replace")
+        return subprocess.CompletedProcess(command, code, output, "" if text else b"")
+
+    def _read_loop(self) -> None:
+        buf = bytearray()
+        tag = b"\n" + self._marker + b" "
+        try:
+            while True:
+                chunk = self._recv()
+                if not chunk:
+                    break
+                buf += chunk
+                while True:
+                    at = buf.find(tag)
+                    if at < 0:
+                        break
+                    end = buf.find(b"\n", at + len(tag))
+                    if end < 0:
+                        break
+                    fields = bytes(buf[at + len(tag):end]).split()
+                    output = bytes(buf[:at])
+                    del buf[:end + 1]
+                    with self._write_lock:
+                        request_id, future = self._pending.pop(0)
+                    if int(fields[0]) != request_id:
+                        error = ShellClosed(f"out of sequence reply {fields[0]!r} (expected {request_id})")
+                        # Already off the queue, so close() won't fail it.
+                        future.set_exception(error)
+                        raise error
+                    future.set_result((int(fields[1]), output))
+        except (OSError, ValueError, IndexError):
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        with self._write_lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending, self._pending = self._pending, []
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(ShellClosed(f"shell for {self.serial} closed"))
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        if self._proc is not None:
+            try:
+                self._proc.kill()
+            except OSError:
+                pass
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(serial: str) -> ShellSession:
+    """The open session for `serial`, opening one if needed."""
+    with _sessions_lock:
+        session = _sessions.get(serial)
+        if session is None or session.closed:
+            session = ShellSession(serial)
+            _sessions[serial] = session
+        return session
+
+
+def close_session(serial: str) -> None:
+    with _sessions_lock:
+        session = _sessions.pop(serial, None)
+    if session is not None:
+        session.close()
+
+
+def close_all() -> None:
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def run(serial: str, args, timeout: float = 5.0, text: bool = True,
+        background: bool = False) -> subprocess.CompletedProcess:
+    """Run a device command on the serial's shared session.
+
+    Drop-in for adbclient.run(): `args` is a string or argv list, the result
+    a CompletedProcess (stderr folded into stdout). With `background=True`
+    the command is detached on the device and this returns as soon as it was
+    started. Falls back to a one-off adbclient.run() if the session can't be
+    used.
+    """
+    command = args if isinstance(args, str) else " ".join(adbclient._quote(a) for a in args)
+    if background:
+        command = "( %s ) >/dev/null 2>&1 &" % command
+    for _ in range(2):
+        try:
+            return get_session(serial).run(command, timeout=timeout, text=text)
+        except ShellClosed:
+            continue  # stale session (device reconnected): one fresh try
+        except (OSError, ValueError):
+            break
+    return adbclient.run(serial, command, timeout=timeout, text=text)
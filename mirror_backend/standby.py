@@ -0,0 +1,188 @@
+"""Warm standby for the device selected in the UI.
+
+Selecting a device starts a background warm-up so that clicking 接続 only
+has to start screenrecord: the device is checked online, woken (with the
+same prep a start runs: stale screenrecord killed, WAKEUP, proximity off,
+stay-on), its device info and display ids are cached (devinfo.py), and
+the player is spawned with its stdin on a pipe. Until the stream arrives
+ffplay just waits on stdin -- no window, no decoding.
+
+ScreenRecordBackend.start() claims the standby of its device and uses what
+is ready; anything else it does itself. A standby that isn't claimed is
+released after `idle` seconds (or when another device is selected): the
+player is killed and the proximity sensor handed back, so a selected but
+unused headset doesn't stay awake.
+"""
+import subprocess
+import threading
+import time
+
+from . import adbclient
+from . import devinfo
+from . import procgroup
+from . import shell
+
+DEFAULT_IDLE = 120.0
+# How long a claim waits for a warm-up still in progress.
+CLAIM_WAIT = 5.0
+RELEASE_COMMAND = "am broadcast -a com.oculus.vrpowermanager.automation_disable"
+
+
+class Standby:
+    def __init__(self, serial: str, player_cmd, idle: float):
+        self.serial = serial
+        self.player_cmd = player_cmd
+        self.idle = idle
+        self.player = None
+        self.online = False
+        self.woken_at = None  # time.monotonic() when the prep finished
+        self.ready = threading.Event()
+        self.claimed = False
+        self._timer = None
+
+    def take_player(self, player_cmd):
+        """The warm player if it was started with `player_cmd` and is still
+        waiting; None otherwise (a mismatched one is killed)."""
+        player, self.player = self.player, None
+        if player is None:
+            return None
+        if player_cmd == self.player_cmd and player.poll() is None:
+            return player
+        _kill(player)
+        return None
+
+    def discard(self) -> None:
+        """Kill whatever the claimer didn't take."""
+        if self.player is not None:
+            _kill(self.player)
+            self.player = None
+
+
+_standby = {}
+_lock = threading.Lock()
+
+
+def warm(serial: str, player_cmd=None, idle: float = DEFAULT_IDLE) -> None:
+    """Warm `serial` up in the background; any other device's standby is
+    released. Selecting the same device again only restarts its idle timer
+    (unless the player command changed)."""
+    with _lock:
+        entry = _standby.get(serial)
+        if entry is not None and entry.player_cmd == player_cmd:
+            _arm(entry)
+            return
+        stale = list(_standby)
+    for other in stale:
+        release(other)
+    entry = Standby(serial, player_cmd, idle)
+    with _lock:
+        _standby[serial] = entry
+        _arm(entry)
+    threading.Thread(target=_warm_up, args=(entry,), name=f"Standby-{serial}", daemon=True).start()
+
+
+def _arm(entry: Standby) -> None:
+    if entry._timer is not None:
+        entry._timer.cancel()
+    entry._timer = threading.Timer(entry.idle, _expire, (entry,))
+    entry._timer.daemon = True
+    entry._timer.start()
+
+
+def _warm_up(entry: Standby) -> None:
+    from .screenrecord import BACKGROUND_PREP, CRITICAL_PREP
+    serial = entry.serial
+    started = time.monotonic()
+    try:
+        entry.online = adbclient.get_state(serial, timeout=3) == "device"
+        if not entry.online:
+            return
+        shell.run(serial, CRITICAL_PREP, timeout=5)
+        shell.run(serial, BACKGROUND_PREP, timeout=5, background=True)
+        entry.woken_at = time.monotonic()
+        devinfo.get_info(serial)
+        if entry.player_cmd is not None:
+            # Own process group: the claiming session kills it with its own
+            # (procgroup.py).
+            entry.player = procgroup.popen(
+                entry.player_cmd, stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+        print(f"[{time.strftime('%H:%M:%S')}] Standby ready for {serial} in "
+              f"{(time.monotonic() - started) * 1000:.0f} ms")
+    except Exception as e:
+        print(f"Standby warm-up failed for {serial}: {e}")
+    finally:
+        entry.ready.set()
+        with _lock:
+            released = _standby.get(serial) is not entry and not entry.claimed
+        if released:  # while warming up
+            _release(entry)
+
+
+def claim(serial: str, timeout: float = CLAIM_WAIT):
+    """Take `serial`'s standby for a start (waiting for a warm-up in
+    progress); None if there is none or it didn't finish in time. The
+    caller owns it afterwards and must discard() what it doesn't use."""
+    with _lock:
+        entry = _standby.pop(serial, None)
+        if entry is None:
+            return None
+        entry.claimed = True
+        if entry._timer is not None:
+            entry._timer.cancel()
+    if not entry.ready.wait(timeout) or not entry.online:
+        entry.discard()
+        return None
+    return entry
+
+
+def _expire(entry: Standby) -> None:
+    with _lock:
+        if _standby.get(entry.serial) is not entry:
+            return
+    print(f"[{time.strftime('%H:%M:%S')}] Standby for {entry.serial} idle for {entry.idle:g} s; releasing.")
+    release(entry.serial)
+
+
+def release(serial: str) -> None:
+    """Drop `serial`'s standby: kill its player, give the proximity sensor
+    back."""
+    with _lock:
+        entry = _standby.pop(serial, None)
+    if entry is None:
+        return
+    if entry._timer is not None:
+        entry._timer.cancel()
+    if entry.ready.is_set():
+        _release(entry)
+    # else _warm_up releases it when it finishes
+
+
+def _release(entry: Standby) -> None:
+    entry.discard()
+    if entry.woken_at is not None:
+        try:
+            shell.run(entry.serial, RELEASE_COMMAND, timeout=5, background=True)
+        except Exception as e:
+            print(f"Standby release failed for {entry.serial}: {e}")
+
+
+def release_all() -> None:
+    with _lock:
+        serials = list(_standby)
+    for serial in serials:
+        release(serial)
+
+
+def get(serial: str):
+    with _lock:
+        return _standby.get(serial)
+
+
+def _kill(proc) -> None:
+    try:
+        proc.kill()
+        proc.wait(timeout=1)
+    except Exception:
+        pass
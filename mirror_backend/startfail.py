@@ -0,0 +1,148 @@
+"""Why a mirror start failed, and what to do about it.
+
+A failed start is classified from what adb and screenrecord said (adb's
+stderr, the text screenrecord writes instead of video, the adb server's
+get-state answer) and, failing that, from how it ended (deadline, exit
+code). Each class has a policy:
+
+    fast-fail          retrying can't help (no such device, unauthorized,
+                       encoder refuses these settings): give up at once
+    retry-no-display   the display stack rejected --display-id: try again
+                       right away without it
+    backoff-wake       transient (device offline, encoder busy, no video
+                       yet): wait a little, then a fresh attempt (which
+                       kills a stale screenrecord and wakes the device)
+
+Failures are also remembered per device for HISTORY_TTL seconds, keyed by
+the setting that caused them, so the next start skips a display id that
+was rejected and fails a known-bad encoder configuration without trying.
+"""
+import threading
+import time
+
+# Failure classes.
+ABSENT = "absent"
+UNAUTHORIZED = "unauthorized"
+OFFLINE = "offline"
+DISPLAY = "display"
+BUSY = "busy"
+ENCODER = "encoder"
+NO_VIDEO = "no-video"
+UNKNOWN = "unknown"
+
+# Policies.
+FAST_FAIL = "fast-fail"
+RETRY_NO_DISPLAY = "retry-no-display"
+BACKOFF_WAKE = "backoff-wake"
+
+POLICY = {
+    ABSENT: FAST_FAIL,
+    UNAUTHORIZED: FAST_FAIL,
+    ENCODER: FAST_FAIL,
+    DISPLAY: RETRY_NO_DISPLAY,
+    OFFLINE: BACKOFF_WAKE,
+    BUSY: BACKOFF_WAKE,
+    NO_VIDEO: BACKOFF_WAKE,
+    UNKNOWN: BACKOFF_WAKE,
+}
+
+# Seconds to wait before backoff-wake attempt 2, 3, ...
+BACKOFF_DELAYS = (0.25, 1.0)
+HISTORY_TTL = 600.0
+
+# Checked in order; the first class with a matching substring wins.
+_PATTERNS = (
+    (UNAUTHORIZED, ("unauthorized", "no permissions")),
+    (ABSENT, ("not found", "no devices/emulators")),
+    (OFFLINE, ("offline", "error: closed", "connection reset")),
+    (DISPLAY, ("INVALID_LAYER_STACK", "Invalid physical display ID")),
+    # MediaCodec couldn't be created: another capture/cast holds the encoder.
+    (BUSY, ("unable to create", "Resource busy", "already running")),
+    # The encoder rejects the size/bit rate; the same settings will fail again.
+    (ENCODER, ("unable to configure", "Unsupported")),
+    # Some other error text instead of video.
+    (UNKNOWN, ("ERROR:", "Unable to", "failed")),
+)
+
+
+def classify_text(text):
+    """Class of a known error in `text`, or None."""
+    if not text:
+        return None
+    for kind, needles in _PATTERNS:
+        if any(n in text for n in needles):
+            return kind
+    return None
+
+
+def classify(text, returncode=None, timed_out: bool = False) -> str:
+    kind = classify_text(text)
+    if kind is not None:
+        return kind
+    if timed_out:
+        return NO_VIDEO
+    if returncode is not None and returncode != 0:
+        # adb died without saying why: nearly always the transport dropping.
+        return OFFLINE
+    return UNKNOWN
+
+
+class StartFailure(RuntimeError):
+    """A classified start failure; str() is the user-facing message."""
+
+    def __init__(self, kind: str, message: str, detail: str = ""):
+        super().__init__(message + (f" Details: {detail}" if detail else ""))
+        self.kind = kind
+        self.detail = detail
+
+    @property
+    def policy(self) -> str:
+        return POLICY.get(self.kind, BACKOFF_WAKE)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Delay before attempt number `attempt + 1` (0-based `attempt`)."""
+    return BACKOFF_DELAYS[min(attempt, len(BACKOFF_DELAYS) - 1)]
+
+
+# --- per-device history ---
+
+_history = {}  # serial -> {(kind, key): (count, last_seen, detail)}
+_lock = threading.Lock()
+
+
+def record(serial: str, kind: str, key=None, detail: str = "") -> None:
+    with _lock:
+        entries = _history.setdefault(serial, {})
+        count = entries.get((kind, key), (0,))[0]
+        entries[(kind, key)] = (count + 1, time.monotonic(), detail)
+
+
+def known_bad(serial: str, kind: str, key=None):
+    """The detail of a `kind` failure recorded for `key` within
+    HISTORY_TTL, else None."""
+    with _lock:
+        entry = _history.get(serial, {}).get((kind, key))
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > HISTORY_TTL:
+            del _history[serial][(kind, key)]
+            return None
+        return entry[2] or kind
+
+
+def forget(serial: str, kind: str = None, key=None) -> None:
+    """Drop `serial`'s history (all of it when `kind` is None)."""
+    with _lock:
+        if kind is None:
+            _history.pop(serial, None)
+        else:
+            _history.get(serial, {}).pop((kind, key), None)
+
+
+def history(serial: str) -> list:
+    """[(kind, key, count, seconds_ago, detail)], for diagnostics."""
+    now = time.monotonic()
+    with _lock:
+        return [(kind, key, count, now - at, detail)
+                for (kind, key), (count, at, detail) in _history.get(serial, {}).items()]
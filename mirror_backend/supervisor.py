@@ -0,0 +1,275 @@
+"""One thread that watches every mirroring session.
+
+Each backend lists its child processes (MirrorBackend.processes()). The
+supervisor waits on all of them at once using the OS's own exit
+notification -- pidfds in a selector on Linux, process handles with
+WaitForMultipleObjects on Windows -- and re-checks a session's
+is_running() the moment one of its processes exits, so exits are seen
+without the old one-second poll and without a thread per device.
+
+Some "stopped" states aren't a process exit (relay gave up after rollover,
+shared subscriber dropped, Casting window closed while Casting.exe
+lingers). Those are caught by a slower sweep over all sessions, or right
+away when something calls wake().
+"""
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+
+# is_running() sweep for state that doesn't end with a process exit.
+SWEEP_INTERVAL = 1.0
+# Processes we can't get an exit notification for are polled this often.
+POLL_INTERVAL = 0.2
+# Windows can't wait on the wake socket together with process handles, so
+# the handle wait is cut into slices this long to pick up wake() and newly
+# watched sessions.
+WINDOWS_SLICE = 0.25
+# WaitForMultipleObjects limit.
+_MAX_WAIT_OBJECTS = 64
+
+
+class _Session:
+    def __init__(self, key, backend, on_exit):
+        self.key = key
+        self.backend = backend
+        self.on_exit = on_exit
+        self.watched_at = time.monotonic()
+
+
+class Supervisor:
+    def __init__(self, sweep_interval: float = SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._woken = threading.Event()
+        self._thread = None
+        # pid -> fd (Linux) for processes currently waited on
+        self._pidfds = {}
+        # pids that already reported their exit; not waited on again while
+        # the session still lists them (e.g. the old adb during rollover)
+        self._exited = set()
+        self.dispatched = 0
+        # Seconds from the last dispatched exit being noticed (pidfd or
+        # handle signalled, or poll() for processes without one) to its
+        # on_exit call.
+        self.last_detect_latency = None
+
+    # --- registration ---
+
+    def watch(self, key, backend, on_exit) -> None:
+        """Call `on_exit(key, backend)` (on the supervisor thread) once
+        backend.is_running() turns False. Replaces any session for `key`."""
+        with self._lock:
+            self._sessions[key] = _Session(key, backend, on_exit)
+        self.wake()
+
+    def unwatch(self, key) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+        self.wake()
+
+    def sessions(self) -> list:
+        with self._lock:
+            return list(self._sessions)
+
+    def wake(self) -> None:
+        """Re-check every session now."""
+        self._woken.set()
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    # --- thread ---
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="Supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.wake()
+
+    def run(self) -> None:
+        """Supervise until stop(); blocking."""
+        try:
+            if sys.platform == "win32":
+                self._run_windows()
+            else:
+                self._run_selector()
+        finally:
+            for fd in self._pidfds.values():
+                os.close(fd)
+            self._pidfds.clear()
+
+    def _processes(self):
+        """{pid: (key, Popen)} for every live-looking watched process."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        procs = {}
+        for session in sessions:
+            try:
+                listed = session.backend.processes()
+            except Exception:
+                listed = []
+            for proc in listed:
+                if proc is not None:
+                    procs[proc.pid] = (session.key, proc)
+        return procs
+
+    def _run_selector(self) -> None:
+        sel = selectors.DefaultSelector()
+        sel.register(self._wake_r, selectors.EVENT_READ, None)
+        pidfd_open = getattr(os, "pidfd_open", None)
+        next_sweep = time.monotonic() + self.sweep_interval
+        try:
+            while not self._stop.is_set():
+                procs = self._processes()
+                polled = self._sync_pidfds(sel, procs, pidfd_open)
+                timeout = max(0.0, next_sweep - time.monotonic())
+                if polled:
+                    timeout = min(timeout, POLL_INTERVAL)
+                due = set()
+                exits = {}
+                for key, _ in sel.select(timeout):
+                    if key.data is None:
+                        self._drain_wake()
+                        continue
+                    pid = key.data
+                    self._exited.add(pid)
+                    sel.unregister(key.fd)
+                    os.close(self._pidfds.pop(pid))
+                    if pid in procs:
+                        due.add(procs[pid][0])
+                        exits.setdefault(procs[pid][0], time.monotonic())
+                for pid, (key, proc) in polled.items():
+                    if proc.poll() is not None:
+                        self._exited.add(pid)
+                        due.add(key)
+                        exits.setdefault(key, time.monotonic())
+                now = time.monotonic()
+                if self._woken.is_set() or now >= next_sweep:
+                    self._woken.clear()
+                    due = None  # everything
+                    next_sweep = now + self.sweep_interval
+                self._check(due, exits)
+        finally:
+            sel.close()
+
+    def _sync_pidfds(self, sel, procs, pidfd_open) -> dict:
+        """Wait on new processes, drop finished ones; returns the processes
+        that have to be polled instead."""
+        for pid in list(self._pidfds):
+            if pid not in procs:
+                sel.unregister(self._pidfds[pid])
+                os.close(self._pidfds.pop(pid))
+        self._exited &= set(procs)
+        polled = {}
+        for pid, (key, proc) in procs.items():
+            if pid in self._pidfds or pid in self._exited:
+                continue
+            if pidfd_open is not None:
+                try:
+                    fd = pidfd_open(pid)
+                except ProcessLookupError:
+                    polled[pid] = (key, proc)  # already gone; poll() reports it
+                    continue
+                except OSError:
+                    pidfd_open = None  # kernel without pidfd support
+                else:
+                    self._pidfds[pid] = fd
+                    sel.register(fd, selectors.EVENT_READ, pid)
+                    continue
+            polled[pid] = (key, proc)
+        return polled
+
+    def _run_windows(self) -> None:
+        import _winapi
+        next_sweep = time.monotonic() + self.sweep_interval
+        while not self._stop.is_set():
+            procs = self._processes()
+            self._exited &= set(procs)
+            waitable = [(pid, key, proc) for pid, (key, proc) in procs.items()
+                        if pid not in self._exited and getattr(proc, "_handle", None)]
+            polled = waitable[_MAX_WAIT_OBJECTS:]
+            waitable = waitable[:_MAX_WAIT_OBJECTS]
+            timeout = min(max(0.0, next_sweep - time.monotonic()), WINDOWS_SLICE)
+            if polled:
+                timeout = min(timeout, POLL_INTERVAL)
+            due = set()
+            exits = {}
+            if waitable:
+                result = _winapi.WaitForMultipleObjects(
+                    [int(proc._handle) for _, _, proc in waitable], False, int(timeout * 1000))
+                index = result - _winapi.WAIT_OBJECT_0
+                if 0 <= index < len(waitable):
+                    pid, key, _ = waitable[index]
+                    self._exited.add(pid)
+                    due.add(key)
+                    exits[key] = time.monotonic()
+            else:
+                self._woken.wait(timeout)
+            for pid, key, proc in polled:
+                if proc.poll() is not None:
+                    self._exited.add(pid)
+                    due.add(key)
+                    exits.setdefault(key, time.monotonic())
+            now = time.monotonic()
+            if self._woken.is_set() or now >= next_sweep:
+                self._woken.clear()
+                self._drain_wake()
+                due = None
+                next_sweep = now + self.sweep_interval
+            self._check(due, exits)
+
+    def _drain_wake(self) -> None:
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _check(self, keys, exits=None) -> None:
+        """is_running() for `keys` (None = all); dispatch the ones that ended.
+        `exits`: {key: monotonic time a process exit of it was noticed}."""
+        with self._lock:
+            sessions = [s for k, s in self._sessions.items() if keys is None or k in keys]
+        for session in sessions:
+            try:
+                running = session.backend.is_running()
+            except Exception as e:
+                print(f"Supervisor: is_running failed for {session.key}: {e}")
+                running = False
+            if running:
+                continue
+            with self._lock:
+                if self._sessions.get(session.key) is not session:
+                    continue  # replaced or unwatched meanwhile
+                del self._sessions[session.key]
+            self.dispatched += 1
+            if exits and session.key in exits:
+                self.last_detect_latency = time.monotonic() - exits[session.key]
+            try:
+                session.on_exit(session.key, session.backend)
+            except Exception as e:
+                print(f"Supervisor: exit callback failed for {session.key}: {e}")
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor() -> Supervisor:
+    """Process-wide supervisor (not started; whoever owns the UI thread
+    context decides how to run it)."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = Supervisor()
+        return _supervisor
@@ -0,0 +1,53 @@
+"""Stop many sessions at once (app exit).
+
+Each backend's stop() runs on its own thread, so N sessions take about as
+long as the slowest one, not the sum. A global deadline bounds the whole
+thing: a stop() still running then is left to finish on its daemon thread
+(its processes are already killed by then in the normal case; what hangs is
+device cleanup on an unresponsive adb transport) and the exit goes on.
+"""
+import threading
+import time
+
+STOP_DEADLINE = 5.0
+
+
+def stop_all(backends: dict, deadline: float = STOP_DEADLINE) -> dict:
+    """Stop {key: backend} in parallel. Returns {key: seconds its stop()
+    took}, None for one that hadn't returned by the deadline; a stop() that
+    raised counts as done."""
+    started = time.monotonic()
+    latency = dict.fromkeys(backends)
+    threads = []
+
+    def stop(key, backend):
+        t0 = time.monotonic()
+        try:
+            backend.stop()
+        except Exception as e:
+            print(f"Stopping {key} failed: {e}")
+        latency[key] = time.monotonic() - t0
+
+    for key, backend in backends.items():
+        t = threading.Thread(target=stop, args=(key, backend), name=f"Stop-{key}", daemon=True)
+        t.start()
+        threads.append(t)
+    end = started + deadline
+    for t in threads:
+        t.join(max(0.0, end - time.monotonic()))
+    result = dict(latency)  # snapshot: late finishers don't change it
+    print(report(result, time.monotonic() - started))
+    return result
+
+
+def report(latency: dict, total: float) -> str:
+    """One line: total, slowest session, and any that missed the deadline."""
+    done = {k: v for k, v in latency.items() if v is not None}
+    pending = [str(k) for k, v in latency.items() if v is None]
+    line = f"[{time.strftime('%H:%M:%S')}] Stopped {len(done)}/{len(latency)} session(s) in {total * 1000:.0f} ms"
+    if done:
+        slowest = max(done, key=done.get)
+        line += f" (slowest {slowest}: {done[slowest] * 1000:.0f} ms)"
+    if pending:
+        line += f"; still stopping at the deadline: {', '.join(pending)}"
+    return line
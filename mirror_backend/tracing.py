@@ -0,0 +1,144 @@
+"""Startup traces for backend sessions, exportable as Chrome trace events.
+
+Every backend start() gets a Trace: spans for its phases (adb online check,
+device prep, display resolution, process spawn, readiness, ...) and instant
+marks for things that happen on other threads afterwards (first bytes,
+first frame, first player status). Times are time.monotonic_ns(), kept
+relative to the start of the trace. Spans may overlap and nest (the async
+start overlaps prep with the display lookup; each retry attempt is a span
+around its phases).
+
+The last MAX_TRACES traces are kept. dump(path) writes them in the Chrome
+trace-event format; open the file in chrome://tracing or
+https://ui.perfetto.dev to see one row per session and thread.
+"""
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+MAX_TRACES = 64
+
+
+class Trace:
+    def __init__(self, backend: str, serial: str):
+        self.backend = backend
+        self.serial = serial
+        self.wall_start = time.time()
+        self.t0 = time.monotonic_ns()
+        # (name, start_ns, end_ns or None for a mark, thread name, args)
+        self.events = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        """Time the block; yields `args`, so the block can add to it (an
+        exception raised in it is recorded as args["error"])."""
+        start = time.monotonic_ns()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            self.events.append((name, start - self.t0, time.monotonic_ns() - self.t0,
+                                threading.current_thread().name, args))
+
+    def mark(self, name: str, at_ns: int = None, **args) -> None:
+        """Instant event, now or at `at_ns` (monotonic_ns)."""
+        at = time.monotonic_ns() if at_ns is None else at_ns
+        self.events.append((name, at - self.t0, None, threading.current_thread().name, args))
+
+    def mark_once(self, name: str, **args) -> bool:
+        if any(e[0] == name and e[2] is None for e in self.events):
+            return False
+        self.mark(name, **args)
+        return True
+
+    def elapsed_ms(self, name: str):
+        """End of the first span (or time of the first mark) called `name`."""
+        for event_name, start, end, _, _ in self.events:
+            if event_name == name:
+                return (start if end is None else end) / 1e6
+        return None
+
+    def summary(self) -> str:
+        """One line: spans and marks by start time, in ms since start()."""
+        parts = []
+        for name, start, end, _, args in sorted(self.events, key=lambda e: e[1]):
+            text = f"{name} @{start / 1e6:.0f}" if end is None else f"{name} {start / 1e6:.0f}-{end / 1e6:.0f}"
+            if "error" in args:
+                text += " (failed)"
+            parts.append(text + " ms")
+        return ", ".join(parts)
+
+
+def to_chrome(traces) -> dict:
+    """{"traceEvents": [...]} with one process row per session."""
+    events = []
+    if not traces:
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+    origin = min(t.t0 for t in traces)
+    for pid, trace in enumerate(traces, 1):
+        events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+                       "args": {"name": f"{trace.backend} {trace.serial} "
+                                        f"{time.strftime('%H:%M:%S', time.localtime(trace.wall_start))}"}})
+        tids = {}
+        for name, start, end, thread, args in trace.events:
+            tid = tids.setdefault(thread, len(tids) + 1)
+            event = {"name": name, "pid": pid, "tid": tid, "ts": (trace.t0 - origin + start) / 1000,
+                     "cat": trace.backend, "args": args}
+            if end is None:
+                event.update(ph="i", s="p")
+            else:
+                event.update(ph="X", dur=(end - start) / 1000)
+            events.append(event)
+        for thread, tid in tids.items():
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": thread}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+_traces = collections.deque(maxlen=MAX_TRACES)
+
+
+def start_trace(backend: str, serial: str) -> Trace:
+    """New trace, kept among the recent ones for dump()."""
+    trace = Trace(backend, serial)
+    _traces.append(trace)
+    return trace
+
+
+def recent() -> list:
+    return list(_traces)
+
+
+def dump(path: str, traces=None) -> str:
+    """Write `traces` (default: the recent ones) as Chrome trace JSON."""
+    data = to_chrome(recent() if traces is None else traces)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    return path
+
+
+def watch_log(trace: Trace, reactor, source: str, labels, patterns: dict):
+    """Mark `trace` the first time a line from `source`'s pipes labelled one
+    of `labels` matches ({mark name: substring or predicate(text)}); the
+    handler removes itself once every pattern was seen. Returns it, for
+    reactor.remove_handler() when the session ends first."""
+    labels = set(labels)
+    pending = dict(patterns)
+
+    def handler(record):
+        if record.source != source or record.label not in labels:
+            return
+        for name, match in list(pending.items()):
+            if match(record.text) if callable(match) else match in record.text:
+                del pending[name]
+                trace.mark(name)
+        if not pending:
+            reactor.remove_handler(handler)
+
+    reactor.add_handler(handler, raw=True)
+    return handler
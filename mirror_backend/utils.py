@@ -28,6 +28,10 @@ def get_user_config_path():
     return os.path.join(base, 'config.ini')
 
 def get_adb_path():
+    # Override for test/benchmark harnesses (e.g. a simulated adb, see
+    # benchmarks/fake_headset.py).
+    if os.environ.get('QSC_ADB_PATH'):
+        return os.environ['QSC_ADB_PATH']
     if sys.platform == 'win32':
         bundled_adb = os.path.join(get_base_path(), "scrcpy", "adb.exe")
         if os.path.exists(bundled_adb):
@@ -41,6 +45,14 @@ def get_scrcpy_path():
             return bundled_scrcpy
     return "scrcpy"
 
+def get_player_path():
+    # ffplay from PATH; QSC_PLAYER_PATH overrides it like QSC_ADB_PATH.
+    return os.environ.get('QSC_PLAYER_PATH') or "ffplay"
+
+def get_ffmpeg_path():
+    # ffmpeg from PATH (virtual camera decoder); QSC_FFMPEG_PATH overrides it.
+    return os.environ.get('QSC_FFMPEG_PATH') or "ffmpeg"
+
 def check_process_alive(process):
     if process is None:
         return False
@@ -0,0 +1,330 @@
+"""Virtual camera output: a headset's stream as a webcam (e.g. in OBS).
+
+    broker subscription (H.264, broker.py)
+        -> ffmpeg: decode, eye crop / correction (as for the player), scale
+        -> rgb24 rawvideo on a pipe
+        -> FrameRing: readinto() straight into preallocated NumPy frames
+        -> sink thread: the newest complete frame -> sink.send()
+
+No frame is allocated, copied or queued per frame. The reader fills a free
+slot of a small ring and publishes it; the sink thread always takes the
+newest published frame. Frames it didn't get to are overwritten, so a slow
+sink (or a stalled camera driver) costs dropped frames, never latency.
+
+A sink is anything with send(frame) and close(); options['vcam_sink'] picks
+one: "pyvirtualcam" (default; OBS Virtual Camera on Windows, v4l2loopback
+on Linux), "null", "file:<path>" (raw rgb24 frames), or a sink object.
+pyvirtualcam allows one camera per process, so only one device at a time
+can use that sink.
+"""
+import importlib.util
+import shutil
+import subprocess
+import threading
+import time
+
+from .base import MirrorBackend
+from .broker import acquire_broker, release_broker, POLICY_DROP_TO_IDR
+from .logreactor import get_reactor
+from . import procgroup
+from .screenrecord import ScreenRecordBackend
+from .utils import get_ffmpeg_path
+
+DEFAULT_SIZE = (1280, 720)
+DEFAULT_FPS = 30
+# The frame being written, the newest complete one, the one the sink holds.
+RING_SLOTS = 3
+
+
+def available() -> bool:
+    """pyvirtualcam and ffmpeg are installed."""
+    return importlib.util.find_spec("pyvirtualcam") is not None and shutil.which(get_ffmpeg_path()) is not None
+
+
+class FrameRing:
+    """Fixed-size frames, one writer (fill_from) and one reader (take)."""
+
+    def __init__(self, width: int, height: int, channels: int = 3, slots: int = RING_SLOTS):
+        import numpy as np
+        if slots < 3:
+            raise ValueError("a FrameRing needs at least 3 slots")
+        self.frames = np.empty((slots, height, width, channels), dtype=np.uint8)
+        self.frame_bytes = width * height * channels
+        # Made once: per frame only these get filled and handed out.
+        self._arrays = list(self.frames)
+        self._views = [memoryview(a).cast("B") for a in self._arrays]
+        self._cond = threading.Condition()
+        self._writing = 0
+        self._newest = None
+        self._held = None
+        self._seq = 0        # frames published
+        self._taken = 0      # seq of the last frame handed out
+        self._closed = False
+        self.dropped = 0     # published frames overwritten before take()
+
+    def fill_from(self, stream) -> bool:
+        """Read the next frame from `stream` (readinto) and publish it;
+        False at EOF (a partial last frame is discarded)."""
+        view = self._views[self._writing]
+        got = 0
+        while got < self.frame_bytes:
+            # A buffered pipe fills the whole frame in one call; the slice
+            # is only made for a raw stream's short reads.
+            n = stream.readinto(view[got:] if got else view)
+            if not n:
+                return False
+            got += n
+        with self._cond:
+            if self._seq > self._taken:
+                self.dropped += 1
+            self._newest = self._writing
+            self._seq += 1
+            # Neither the frame just published nor the one the sink holds.
+            self._writing = next(i for i in range(len(self._views))
+                                 if i != self._newest and i != self._held)
+            self._cond.notify_all()
+        return True
+
+    def take(self, timeout: float = None):
+        """(seq, frame) for the newest frame not handed out yet, waiting up
+        to `timeout`; None on timeout or once closed. The frame is a view
+        into the ring, valid until the next take()."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._taken or self._closed, timeout):
+                return None
+            if self._seq <= self._taken:
+                return None
+            self._held = self._newest
+            self._taken = self._seq
+            return self._seq, self._arrays[self._held]
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def published(self) -> int:
+        return self._seq
+
+
+def read_frames(ring: FrameRing, stream) -> None:
+    """Fill `ring` from `stream` until EOF, then close it."""
+    try:
+        while ring.fill_from(stream):
+            pass
+    except (OSError, ValueError):
+        pass  # pipe closed under us by stop()
+    finally:
+        ring.close()
+
+
+class FrameOutput:
+    """Decoder stdout -> FrameRing -> sink, on two daemon threads."""
+
+    def __init__(self, width: int, height: int, sink, name: str = ""):
+        self.ring = FrameRing(width, height)
+        self.sink = sink
+        self.name = name
+        self.sent = 0
+        self._threads = []
+
+    def start(self, stream) -> None:
+        self._threads = [
+            threading.Thread(target=self._read, args=(stream,), name=f"VCamRead-{self.name}", daemon=True),
+            threading.Thread(target=self._send, name=f"VCamSink-{self.name}", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _read(self, stream) -> None:
+        read_frames(self.ring, stream)
+
+    def _send(self) -> None:
+        while True:
+            item = self.ring.take()
+            if item is None:
+                return
+            try:
+                self.sink.send(item[1])
+            except Exception as e:
+                print(f"[{time.strftime('%H:%M:%S')}] Virtual camera sink failed for {self.name}: {e}")
+                self.ring.close()
+                return
+            self.sent += 1
+
+    def is_alive(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self.ring.close()
+        for t in self._threads:
+            t.join(timeout)
+        self.sink.close()
+
+    def stats(self) -> dict:
+        return {"frames": self.ring.published, "sent": self.sent, "dropped": self.ring.dropped}
+
+
+# --- sinks ---
+
+class NullSink:
+    """Counts frames (tests, benchmarks, headless runs)."""
+
+    def __init__(self):
+        self.frames = 0
+
+    def send(self, frame) -> None:
+        self.frames += 1
+
+    def close(self) -> None:
+        pass
+
+
+class FileSink:
+    """Raw rgb24 frames appended to a file (`ffplay -f rawvideo
+    -pixel_format rgb24 -video_size WxH <path>` plays it)."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "wb")
+
+    def send(self, frame) -> None:
+        self._f.write(frame)  # the ring's buffer as is, no copy
+
+    def close(self) -> None:
+        self._f.close()
+
+
+_camera_lock = threading.Lock()
+_camera_in_use = False
+
+
+class PyVirtualCamSink:
+    def __init__(self, width: int, height: int, fps: float, device: str = None):
+        global _camera_in_use
+        import pyvirtualcam
+        with _camera_lock:
+            if _camera_in_use:
+                raise RuntimeError("Only one virtual camera per process (pyvirtualcam); stop the other one first.")
+            self.cam = pyvirtualcam.Camera(width, height, fps, fmt=pyvirtualcam.PixelFormat.RGB,
+                                           device=device or None)
+            _camera_in_use = True
+        print(f"[{time.strftime('%H:%M:%S')}] Virtual camera: {self.cam.device} ({width}x{height} @ {fps:g})")
+
+    def send(self, frame) -> None:
+        self.cam.send(frame)
+
+    def close(self) -> None:
+        global _camera_in_use
+        with _camera_lock:
+            if self.cam is None:
+                return
+            self.cam.close()
+            self.cam = None
+            _camera_in_use = False
+
+
+def make_sink(options: dict, width: int, height: int, fps: float):
+    spec = options.get('vcam_sink', 'pyvirtualcam')
+    if not isinstance(spec, str):
+        return spec
+    if spec == 'null':
+        return NullSink()
+    if spec.startswith('file:'):
+        return FileSink(spec[len('file:'):])
+    return PyVirtualCamSink(width, height, fps, options.get('vcam_device'))
+
+
+# --- backend ---
+
+def build_decoder_cmd(options: dict, width: int, height: int, filters: list = None,
+                      decoder_args: list = ()) -> list:
+    """ffmpeg: Annex-B H.264 on stdin -> fixed-size rgb24 frames on stdout,
+    with the player's eye crop / correction (or `filters`, which must
+    produce width x height). `decoder_args` go before the input."""
+    if filters is None:
+        # setpts=0 is for ffplay's clock; the decoder keeps the real timestamps.
+        filters = [f for f in ScreenRecordBackend._build_video_filters(options) if f != "setpts=0"]
+        filters.append(f"scale={width}:{height}")
+    return [
+        get_ffmpeg_path(), "-hide_banner", "-loglevel", "error",
+        *decoder_args,
+        "-f", "h264", "-flags", "low_delay", "-probesize", "32", "-i", "-",
+        "-vf", ",".join(filters),
+        # One output frame per decoded frame: no duplicates to keep a rate.
+        "-fps_mode", "passthrough",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+    ]
+
+
+class VirtualCameraBackend(MirrorBackend):
+    """The device's shared capture (broker.py) decoded into a sink."""
+
+    def __init__(self):
+        self.serial = None
+        self.decoder = None
+        self.output = None
+        self._broker = None
+        self._subscriber = None
+        self._group = procgroup.ProcessGroup()
+
+    def start(self, serial: str, options: dict) -> None:
+        if self.is_running():
+            self.stop()
+        width = int(options.get('vcam_width', DEFAULT_SIZE[0]))
+        height = int(options.get('vcam_height', DEFAULT_SIZE[1]))
+        fps = float(options.get('vcam_fps', DEFAULT_FPS))
+        # The sink first: no camera driver, no reason to start a capture.
+        sink = make_sink(options, width, height, fps)
+        try:
+            broker = acquire_broker(serial, options)
+        except Exception:
+            sink.close()
+            raise
+        try:
+            self.decoder = self._group.popen(
+                build_decoder_cmd(options, width, height),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except Exception:
+            release_broker(broker)
+            sink.close()
+            raise
+        self.serial = serial
+        self._broker = broker
+        self.output = FrameOutput(width, height, sink, name=serial)
+        self.output.start(self.decoder.stdout)
+        self._subscriber = broker.subscribe(
+            name=f"vcam {serial}", policy=options.get('slow_consumer', POLICY_DROP_TO_IDR)
+        )
+        self._subscriber.pipe_to(self.decoder.stdin)
+        get_reactor().add(self.decoder.stderr, label="VirtualCamera", source=serial)
+        print(f"[{time.strftime('%H:%M:%S')}] Virtual camera decoder started (PID {self.decoder.pid}) for {serial}")
+
+    def stop(self) -> None:
+        if self._subscriber is not None:
+            self._subscriber.close()
+            self._subscriber = None
+        if self._broker is not None:
+            release_broker(self._broker)
+            self._broker = None
+        self._group.kill()
+        self._group.wait(1.0)
+        self._group.close()
+        self._group = procgroup.ProcessGroup()
+        self.decoder = None
+        if self.output is not None:
+            self.output.stop()
+            stats = self.output.stats()
+            print(f"[{time.strftime('%H:%M:%S')}] Virtual camera stopped for {self.serial}: "
+                  f"{stats['sent']}/{stats['frames']} frames sent, {stats['dropped']} dropped")
+            self.output = None
+        self.serial = None
+
+    def is_running(self) -> bool:
+        if self.decoder is None or self.decoder.poll() is not None:
+            return False
+        return self._subscriber is not None and not self._subscriber.closed and self.output.is_alive()
+
+    def processes(self) -> list:
+        return [self.decoder] if self.decoder is not None else []
@@ -0,0 +1,200 @@
+"""In-process stand-in for the adb server (localhost socket protocol).
+
+Serves the handful of services the app uses. Device shell commands run in a
+real /bin/sh, so tests exercise actual output and exit codes.
+"""
+import socketserver
+import struct
+import subprocess
+import threading
+import time
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        serial = None
+        while True:
+            service = self._read_request(sock)
+            if service is None:
+                return
+            server.requests.append(service)
+            if service == "host:version":
+                return self._reply(sock, "0029")
+            if service in ("host:devices", "host:devices-l"):
+                return self._reply(sock, server.devices_text(service.endswith("-l")))
+            if service in ("host:track-devices", "host:track-devices-l"):
+                return self._track(sock, service.endswith("-l"))
+            if service.startswith("host-serial:"):
+                _, dev, what = service.split(":", 2)
+                if dev not in server.devices:
+                    return self._fail(sock, f"device '{dev}' not found")
+                if what == "get-state":
+                    return self._reply(sock, server.devices[dev])
+                if what == "features":
+                    return self._reply(sock, ",".join(server.features))
+                return self._fail(sock, f"unknown host service {what}")
+            if service.startswith("host:transport:"):
+                serial = service.split(":", 2)[2]
+                if serial not in server.devices:
+                    return self._fail(sock, f"device '{serial}' not found")
+                if server.devices[serial] != "device":
+                    return self._fail(sock, f"device {server.devices[serial]}")
+                sock.sendall(b"OKAY")
+                continue
+            if serial is None:
+                return self._fail(sock, f"unknown service {service}")
+            return self._device_service(sock, service, serial)
+
+    def _device_service(self, sock, service, serial):
+        kind, _, command = service.partition(":")
+        if kind == "shell,v2,raw":
+            sock.sendall(b"OKAY")
+            res = self.server.run_shell(command, serial)
+            for packet_id, data in ((1, res.stdout), (2, res.stderr)):
+                if data:
+                    sock.sendall(struct.pack("<BI", packet_id, len(data)) + data)
+            sock.sendall(struct.pack("<BI", 3, 1) + bytes([res.returncode & 0xFF]))
+        elif kind in ("shell", "exec") and command:
+            sock.sendall(b"OKAY")
+            res = self.server.run_shell(command, serial)
+            sock.sendall(res.stdout + (res.stderr if kind == "shell" else b""))
+        elif kind in ("shell", "shell,raw") and not command:
+            sock.sendall(b"OKAY")
+            self._interactive(sock, serial)
+        else:
+            self._fail(sock, f"unknown service {service}")
+
+    def _track(self, sock, long):
+        # Full list on connect and after every change, like the real server.
+        server = self.server
+        sock.sendall(b"OKAY")
+        with server.changed:
+            while not server.stopping:
+                seen = server.generation
+                data = server.devices_text(long).encode()
+                try:
+                    sock.sendall(b"%04x" % len(data) + data)
+                except OSError:
+                    return
+                while server.generation == seen and not server.stopping:
+                    server.changed.wait(0.5)
+
+    def _interactive(self, sock, serial):
+        proc = subprocess.Popen(["sh"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                env=self.server.shell_env(serial))
+
+        def pump_out():
+            for chunk in iter(lambda: proc.stdout.read1(65536), b""):
+                try:
+                    sock.sendall(chunk)
+                except OSError:
+                    break
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+
+        threading.Thread(target=pump_out, daemon=True).start()
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                proc.stdin.write(data)
+                proc.stdin.flush()
+        except OSError:
+            pass
+        finally:
+            proc.kill()
+            proc.wait()
+
+    @staticmethod
+    def _read_request(sock):
+        header = b""
+        while len(header) < 4:
+            chunk = sock.recv(4 - len(header))
+            if not chunk:
+                return None
+            header += chunk
+        length = int(header, 16)
+        data = b""
+        while len(data) < length:
+            data += sock.recv(length - len(data))
+        return data.decode()
+
+    @staticmethod
+    def _reply(sock, text):
+        data = text.encode()
+        sock.sendall(b"OKAY" + b"%04x" % len(data) + data)
+
+    @staticmethod
+    def _fail(sock, text):
+        data = text.encode()
+        sock.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, devices=None, features=("shell_v2", "cmd"), env=None, shell_delay=0.0):
+        """env: environment for device shell commands (e.g. a PATH with
+        stand-ins for device tools); shell_delay: seconds added to every
+        one-shot shell command (device/link latency)."""
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.env = env
+        self.shell_delay = shell_delay
+        self.devices = dict(devices or {"FAKE0001": "device"})
+        self.features = list(features)
+        self.requests = []
+        self.changed = threading.Condition()
+        self.generation = 0
+        self.stopping = False
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def set_device(self, serial, state=None):
+        """Add/update (state) or remove (state None) a device and notify
+        track-devices clients."""
+        with self.changed:
+            if state is None:
+                self.devices.pop(serial, None)
+            else:
+                self.devices[serial] = state
+            self.generation += 1
+            self.changed.notify_all()
+
+    def shell_env(self, serial):
+        """Environment of `serial`'s shell commands (ANDROID_SERIAL tells
+        stand-in tools which device they run on)."""
+        if self.env is None:
+            return None
+        return dict(self.env, ANDROID_SERIAL=serial)
+
+    def run_shell(self, command, serial=None):
+        if self.shell_delay:
+            time.sleep(self.shell_delay)
+        return subprocess.run(["sh", "-c", command], capture_output=True, env=self.shell_env(serial))
+
+    def devices_text(self, long):
+        lines = []
+        for serial, state in self.devices.items():
+            extra = " product:eureka model:Quest_3 device:eureka transport_id:1" if long else ""
+            lines.append(f"{serial}\t{state}{extra}" if not long else f"{serial}       {state}{extra}")
+        return "".join(line + "\n" for line in lines)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        with self.changed:
+            self.stopping = True
+            self.changed.notify_all()
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,55 @@
+import unittest
+
+from fake_adb_server import FakeAdbServer
+from mirror_backend.adbclient import AdbClient, AdbError
+
+
+class AdbClientTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAdbServer({"FAKE0001": "device", "FAKE0002": "unauthorized"}).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.client = AdbClient(port=self.server.port, pool_size=2)
+        self.addCleanup(self.client.close)
+
+    def test_host_services(self):
+        self.assertEqual(self.client.version(), 0x29)
+        self.assertEqual(self.client.get_state("FAKE0001"), "device")
+        self.assertEqual(self.client.get_state("FAKE0002"), "unauthorized")
+        self.assertIn("model:Quest_3", self.client.devices(long=True))
+
+    def test_unknown_device_raises_server_message(self):
+        with self.assertRaisesRegex(AdbError, "not found"):
+            self.client.get_state("MISSING")
+
+    def test_shell_v2_returns_output_and_exit_code(self):
+        res = self.client.shell("FAKE0001", "echo out; echo err >&2; exit 3")
+        self.assertEqual(res.stdout, b"out\n")
+        self.assertEqual(res.stderr, b"err\n")
+        self.assertEqual(res.returncode, 3)
+
+    def test_shell_v1_without_shell_v2_feature(self):
+        self.server.features = []
+        res = self.client.shell("FAKE0001", "echo hello")
+        self.assertEqual(res.stdout, b"hello\n")
+        self.assertEqual(res.returncode, 0)
+
+    def test_pool_prefills_connections(self):
+        self.client.prefill()
+        self.assertEqual(len(self.client._idle), 2)
+        self.client.get_state("FAKE0001")
+        self.assertEqual(self.client.get_state("FAKE0001"), "device")
+
+    def test_exec_out_streams_raw_stdout(self):
+        sock = self.client.exec_out("FAKE0001", "printf 'ab\\0cd'")
+        data = b""
+        while True:
+            chunk = sock.recv(100)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        self.assertEqual(data, b"ab\0cd")
+
+
+if __name__ == "__main__":
+    unittest.main()
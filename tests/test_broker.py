@@ -0,0 +1,109 @@
+import subprocess
+import sys
+import unittest
+
+from mirror_backend import metrics
+from mirror_backend.broker import POLICY_DISCONNECT, POLICY_DROP_TO_IDR, StreamBroker
+from mirror_backend.h264 import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS
+from mirror_backend.screenrecord import ScreenRecordBackend
+
+SPS = b"\x00\x00\x00\x01\x67\x42"
+PPS = b"\x00\x00\x00\x01\x68\xce"
+IDR = b"\x00\x00\x01\x65\x88" + b"\x11" * 20
+P = b"\x00\x00\x01\x41\x9a" + b"\x22" * 20
+
+
+def feed(broker, *units):
+    for t, data in units:
+        broker._on_nal(t, memoryview(data), 0.0)
+
+
+GOP = ((NAL_SPS, SPS), (NAL_PPS, PPS), (NAL_IDR, IDR), (NAL_SLICE, P))
+
+
+class StreamBrokerTests(unittest.TestCase):
+    def test_every_subscriber_gets_the_stream(self):
+        broker = StreamBroker("dev")
+        a = broker.subscribe("a")
+        b = broker.subscribe("b")
+        feed(broker, *GOP)
+        expected = SPS + PPS + IDR + P
+        self.assertEqual(a.read(0), expected)
+        self.assertEqual(b.read(0), expected)
+
+    def test_late_subscriber_starts_from_cached_gop(self):
+        broker = StreamBroker("dev")
+        feed(broker, *GOP)
+        late = broker.subscribe("late")
+        self.assertEqual(late.read(0), SPS + PPS + IDR + P)
+
+    def test_slow_subscriber_resumes_at_next_idr_with_parameter_sets(self):
+        broker = StreamBroker("dev")
+        slow = broker.subscribe("slow", max_bytes=len(SPS + PPS + IDR) + 5, policy=POLICY_DROP_TO_IDR)
+        fast = broker.subscribe("fast")
+        feed(broker, *GOP)  # P overflows the slow queue
+        feed(broker, (NAL_SLICE, P), (NAL_IDR, IDR))
+        self.assertEqual(slow.read(0), SPS + PPS + IDR)
+        self.assertEqual(slow.overflows, 1)
+        self.assertEqual(fast.read(0), SPS + PPS + IDR + P + P + IDR)
+
+    def test_disconnect_policy_closes_slow_subscriber(self):
+        broker = StreamBroker("dev")
+        slow = broker.subscribe("slow", max_bytes=10, policy=POLICY_DISCONNECT)
+        feed(broker, *GOP)
+        self.assertTrue(slow.closed)
+        self.assertIsNone(slow.read(0))
+        self.assertEqual(broker.subscribers(), [])
+
+    def relay_into(self, broker, watch=False):
+        """Run a real relay (a finished fake adb, primer first) into `broker`
+        until the stream ends."""
+        backend = ScreenRecordBackend()
+        backend.serial = "dev"
+        backend.adb_process = subprocess.Popen(
+            [sys.executable, "-c", f"import sys; sys.stdout.buffer.write({SPS + PPS + IDR + P!r})"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        try:
+            reader, primer, failure = backend._await_stream(5.0)
+            self.assertIsNone(failure)
+            backend._start_feed({'relay_listeners': [broker._on_nal]}, True, False, reader, primer)
+            if watch:
+                broker.backend = backend
+                broker._watch_capture(backend)
+            backend.relay._thread.join(5)
+        finally:
+            backend.adb_process.wait(5)
+            metrics.detach("dev", backend.metrics)
+
+    def test_primer_reaches_the_broker(self):
+        # screenrecord sends SPS/PPS once, in the primer the relay forwards
+        # as soon as it starts; the broker must already be listening.
+        broker = StreamBroker("dev")
+        sub = broker.subscribe("a")
+        self.relay_into(broker)
+        self.assertEqual((broker.sps, broker.pps), (SPS, PPS))
+        self.assertEqual(sub.read(0), SPS + PPS + IDR + P)
+        self.assertEqual(broker.subscribe("late").read(0), SPS + PPS + IDR + P)
+
+    def test_capture_end_closes_subscribers(self):
+        broker = StreamBroker("dev")
+        sub = broker.subscribe("a")
+        self.relay_into(broker, watch=True)
+        self.assertTrue(sub.closed)
+        self.assertEqual(sub.close_reason, "capture ended")
+        self.assertEqual(sub.read(0), SPS + PPS + IDR + P)  # what came before is still delivered
+        self.assertIsNone(sub.read(0))
+
+    def test_capture_restart_keeps_subscribers(self):
+        broker = StreamBroker("dev")
+        sub = broker.subscribe("a")
+        feed(broker, *GOP)
+        broker.stop_capture()
+        self.assertFalse(sub.closed)
+        self.assertEqual(broker.subscribe("late").read(0), b"")  # no stale GOP
+        feed(broker, *GOP)
+        self.assertEqual(sub.read(0), (SPS + PPS + IDR + P) * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import unittest
+
+from fake_adb_server import FakeAdbServer
+from mirror_backend.adbclient import AdbClient
+from mirror_backend.devicewatch import DeviceWatcher, diff_devices, parse_devices
+
+
+class ParseTests(unittest.TestCase):
+    def test_parse_and_diff(self):
+        old = parse_devices("A1  device product:eureka model:Quest_3 device:eureka transport_id:1\n")
+        new = parse_devices(
+            "A1  offline product:eureka model:Quest_3 device:eureka transport_id:1\n"
+            "B2  no permissions (user not in plugdev) usb:1-1 transport_id:2\n"
+        )
+        self.assertEqual(old["A1"]["model"], "Quest_3")
+        self.assertEqual(new["B2"]["state"], "no permissions (user not in plugdev)")
+        self.assertEqual(
+            [(k, s) for k, s, _ in diff_devices(old, new)],
+            [("changed", "A1"), ("added", "B2")],
+        )
+        self.assertEqual([(k, s) for k, s, _ in diff_devices(new, {})],
+                         [("removed", "A1"), ("removed", "B2")])
+
+
+class DeviceWatcherTests(unittest.TestCase):
+    def test_streams_incremental_changes(self):
+        events = []
+        got = threading.Condition()
+
+        def on_change(changes):
+            with got:
+                events.extend((k, s, r["state"]) for k, s, r in changes)
+                got.notify_all()
+
+        def wait_for(n):
+            with got:
+                got.wait_for(lambda: len(events) >= n, timeout=5)
+
+        with FakeAdbServer({"A1": "device"}) as server:
+            watcher = DeviceWatcher(on_change, client=AdbClient(port=server.port, pool_size=0))
+            watcher.start()
+            wait_for(1)
+            server.set_device("B2", "device")
+            wait_for(2)
+            server.set_device("A1", "offline")
+            wait_for(3)
+            server.set_device("B2")
+            wait_for(4)
+            watcher.stop()
+        self.assertEqual(events, [
+            ("added", "A1", "device"),
+            ("added", "B2", "device"),
+            ("changed", "A1", "offline"),
+            ("removed", "B2", "device"),
+        ])
+        self.assertEqual(server.requests.count("host:track-devices-l"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from mirror_backend import devinfo
+
+SAMPLE = """@@qsc:model
+Quest 3
+@@qsc:build
+UP1A.231005.007.A1
+@@qsc:sdk
+32
+@@qsc:displays
+Displays:
+  Display 0: state=ON, type=INTERNAL, uniqueId="local:1"
+  Display 2: state=ON, type=VIRTUAL, uniqueId="virtual:com.oculus"
+@@qsc:size
+Physical size: 4128x2208
+Override size: 3664x1920
+@@qsc:route
+192.168.1.0/24 dev wlan0 proto kernel scope link src 192.168.1.42
+"""
+
+
+class DeviceInfoTests(unittest.TestCase):
+    def tearDown(self):
+        devinfo.invalidate_all()
+
+    def test_parse_batched_output(self):
+        info = devinfo.parse_batch("S1", SAMPLE)
+        self.assertEqual(info.model, "Quest 3")
+        self.assertEqual(info.build, "UP1A.231005.007.A1")
+        self.assertEqual(info.sdk, 32)
+        self.assertEqual(info.display_ids, [0, 2])
+        self.assertEqual(info.size, (3664, 1920))
+        self.assertEqual(info.ip, "192.168.1.42")
+
+    def test_missing_sections_leave_defaults(self):
+        info = devinfo.parse_batch("S1", "@@qsc:model\nQuest 2\n@@qsc:route\n")
+        self.assertEqual(info.model, "Quest 2")
+        self.assertEqual(info.display_ids, [])
+        self.assertIsNone(info.size)
+        self.assertIsNone(info.ip)
+
+    def test_reconnect_or_disconnect_invalidates(self):
+        devinfo.note_transport("S1", "3")
+        devinfo._cache["S1"] = devinfo.parse_batch("S1", SAMPLE)
+        devinfo.note_transport("S1", "3")
+        self.assertIn("S1", devinfo._cache)
+        devinfo.note_transport("S1", "4")
+        self.assertNotIn("S1", devinfo._cache)
+        devinfo._cache["S1"] = devinfo.parse_batch("S1", SAMPLE)
+        devinfo.forget_missing({"S2": "Quest_3"})
+        self.assertNotIn("S1", devinfo._cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
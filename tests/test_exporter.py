@@ -0,0 +1,66 @@
+import subprocess
+import sys
+import time
+import unittest
+import urllib.request
+
+from mirror_backend.exporter import MetricsExporter, collect, process_usage, render
+
+
+class FakeBackend:
+    rollovers = 2
+
+    def __init__(self, procs=()):
+        self.procs = list(procs)
+
+    def is_running(self):
+        return True
+
+    def processes(self):
+        return self.procs
+
+
+class ExporterTests(unittest.TestCase):
+    def setUp(self):
+        self.proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        self.addCleanup(self.proc.wait)
+        self.addCleanup(self.proc.kill)
+
+    def test_render_lists_every_session(self):
+        sessions = {f"S{i}": {"backend": FakeBackend(), "started_at": 100.0, "start_latency": 0.5}
+                    for i in range(3)}
+        sessions["S0"]["backend"] = FakeBackend([self.proc])
+        page = render(collect(sessions, now=110.0)).decode()
+        self.assertIn("# TYPE quest_caster_session_restarts_total counter", page)
+        for i in range(3):
+            self.assertIn(f'quest_caster_session_info{{serial="S{i}",backend="test_exporter"}} 1', page)
+            self.assertIn(f'quest_caster_session_uptime_seconds{{serial="S{i}"}} 10', page)
+        self.assertIn(f'quest_caster_process_resident_bytes{{serial="S0",process=', page)
+        self.assertNotIn("pid=", page)  # one series per program, across restarts
+
+    @unittest.skipUnless(sys.platform.startswith("linux") or sys.platform == "win32", "needs procfs or Win32")
+    def test_process_usage(self):
+        time.sleep(0.3)  # past exec and interpreter start-up
+        cpu, rss = process_usage(self.proc)
+        self.assertGreaterEqual(cpu, 0.0)
+        self.assertGreater(rss, 1 << 20)
+
+    def test_scrape_serves_cached_page(self):
+        sessions = {f"S{i}": {"backend": FakeBackend(), "started_at": time.monotonic()} for i in range(50)}
+        calls = []
+        exporter = MetricsExporter(lambda: calls.append(1) or sessions, port=0, interval=60)
+        exporter.start()
+        self.addCleanup(exporter.stop)
+        deadline = time.monotonic() + 5
+        while exporter.refreshed_at is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for _ in range(3):
+            with urllib.request.urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as r:
+                body = r.read().decode()
+        self.assertIn('serial="S49"', body)
+        self.assertEqual(len(calls), 1)  # scrapes don't re-collect
+        self.assertEqual(exporter.scrapes, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import io
+import unittest
+
+from mirror_backend.h264 import AnnexBReader, NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS, is_first_slice
+from mirror_backend.relay import StreamRelay
+
+
+SPS = b"\x00\x00\x00\x01\x67\x42\x00\x1f\xaa"
+PPS = b"\x00\x00\x00\x01\x68\xce\x3c\x80"
+IDR = b"\x00\x00\x01\x65\x88" + b"\x11" * 50
+P1 = b"\x00\x00\x01\x41\x9a" + b"\x22" * 30
+P2 = b"\x00\x00\x01\x41\x9b" + b"\x33" * 30
+STREAM = SPS + PPS + IDR + P1 + P2
+
+
+class ChunkedSource:
+    """readinto() source that hands out at most `chunk` bytes per call."""
+
+    def __init__(self, data, chunk):
+        self._data = io.BytesIO(data)
+        self._chunk = chunk
+
+    def readinto(self, b):
+        piece = self._data.read(min(self._chunk, len(b)))
+        b[:len(piece)] = piece
+        return len(piece)
+
+
+def read_all(reader):
+    units = []
+    while True:
+        result = reader.read()
+        if result is None:
+            break
+        units.extend((t, bytes(v)) for t, v in result[1])
+    tail = reader.flush()
+    if tail is not None:
+        units.append((None, bytes(tail)))
+    return units
+
+
+class AnnexBReaderTests(unittest.TestCase):
+    def test_splits_on_both_start_code_lengths(self):
+        units = read_all(AnnexBReader(ChunkedSource(STREAM, 4096)))
+        self.assertEqual([t for t, _ in units[:4]], [NAL_SPS, NAL_PPS, NAL_IDR, NAL_SLICE])
+        self.assertEqual(b"".join(v for _, v in units), STREAM)
+
+    def test_start_codes_split_across_reads(self):
+        for chunk in (1, 2, 3, 5, 7):
+            units = read_all(AnnexBReader(ChunkedSource(STREAM, chunk)))
+            self.assertEqual([v for _, v in units], [SPS, PPS, IDR, P1, P2], chunk)
+
+    def test_small_buffer_is_reused_and_grown(self):
+        units = read_all(AnnexBReader(ChunkedSource(STREAM * 3, 16), buffer_size=32))
+        self.assertEqual(b"".join(v for _, v in units), STREAM * 3)
+
+    def test_error_text_before_stream_is_kept_as_preamble(self):
+        text = b"ERROR: INVALID_LAYER_STACK, please check your display state.\n"
+        reader = AnnexBReader(ChunkedSource(text, 10))
+        self.assertEqual(read_all(reader), [])
+        self.assertEqual(reader.preamble, text)
+
+    def test_first_slice_flag(self):
+        self.assertTrue(is_first_slice(IDR))
+        self.assertFalse(is_first_slice(b"\x00\x00\x01\x41\x1a"))
+
+
+class StreamRelayTests(unittest.TestCase):
+    def test_forwards_stream_and_counts_frames(self):
+        sink = io.BytesIO()
+        relay = StreamRelay(ChunkedSource(STREAM, 7), sink)
+        seen = []
+        relay.add_listener(lambda t, nal, ts: seen.append(t))
+        relay.start()
+        relay._thread.join(5)
+        self.assertEqual(sink.getvalue(), STREAM)
+        self.assertEqual(relay.frames, 3)
+        self.assertEqual(relay.keyframes, 1)
+        self.assertEqual(relay.sps, SPS)
+        self.assertEqual(seen, [NAL_SPS, NAL_PPS, NAL_IDR, NAL_SLICE, NAL_SLICE])
+
+    def test_splice_continues_on_new_stream_with_parameter_sets(self):
+        sink = io.BytesIO()
+        relay = StreamRelay(ChunkedSource(STREAM, 7), sink)
+        relay.hold_on_eof = 2.0
+        new_idr = b"\x00\x00\x01\x65\x88" + b"\x44" * 20
+        rest = b"\x00\x00\x01\x41\x9a" + b"\x55" * 20
+
+        def on_end(r, reader):
+            if reader is not new_reader:
+                # Primer without SPS/PPS: the relay must carry them over.
+                r.splice(new_reader, [(NAL_IDR, new_idr)])
+            else:
+                r.hold_on_eof = 0
+
+        new_reader = AnnexBReader(ChunkedSource(rest, 7))
+        relay.on_source_end = on_end
+        relay.start()
+        relay._thread.join(5)
+        self.assertEqual(sink.getvalue(), STREAM + SPS + PPS + new_idr + rest)
+        self.assertEqual(len(relay.splice_gaps), 1)
+        self.assertEqual(relay.keyframes, 2)
+
+    def test_mid_stream_splice_drops_the_cut_off_nal(self):
+        sink = io.BytesIO()
+        cut = b"\x00\x00\x01\x41\x9a" + b"\x66" * 5  # a slice adb never finished
+        new_idr = b"\x00\x00\x01\x65\x88" + b"\x44" * 20
+        new_reader = AnnexBReader(ChunkedSource(new_idr, 7))
+
+        class Source(ChunkedSource):
+            def readinto(self, b):
+                n = super().readinto(b)
+                if n:
+                    relay.splice(new_reader, [])  # applied after this read
+                return n
+
+        relay = StreamRelay(Source(STREAM + cut, len(STREAM + cut)), sink)
+        relay.start()
+        relay._thread.join(5)
+        self.assertEqual(sink.getvalue(), STREAM + SPS + PPS + new_idr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+import threading
+import unittest
+
+from mirror_backend.logreactor import LogReactor
+
+# ffplay-style: a status line redrawn with \r, then a normal line.
+CHILD = r"""
+import sys, time
+for i in range(200):
+    sys.stderr.write("%7.2f M-V: %6.3f fd=%4d aq=    0KB vq=  %3dKB sq=    0B \r" % (i / 10, 0.001 * i, i, i % 50))
+sys.stderr.write("\nInput #0, h264, from 'pipe:':\n")
+sys.stderr.write("partial last line")
+"""
+
+
+class LogReactorTests(unittest.TestCase):
+    def test_lines_parsed_and_repeats_collapsed(self):
+        reactor = LogReactor()
+        raw, shown = [], []
+        reactor.add_handler(raw.append, raw=True)
+        reactor.add_handler(shown.append)
+        done = threading.Event()
+        procs = []
+        for n in range(3):
+            proc = subprocess.Popen([sys.executable, "-c", CHILD], stderr=subprocess.PIPE)
+            procs.append(proc)
+            reactor.add(proc.stderr, label="Player", source=f"dev{n}",
+                        on_close=(lambda: done.set()) if n == 2 else None)
+        for proc in procs:
+            proc.wait()
+        self.assertTrue(done.wait(5))
+        reactor.stop()
+        reactor._thread.join(5)
+
+        self.assertEqual(len([r for r in raw if r.source == "dev0"]), 202)
+        dev0 = [r.text for r in shown if r.source == "dev0"]
+        # The 200 status lines collapse into the first one plus a summary.
+        self.assertEqual(len(dev0), 4)
+        self.assertTrue(dev0[0].startswith("0.00 M-V:"))
+        self.assertEqual(dev0[1:], ["(199 similar lines skipped)", "Input #0, h264, from 'pipe:':", "partial last line"])
+        self.assertEqual(reactor.lines_suppressed, 3 * 199)
+
+    def test_one_thread_for_many_pipes(self):
+        reactor = LogReactor()
+        before = threading.active_count()
+        procs = [subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.5)"],
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE) for _ in range(8)]
+        for proc in procs:
+            reactor.add(proc.stdout, label="out")
+            reactor.add(proc.stderr, label="err")
+        self.assertEqual(threading.active_count(), before + 1)
+        for proc in procs:
+            proc.wait()
+        reactor.stop()
+        reactor._thread.join(5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+from mirror_backend.h264 import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS
+from mirror_backend.metrics import Ring, StreamMetrics
+
+SPS = b"\x00\x00\x00\x01\x67\x42"
+PPS = b"\x00\x00\x00\x01\x68\xce"
+
+
+def frame(idr, size, first=True):
+    return (NAL_IDR if idr else NAL_SLICE), b"\x00\x00\x01" + (b"\x65" if idr else b"\x41") + \
+        (b"\x88" if first else b"\x08") + b"\x00" * (size - 5)
+
+
+class RingTests(unittest.TestCase):
+    def test_wraps_and_keeps_order(self):
+        ring = Ring("I", 4)
+        for v in range(1, 7):
+            ring.append(v)
+        self.assertEqual(ring.values(), [3, 4, 5, 6])
+        self.assertEqual(ring.values(2), [5, 6])
+        self.assertEqual(ring.last(), 6)
+        self.assertEqual(len(ring), 4)
+
+
+class StreamMetricsTests(unittest.TestCase):
+    def feed(self, m, seconds, fps=30, gop=30, size=2000, t0=1000.0):
+        n = int(seconds * fps)
+        for i in range(n):
+            ts = t0 + i / fps
+            if i % gop == 0:
+                m.on_nal(NAL_SPS, SPS, ts)
+                m.on_nal(NAL_PPS, PPS, ts)
+                m.on_nal(*frame(True, size * 10), ts)
+            else:
+                # Two slices per P frame; only the first starts a frame.
+                m.on_nal(*frame(False, size // 2), ts)
+                m.on_nal(*frame(False, size // 2, first=False), ts)
+        return t0 + n / fps
+
+    def test_rates_gop_and_frame_sizes(self):
+        m = StreamMetrics("S1")
+        m._second = 1000
+        end = self.feed(m, 10)
+        snap = m.snapshot(now=end + 0.2)
+        self.assertAlmostEqual(snap["fps"], 30, delta=0.5)
+        per_second = 29 * 2000 + 20000 + len(SPS) + len(PPS)
+        self.assertAlmostEqual(snap["bitrate_bps"], 8 * per_second, delta=8 * 200)
+        self.assertEqual(snap["gop_frames"], 30)
+        self.assertAlmostEqual(snap["idr_interval_s"], 1.0)
+        self.assertEqual(snap["max_frame_bytes"], 20000)
+        self.assertAlmostEqual(snap["frame_gap_ms"], 1000 / 30, places=3)
+        self.assertLess(snap["jitter_ms"], 0.01)
+        self.assertEqual(snap["keyframes"], 10)
+
+    def test_stalled_stream_decays_to_zero(self):
+        m = StreamMetrics("S1")
+        m._second = 1000
+        end = self.feed(m, 3)
+        self.assertEqual(m.snapshot(now=end + 10)["fps"], 0)
+        self.assertGreater(m.snapshot(now=end + 10)["last_frame_age_s"], 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
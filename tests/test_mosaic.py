@@ -0,0 +1,97 @@
+import io
+import time
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from mirror_backend import mosaic
+from mirror_backend.virtual_camera import NullSink, read_frames
+
+W, H = 8, 4
+
+OPTIONS = {"width": 1280, "height": 720, "eye": "左眼", "correction": "v360",
+           "fov_in": 150, "fov_out": 95, "roll": 0,
+           "crop_size": 640, "eye_cx": 320, "eye_cy": 360}
+
+
+class CollectSink(NullSink):
+    def __init__(self):
+        super().__init__()
+        self.last = None
+
+    def send(self, frame):
+        super().send(frame)
+        self.last = frame.copy()
+
+
+class FedMosaic(mosaic.MosaicView):
+    """Tiles fed from options['frame'] (one frame of that value) instead of
+    a device; options['fail'] makes the device unavailable."""
+
+    def _open_tile(self, tile, options):
+        if options.get("fail"):
+            raise RuntimeError("device offline")
+        _, _, w, h = tile.rect
+        read_frames(tile.ring, io.BytesIO(bytes([options["frame"]]) * (w * h * 3)))
+
+
+class GridTests(unittest.TestCase):
+    def test_layout(self):
+        self.assertEqual(mosaic.grid(1, 1920, 1080), (1, 1, 1920, 1080))
+        self.assertEqual(mosaic.grid(16, 1920, 1080), (4, 4, 480, 270))
+        self.assertEqual(mosaic.grid(5, 1920, 1080), (3, 2, 640, 540))
+        # Even sizes for the decoders' yuv420p.
+        self.assertEqual(mosaic.grid(3, 1000, 1002), (2, 2, 500, 500))
+
+
+class TileFilterTests(unittest.TestCase):
+    def test_downscaled_before_the_correction(self):
+        vf = mosaic.tile_filters(OPTIONS, 480, 270)
+        self.assertEqual(vf[0], "crop=640:640:0:40")
+        self.assertEqual(vf[1], "scale=270:270:flags=area")
+        self.assertTrue(vf[2].startswith("v360=") and vf[2].endswith(":w=270:h=270"))
+        self.assertEqual(vf[-1], "pad=480:270:(ow-iw)/2:(oh-ih)/2")
+        self.assertNotIn("setpts=0", vf)
+
+    def test_no_upscale_for_large_tiles(self):
+        vf = mosaic.tile_filters(OPTIONS, 1920, 1080)
+        self.assertTrue(vf[1].startswith("v360="))
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class CompositorTests(unittest.TestCase):
+    def test_tiles_composed_and_failed_device_left_black(self):
+        sink = CollectSink()
+        view = FedMosaic(size=(2 * W, H), fps=100, sink=sink)
+        view.start({"A": {"frame": 9}, "B": {"fail": True}})
+        deadline = time.monotonic() + 2
+        while sink.frames < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        view.stop()
+        self.assertEqual(sink.frames, 1)  # unchanged canvases aren't re-sent
+        self.assertTrue((sink.last[:, :W] == 9).all())
+        self.assertTrue((sink.last[:, W:] == 0).all())
+        self.assertEqual([t["error"] for t in view.stats()["tiles"]], [None, "device offline"])
+
+    def test_closed_window_stops_the_view(self):
+        sink = CollectSink()
+        closed = []
+        view = FedMosaic(size=(W, H), fps=100, sink=sink, on_close=closed.append)
+        view.start({"A": {"frame": 9}})
+        self.assertTrue(view.is_running())
+        sink.closed = True  # the user closed the window
+        deadline = time.monotonic() + 2
+        while not closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(closed, [view])
+        self.assertFalse(view.is_running())
+        self.assertIsNone(view.sink)
+        view.stop()  # again, from the UI: harmless
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from mirror_backend.playerstats import PlayerStats, classify, parse_status
+
+
+class ParseStatusTests(unittest.TestCase):
+    def test_current_and_older_formats(self):
+        self.assertEqual(parse_status("12.34 M-V:  0.003 fd=   5 aq=    0KB vq=   12KB sq=    0B"),
+                         ("12.34", 0.003, 5, 0, 12, 0))
+        self.assertEqual(parse_status("3.10 A-V: -0.120 fd=  17 aq=   20KB vq=  300KB sq=    0B f=0/0")[1:3],
+                         (-0.12, 17))
+        self.assertEqual(parse_status("nan    :  nan fd=   0 aq=    0KB vq=    0KB sq=    0B")[1], 0.0)
+        self.assertIsNone(parse_status("Input #0, h264, from 'pipe:':"))
+
+
+class PlayerStatsTests(unittest.TestCase):
+    def test_drop_rate_and_classification(self):
+        stats = PlayerStats("S1")
+        for i in range(100):  # 3 s at ~33 lines/s, 10 drops per second
+            stats.update(("0", 0.002, i // 3 * 1, 0, 2000, 0), 100.0 + i * 0.03)
+        snap = stats.snapshot(now=103.0)
+        self.assertAlmostEqual(snap["drop_rate"], 11.1, delta=0.5)
+        self.assertEqual(snap["frames_dropped"], 33)
+        self.assertAlmostEqual(snap["drift_ms"], 2.0)
+        stream = {"fps": 30.0, "frame_gap_ms": 33.3, "last_frame_age_s": 0.02}
+        self.assertEqual(classify(stream, snap), "render")
+        self.assertEqual(classify(stream, {"drop_rate": 0.0, "mean_vq_kb": 2000}), "decoder")
+        self.assertEqual(classify({"fps": 10.0, "last_frame_age_s": 0.1}, {}, expected_fps=30), "input")
+        self.assertEqual(classify(stream, {"drop_rate": 0.0, "mean_vq_kb": 10}), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from mirror_backend import procgroup
+
+# Starts a grandchild and prints its pid, then waits.
+SPAWNER = [sys.executable, "-c",
+           "import subprocess, sys, time;"
+           "c = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']);"
+           "print(c.pid, flush=True); time.sleep(60)"]
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed but unreaped child is a zombie: gone for our purposes.
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+@unittest.skipIf(sys.platform == "win32", "process groups are POSIX")
+class ProcessGroupTests(unittest.TestCase):
+    def test_kill_reaches_grandchildren(self):
+        group = procgroup.ProcessGroup()
+        proc = group.popen(SPAWNER, stdout=subprocess.PIPE, text=True)
+        grandchild = int(proc.stdout.readline())
+        group.kill()
+        self.assertTrue(group.wait(2.0))
+        deadline = time.monotonic() + 2.0
+        while alive(grandchild) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertFalse(alive(grandchild))
+        proc.stdout.close()
+        group.close()
+
+    def test_orphans_of_an_exited_leader_are_killed(self):
+        group = procgroup.ProcessGroup()
+        leader = group.popen([sys.executable, "-c",
+                              "import subprocess, sys;"
+                              "c = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']);"
+                              "print(c.pid, flush=True)"], stdout=subprocess.PIPE, text=True)
+        orphan = int(leader.stdout.readline())
+        leader.wait(5)
+        # A later member (e.g. a rollover adb) must not drop the leader.
+        group.popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        group.kill()
+        self.assertTrue(group.wait(2.0))
+        deadline = time.monotonic() + 2.0
+        while alive(orphan) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertFalse(alive(orphan))
+        leader.stdout.close()
+        group.close()
+
+    def test_exited_leader_is_dropped_once_its_group_is_empty(self):
+        group = procgroup.ProcessGroup()
+        leader = group.popen([sys.executable, "-c", "pass"])
+        leader.wait(5)
+        # Nothing left in its group: its pid may be reused, so it must not
+        # be killpg()'d at stop().
+        group.popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        self.assertNotIn(leader, [p for p, _ in group._members])
+        group.kill()
+        self.assertTrue(group.wait(2.0))
+        group.close()
+
+    def test_foreign_process_is_killed_alone(self):
+        # Not started by procgroup.popen(): shares our group, so killpg()
+        # would take the test runner down with it.
+        proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        group = procgroup.ProcessGroup()
+        group.add(proc)
+        group.kill()
+        self.assertTrue(group.wait(2.0))
+        self.assertIsNotNone(proc.returncode)
+        group.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mirror_backend import recorder
+from mirror_backend.h264 import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS
+
+SPS = b"\x00\x00\x00\x01\x67\x42"
+PPS = b"\x00\x00\x00\x01\x68\xce"
+IDR = b"\x00\x00\x01\x65\x88" + b"\x11" * 20
+P = b"\x00\x00\x01\x41\x9a" + b"\x22" * 20
+
+
+class RecorderTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def record(self, units, **limits):
+        rec = recorder.SegmentRecorder(self.dir, "dev", **limits)
+        for t, data, ts in units:
+            rec.on_nal(t, memoryview(data), ts)
+        rec.close()
+        return rec
+
+    def stream(self):
+        # A GOP with parameter sets, then bare IDRs (as after the first one).
+        return [
+            (NAL_SPS, SPS, 10.0), (NAL_PPS, PPS, 10.0), (NAL_IDR, IDR, 10.0),
+            (NAL_SLICE, P, 11.0), (NAL_SLICE, P, 12.0),
+            (NAL_IDR, IDR, 13.0), (NAL_SLICE, P, 14.0),
+            (NAL_IDR, IDR, 15.0), (NAL_SLICE, P, 16.0),
+        ]
+
+    def test_segments_start_at_keyframes_with_parameter_sets(self):
+        rec = self.record([(NAL_SLICE, P, 9.0)] + self.stream(), max_seconds=2.5)
+        self.assertEqual(len(rec.paths), 2)
+        self.assertEqual(rec.keyframes, 3)
+        with open(rec.paths[0], "rb") as f:
+            # The P before the first keyframe isn't recorded; the bare IDR
+            # gets SPS/PPS in front.
+            self.assertEqual(f.read(), SPS + PPS + IDR + P + P + SPS + PPS + IDR + P)
+        with open(rec.paths[1], "rb") as f:
+            self.assertEqual(f.read(), SPS + PPS + IDR + P)
+        _, offsets, times = recorder.read_index(recorder.index_path(rec.paths[0]))
+        self.assertEqual(list(offsets), [0, len(SPS + PPS + IDR + P + P)])
+        self.assertEqual(list(times), [0, 3_000_000])
+
+    def test_seek_and_trim_go_to_keyframes(self):
+        rec = self.record(self.stream())
+        with recorder.Segment(rec.paths[0]) as seg:
+            self.assertEqual(len(seg.offsets), 3)
+            self.assertEqual(seg.duration, 5.0)
+            self.assertEqual(seg.keyframe(2.9), 0)
+            self.assertEqual(seg.keyframe(3.0), 1)
+            self.assertEqual(bytes(seg.seek(4.0)), SPS + PPS + IDR + P + SPS + PPS + IDR + P)
+            self.assertEqual(bytes(seg.gop(0)), SPS + PPS + IDR + P + P)
+            out = os.path.join(self.dir, "cut.h264")
+            self.assertEqual(seg.trim(3.5, 4.0, out), (3.0, 5.0))
+            with open(out, "rb") as f:
+                self.assertEqual(f.read(), SPS + PPS + IDR + P)
+            self.assertEqual(seg.trim(5.5, 99, out), (5.0, None))
+
+    def test_index_cut_short_is_still_readable(self):
+        rec = self.record(self.stream())
+        idx = recorder.index_path(rec.paths[0])
+        with open(idx, "ab") as f:
+            f.write(b"\x01\x02\x03")
+        start, offsets, _ = recorder.read_index(idx)
+        self.assertEqual(len(offsets), 3)
+        self.assertGreater(start, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
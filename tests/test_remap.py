@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mirror_backend import remap
+from mirror_backend.screenrecord import ScreenRecordBackend
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PARAMS = (640, 150, 95, 0, 720)  # crop_size, fov_in, fov_out, roll, out_size
+OPTIONS = {
+    "width": 1280, "height": 720, "eye": "左眼", "correction": "v360",
+    "fov_in": 150, "fov_out": 95, "roll": 0, "crop_size": 640,
+    "eye_cx": 320, "eye_cy": 360, "out_size": 720, "remap": True,
+}
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_key_follows_the_calibration(self):
+        self.assertEqual(remap.cache_key(*PARAMS), remap.cache_key(640, 150.0, 95.0, 0.0, 720))
+        self.assertNotEqual(remap.cache_key(*PARAMS), remap.cache_key(640, 150, 95, -13, 720))
+
+    def test_cached_maps_are_used_without_computing(self):
+        key = remap.cache_key(*PARAMS)
+        for axis in "xy":
+            with open(os.path.join(self.dir, f"{key}_{axis}.pgm"), "wb") as f:
+                f.write(b"P5\n1 1\n65535\n\x00\x00")
+        with mock.patch.object(remap, "build_maps", side_effect=AssertionError("recomputed")):
+            paths = remap.get_maps(*PARAMS, cache_dir=self.dir)
+        self.assertEqual(paths, tuple(os.path.join(self.dir, f"{key}_{a}.pgm") for a in "xy"))
+
+        vf = ScreenRecordBackend()._build_video_filters(dict(OPTIONS, remap_cache=self.dir))
+        self.assertEqual(len(vf), 2)
+        self.assertTrue(vf[0].startswith("movie="))
+        self.assertIn("[in]crop=640:640:0:40[eye];[eye][xmap][ymap]remap", vf[0])
+        self.assertEqual(vf[1], "setpts=0")
+
+    def test_v360_without_maps(self):
+        with mock.patch.object(remap, "build_maps", side_effect=ImportError("numpy")):
+            vf = ScreenRecordBackend()._build_video_filters(dict(OPTIONS, remap_cache=self.dir))
+        self.assertTrue(vf[1].startswith("v360=input=fisheye:output=flat"))
+        vf = ScreenRecordBackend()._build_video_filters(dict(OPTIONS, remap=False, interp="near",
+                                                             remap_cache=self.dir))
+        self.assertTrue(vf[1].startswith("v360="))
+        self.assertTrue(vf[1].endswith(":w=720:h=720:interp=near"))
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_windows_paths_are_escaped(self):
+        graph = remap.filter_graph("crop=1:1:0:0", r"C:\cache\a_x.pgm", r"C:\cache\a_y.pgm")
+        self.assertTrue(graph.startswith(r"movie='C\:/cache/a_x.pgm'[xmap];"))
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class MapTests(unittest.TestCase):
+    def test_projection(self):
+        xmap, ymap = remap.build_maps(*PARAMS)
+        self.assertEqual(xmap.shape, (720, 720))
+        self.assertEqual(xmap.dtype, np.uint16)
+        # Optical axis -> crop centre; left-right / up-down symmetric.
+        self.assertLessEqual(abs(int(xmap[360, 360]) - 320), 1)
+        self.assertLessEqual(abs(int(ymap[360, 360]) - 320), 1)
+        self.assertEqual(int(xmap[360, 0]) + int(xmap[360, 719]), 639)
+        # 95° out of a 150° fisheye: everything visible, inside the crop.
+        self.assertTrue((xmap < 640).all() and (ymap < 640).all())
+
+    def test_outside_the_fisheye_is_filled(self):
+        xmap, ymap = remap.build_maps(640, 90, 120, 0, 64)
+        self.assertEqual(int(xmap[0, 0]), remap.OUTSIDE)
+        self.assertLess(int(xmap[32, 32]), 640)
+
+    def test_roll_rotates_the_lookup(self):
+        flat = remap.build_maps(*PARAMS)[0]
+        rolled = remap.build_maps(640, 150, 95, 90, 720)[1]
+        # A 90° roll turns a horizontal sweep into a vertical one.
+        self.assertLessEqual(np.abs(rolled[360].astype(int) - flat[360].astype(int)).max(), 1)
+
+    def test_written_once_and_pruned(self):
+        cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache, True)
+        with mock.patch.object(remap, "MAX_ENTRIES", 2):
+            for roll in (0, 1, 2):
+                xpath, ypath = remap.get_maps(64, 150, 95, roll, 32, cache_dir=cache)
+        with open(xpath, "rb") as f:
+            self.assertTrue(f.read().startswith(b"P5\n32 32\n65535\n"))
+        self.assertEqual(len(os.listdir(cache)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
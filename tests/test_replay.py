@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mirror_backend import recorder, replay
+from mirror_backend.exporter import collect, render
+from mirror_backend.h264 import NAL_IDR, NAL_PPS, NAL_SLICE, NAL_SPS
+
+SPS = b"\x00\x00\x00\x01\x67\x42"
+PPS = b"\x00\x00\x00\x01\x68\xce"
+IDR = b"\x00\x00\x01\x65\x88" + b"\x11" * 20
+P = b"\x00\x00\x01\x41\x9a" + b"\x22" * 20
+
+
+def feed(buf, *units):
+    for t, data, ts in units:
+        buf.on_nal(t, memoryview(data), ts)
+
+
+def gop(ts, p_frames=2, parameter_sets=False):
+    units = [(NAL_SPS, SPS, ts), (NAL_PPS, PPS, ts)] if parameter_sets else []
+    units.append((NAL_IDR, IDR, ts))
+    return units + [(NAL_SLICE, P, ts + i + 1) for i in range(p_frames)]
+
+
+class FakeBackend:
+    def is_running(self):
+        return True
+
+    def processes(self):
+        return []
+
+
+class ReplayBufferTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_keeps_the_last_seconds_from_a_keyframe(self):
+        buf = replay.ReplayBuffer("dev", max_seconds=5)
+        feed(buf, (NAL_SLICE, P, 0.0))  # before any keyframe: dropped
+        feed(buf, *gop(1.0, parameter_sets=True), *gop(4.0), *gop(7.0), *gop(10.0))
+        stats = buf.stats()
+        # 12 - 5 = 7: the GOP at 7 s is the oldest one still needed.
+        self.assertEqual((stats["keyframes"], stats["seconds"]), (2, 5.0))
+        path = os.path.join(self.dir, "replay.h264")
+        saved = buf.save(path)
+        with open(path, "rb") as f:
+            # Bare IDRs get the cached parameter sets in front.
+            self.assertEqual(f.read(), (SPS + PPS + IDR + P + P) * 2)
+        self.assertEqual(saved["bytes"], stats["bytes"])
+        with recorder.Segment(path) as seg:
+            self.assertEqual(list(seg.times), [0, 3_000_000])
+            self.assertEqual(bytes(seg.gop(1)), SPS + PPS + IDR + P + P)
+
+    def test_byte_cap_is_hard(self):
+        one_gop = len(SPS + PPS + IDR + P + P)
+        buf = replay.ReplayBuffer("dev", max_seconds=60, max_bytes=one_gop + 10)
+        feed(buf, *gop(1.0, parameter_sets=True), *gop(4.0))
+        self.assertEqual(buf.stats()["keyframes"], 1)
+        # A GOP that alone is over the cap empties the buffer...
+        feed(buf, *gop(7.0, p_frames=3))
+        self.assertEqual(buf.stats()["bytes"], 0)
+        self.assertLessEqual(buf.peak_bytes, one_gop + 10)
+        with self.assertRaises(ValueError):
+            buf.save(os.path.join(self.dir, "empty.h264"))
+        # ...until the next keyframe.
+        feed(buf, (NAL_SLICE, P, 11.0), *gop(12.0))
+        self.assertEqual(buf.stats()["bytes"], one_gop)
+
+    def test_registry_save_and_exporter(self):
+        class Relay:
+            def add_listener(self, fn):
+                self.fn = fn
+
+        relay = Relay()
+        buf = replay.attach("10.0.0.5:5555", relay, max_seconds=30)
+        self.addCleanup(replay.detach, "10.0.0.5:5555", buf)
+        feed(buf, *gop(1.0, parameter_sets=True))
+        saved = replay.save("10.0.0.5:5555", self.dir)
+        self.assertTrue(os.path.basename(saved["path"]).startswith("10.0.0.5_5555-"))
+        page = render(collect({"10.0.0.5:5555": {"backend": FakeBackend()}})).decode()
+        self.assertIn(f'quest_caster_replay_buffer_bytes{{serial="10.0.0.5:5555"}} {saved["bytes"]}', page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from mirror_backend.h264 import NAL_IDR, NAL_PPS, NAL_SPS
+from mirror_backend.relay import StreamRelay
+from mirror_backend import startfail
+from mirror_backend.screenrecord import ScreenRecordBackend
+
+DUMP = os.path.join(os.path.dirname(__file__), "..", "dump.h264")
+
+SPS = b"\x00\x00\x00\x01\x67\x42\x00\x1f\xaa"
+PPS = b"\x00\x00\x00\x01\x68\xce\x3c\x80"
+IDR = b"\x00\x00\x01\x65\x88" + b"\x11" * 50
+P1 = b"\x00\x00\x01\x41\x9a" + b"\x22" * 30
+
+
+def fake_adb(script: str) -> subprocess.Popen:
+    """A stand-in `adb exec-out screenrecord` running `script` (Python)."""
+    return subprocess.Popen([sys.executable, "-c", "import sys, time\n" + script],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+
+
+class AwaitStreamTests(unittest.TestCase):
+    def _await(self, script, timeout=5.0):
+        backend = ScreenRecordBackend()
+        backend.adb_process = fake_adb(script)
+        started = time.monotonic()
+        result = backend._await_stream(timeout)
+        return backend, result, time.monotonic() - started
+
+    def test_ready_at_first_keyframe(self):
+        # The stream keeps going (like screenrecord); readiness must not wait for EOF.
+        script = (f"sys.stdout.buffer.write({SPS + PPS + IDR + P1!r}); sys.stdout.flush(); "
+                  f"time.sleep(30)")
+        backend, (reader, primer, failure), elapsed = self._await(script)
+        try:
+            self.assertIsNone(failure)
+            self.assertEqual([t for t, _ in primer], [NAL_SPS, NAL_PPS, NAL_IDR])
+            self.assertLess(elapsed, 5)
+            relay = StreamRelay(reader, primer=primer)
+            relay.start()
+            backend.adb_process.kill()
+            relay._thread.join(5)
+            self.assertEqual(relay.keyframes, 1)
+            self.assertEqual(relay.frames, 2)
+        finally:
+            backend.adb_process.kill()
+            backend.adb_process.wait()
+
+    def test_error_text_fails_without_waiting_for_exit(self):
+        with open(DUMP, "rb") as f:
+            text = f.read()
+        script = f"sys.stdout.buffer.write({text!r}); sys.stdout.flush(); time.sleep(30)"
+        backend, (reader, primer, failure), elapsed = self._await(script)
+        self.assertIsNone(primer)
+        self.assertIn("INVALID_LAYER_STACK", failure.detail)
+        self.assertEqual(failure.policy, startfail.RETRY_NO_DISPLAY)
+        self.assertIsNone(backend.adb_process)
+        self.assertLess(elapsed, 5)
+
+    def test_deadline(self):
+        backend, (reader, primer, failure), elapsed = self._await("time.sleep(30)", timeout=0.3)
+        self.assertIsNone(primer)
+        self.assertEqual(failure.kind, startfail.NO_VIDEO)
+        self.assertIn("no keyframe within", str(failure))
+        self.assertLess(elapsed, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
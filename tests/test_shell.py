@@ -0,0 +1,68 @@
+import subprocess
+import threading
+import time
+import unittest
+
+from fake_adb_server import FakeAdbServer
+from mirror_backend.adbclient import AdbClient
+from mirror_backend.shell import ShellSession, ShellClosed
+
+
+class ShellSessionTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAdbServer().__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.client = AdbClient(port=self.server.port, pool_size=0)
+        self.session = ShellSession("FAKE0001", client=self.client)
+        self.addCleanup(self.session.close)
+
+    def test_output_and_exit_codes_are_framed_per_command(self):
+        self.assertEqual(self.session.run("echo hello").stdout, "hello\n")
+        res = self.session.run("printf 'no newline'; echo oops >&2; false")
+        self.assertEqual(res.stdout, "no newlineoops\n")
+        self.assertEqual(res.returncode, 1)
+        self.assertEqual(self.session.run("true").stdout, "")
+        # One transport for all of them.
+        self.assertEqual(self.server.requests.count("shell,raw:"), 1)
+
+    def test_concurrent_callers_get_their_own_replies(self):
+        results = {}
+
+        def worker(n):
+            results[n] = self.session.run(f"echo {n}").stdout
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(results, {n: f"{n}\n" for n in range(20)})
+
+    def test_command_cannot_swallow_queued_input(self):
+        first = self.session.submit("cat")
+        second = self.session.submit("echo after")
+        self.assertEqual(first.result(5), (0, b""))
+        self.assertEqual(second.result(5), (0, b"after\n"))
+
+    def test_timeout_closes_session(self):
+        with self.assertRaises(subprocess.TimeoutExpired):
+            self.session.run("sleep 5", timeout=0.2)
+        self.assertTrue(self.session.closed)
+        with self.assertRaises(ShellClosed):
+            self.session.submit("true")
+
+    def test_out_of_sequence_reply_fails_the_caller(self):
+        marker = self.session._marker.decode()
+        future = self.session.submit(f"printf '\\n{marker} 99 0\\n'")
+        with self.assertRaises(ShellClosed):
+            future.result(2)
+        self.assertTrue(self.session.closed)
+
+    def test_background_command_returns_immediately(self):
+        started = time.monotonic()
+        self.session.run("( sleep 2 ) >/dev/null 2>&1 &")
+        self.assertLess(time.monotonic() - started, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
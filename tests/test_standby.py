@@ -0,0 +1,99 @@
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fake_adb_server import FakeAdbServer
+from mirror_backend import adbclient, devinfo, shell, standby
+from mirror_backend.screenrecord import ScreenRecordBackend
+
+PLAYER = [sys.executable, "-c", "import sys; sys.stdin.buffer.read()"]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+class StandbyTests(unittest.TestCase):
+    def setUp(self):
+        # Device tools that only log how they were called.
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.log = os.path.join(self.dir, "calls")
+        for tool in ("killall", "input", "am", "svc", "wm", "cmd", "getprop", "ip"):
+            path = os.path.join(self.dir, tool)
+            with open(path, "w") as f:
+                f.write(f'#!/bin/sh\necho "$ANDROID_SERIAL {tool} $*" >> "{self.log}"\n')
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        env = dict(os.environ, PATH=self.dir + os.pathsep + os.environ.get("PATH", ""))
+        self.server = FakeAdbServer({"FAKE0001": "device", "FAKE0002": "device"}, env=env).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = mock.patch.dict(os.environ, {"ANDROID_ADB_SERVER_PORT": str(self.server.port)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: adbclient.get_client().close())
+        self.addCleanup(shell.close_all)
+        self.addCleanup(devinfo.invalidate_all)
+        self.addCleanup(standby.release_all)
+
+    def calls(self):
+        try:
+            with open(self.log) as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    def test_claim_gets_prep_and_waiting_player(self):
+        standby.warm("FAKE0001", PLAYER)
+        warm = standby.claim("FAKE0001")
+        self.assertIsNotNone(warm.woken_at)
+        self.assertIn("FAKE0001 input keyevent WAKEUP", self.calls())
+        self.assertIsNone(standby.get("FAKE0001"))
+
+        backend = ScreenRecordBackend()
+        backend._standby = warm
+        player = warm.player
+        backend._spawn_player(PLAYER, subprocess.PIPE)
+        self.assertIs(backend.player_process, player)
+        self.assertIsNone(player.poll())
+        player.kill()
+        player.wait()
+
+    def test_other_player_command_is_not_reused(self):
+        standby.warm("FAKE0001", PLAYER)
+        warm = standby.claim("FAKE0001")
+        player = warm.player
+        self.assertIsNone(warm.take_player(PLAYER + ["--other"]))
+        self.assertIsNotNone(player.wait(timeout=2))
+
+    def test_idle_standby_is_released(self):
+        standby.warm("FAKE0001", PLAYER, idle=0.3)
+        self.assertTrue(wait_for(lambda: standby.get("FAKE0001") is None))
+        self.assertTrue(wait_for(lambda: "automation_disable" in self.calls()))
+        self.assertIsNone(standby.claim("FAKE0001"))
+
+    def test_selecting_another_device_releases_the_first(self):
+        standby.warm("FAKE0001", PLAYER)
+        first = standby.get("FAKE0001")
+        self.assertTrue(first.ready.wait(5))
+        player = first.player
+        standby.warm("FAKE0002", PLAYER)
+        self.assertIsNone(standby.get("FAKE0001"))
+        self.assertIsNotNone(player.wait(timeout=2))
+        self.assertIsNotNone(standby.claim("FAKE0002"))
+
+    def test_offline_device_gives_nothing_to_claim(self):
+        standby.warm("MISSING", PLAYER)
+        self.assertIsNone(standby.claim("MISSING"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from fake_adb_server import FakeAdbServer
+from mirror_backend import adbclient, shell, startfail
+from mirror_backend.screenrecord import ScreenRecordBackend
+
+DUMP = os.path.join(os.path.dirname(__file__), "..", "dump.h264")
+
+
+class ClassifyTests(unittest.TestCase):
+    def test_display_errors_trigger_fallback(self):
+        with open(DUMP, encoding="utf-8", errors="replace") as f:
+            self.assertEqual(startfail.classify(f.read()), startfail.DISPLAY)
+        self.assertEqual(startfail.classify("error: device offline"), startfail.OFFLINE)
+        self.assertIsNone(startfail.classify_text(None))
+
+    def test_classes_and_policies(self):
+        cases = {
+            "device 'X' not found": startfail.FAST_FAIL,
+            "device unauthorized.\nThis adb server's $ADB_VENDOR_KEYS is not set": startfail.FAST_FAIL,
+            "ERROR: unable to configure video/avc codec at 9999x9999": startfail.FAST_FAIL,
+            "Invalid physical display ID 3": startfail.RETRY_NO_DISPLAY,
+            "ERROR: unable to create video/avc codec": startfail.BACKOFF_WAKE,
+        }
+        for text, policy in cases.items():
+            self.assertEqual(startfail.POLICY[startfail.classify(text)], policy, text)
+
+    def test_exit_code_and_deadline_without_text(self):
+        self.assertEqual(startfail.classify("", returncode=1), startfail.OFFLINE)
+        self.assertEqual(startfail.classify("", timed_out=True), startfail.NO_VIDEO)
+        self.assertEqual(startfail.classify(""), startfail.UNKNOWN)
+
+
+class HistoryTests(unittest.TestCase):
+    def tearDown(self):
+        startfail.forget("S1")
+
+    def test_known_bad_until_forgotten_or_expired(self):
+        self.assertIsNone(startfail.known_bad("S1", startfail.DISPLAY, 2))
+        startfail.record("S1", startfail.DISPLAY, 2, "INVALID_LAYER_STACK")
+        self.assertEqual(startfail.known_bad("S1", startfail.DISPLAY, 2), "INVALID_LAYER_STACK")
+        self.assertIsNone(startfail.known_bad("S1", startfail.DISPLAY, 0))
+        with mock.patch.object(startfail, "HISTORY_TTL", 0.0):
+            time.sleep(0.01)
+            self.assertIsNone(startfail.known_bad("S1", startfail.DISPLAY, 2))
+        startfail.record("S1", startfail.ENCODER, (1, 2, 3))
+        startfail.forget("S1", startfail.ENCODER, (1, 2, 3))
+        self.assertEqual(startfail.history("S1"), [])
+
+
+class FastFailTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeAdbServer({"FAKE0001": "unauthorized"}).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = mock.patch.dict(os.environ, {"ANDROID_ADB_SERVER_PORT": str(self.server.port)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: adbclient.get_client().close())
+        self.addCleanup(shell.close_all)
+
+    def _start(self, serial, options=None):
+        started = time.monotonic()
+        with self.assertRaises(startfail.StartFailure) as caught:
+            ScreenRecordBackend().start(serial, options or {})
+        return caught.exception, time.monotonic() - started
+
+    def test_hopeless_starts_fail_without_retries(self):
+        for serial, kind in (("MISSING", startfail.ABSENT), ("FAKE0001", startfail.UNAUTHORIZED)):
+            failure, elapsed = self._start(serial)
+            self.assertEqual(failure.kind, kind)
+            self.assertIn("after 1 attempt", str(failure))
+            self.assertLess(elapsed, 1.0)  # was ~4 s of polls and retries
+
+    def test_known_bad_encoder_settings_are_not_tried(self):
+        options = {"width": 9999, "height": 9999, "bitrate": 5}
+        startfail.record("FAKE0002", startfail.ENCODER, (9999, 9999, 5), "unable to configure")
+        self.addCleanup(startfail.forget, "FAKE0002")
+        failure, elapsed = self._start("FAKE0002", options)
+        self.assertEqual(failure.kind, startfail.ENCODER)
+        self.assertEqual(self.server.requests, [])
+        self.assertLess(elapsed, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from mirror_backend.base import MirrorBackend
+from mirror_backend.supervisor import Supervisor
+
+
+class ProcBackend(MirrorBackend):
+    """Runs `python -c sleep(n)`; `hold` keeps it 'running' after the exit."""
+
+    def __init__(self, seconds, hold=False):
+        self.process = subprocess.Popen([sys.executable, "-c", f"import time; time.sleep({seconds})"])
+        self.ends_after = time.monotonic() + seconds
+        self.hold = hold
+
+    def start(self, serial, options):
+        pass
+
+    def stop(self):
+        self.process.kill()
+        self.process.wait()
+
+    def is_running(self):
+        return self.hold or self.process.poll() is None
+
+    def processes(self):
+        return [self.process]
+
+
+class SupervisorTests(unittest.TestCase):
+    def setUp(self):
+        # Long sweep: exits must be seen through the OS, not the sweep.
+        self.sup = Supervisor(sweep_interval=30)
+        self.sup.start()
+        self.addCleanup(self.sup.stop)
+        self.exited = {}
+        self.cond = threading.Condition()
+
+    def on_exit(self, key, backend):
+        with self.cond:
+            backend.process.wait()
+            self.exited[key] = time.monotonic()
+            self.cond.notify_all()
+
+    def wait_exited(self, n, timeout=5):
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.exited) >= n, timeout)
+
+    def test_exit_is_dispatched_promptly(self):
+        backends = {f"dev{i}": ProcBackend(0.2 + i * 0.1) for i in range(5)}
+        threads_before = threading.active_count()
+        for key, backend in backends.items():
+            self.sup.watch(key, backend, self.on_exit)
+        self.assertEqual(threading.active_count(), threads_before)
+        self.assertTrue(self.wait_exited(5))
+        for key, backend in backends.items():
+            # Well under the old one-second poll (the sweep here is 30 s).
+            self.assertLess(self.exited[key] - backend.ends_after, 0.5, key)
+        self.assertEqual(self.sup.sessions(), [])
+        self.assertIsNotNone(self.sup.last_detect_latency)
+        self.assertLess(self.sup.last_detect_latency, 0.5)
+
+    def test_session_still_running_after_exit_waits_for_wake(self):
+        backend = ProcBackend(0.1, hold=True)
+        self.sup.watch("dev", backend, self.on_exit)
+        backend.process.wait()
+        time.sleep(0.3)
+        self.assertEqual(self.exited, {})
+        backend.hold = False
+        woke = time.monotonic()
+        self.sup.wake()
+        self.assertTrue(self.wait_exited(1, timeout=2))
+        self.assertLess(self.exited["dev"] - woke, 0.5)
+
+    def test_unwatched_session_is_not_dispatched(self):
+        backend = ProcBackend(0.1)
+        self.sup.watch("dev", backend, self.on_exit)
+        self.sup.unwatch("dev")
+        backend.process.wait()
+        self.assertFalse(self.wait_exited(1, timeout=0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
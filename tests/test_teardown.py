@@ -0,0 +1,96 @@
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from fake_adb_server import FakeAdbServer
+from mirror_backend import adbclient, devinfo, shell, teardown
+from mirror_backend.screenrecord import ScreenRecordBackend
+
+PLAYER = [sys.executable, "-c", "import sys; sys.stdin.buffer.read()"]
+
+
+class SlowBackend:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def stop(self):
+        time.sleep(self.delay)
+
+
+class StopAllTests(unittest.TestCase):
+    def test_sessions_stop_in_parallel(self):
+        backends = {f"dev{i}": SlowBackend(0.3) for i in range(8)}
+        started = time.monotonic()
+        latency = teardown.stop_all(backends, deadline=5.0)
+        self.assertLess(time.monotonic() - started, 1.5)  # 2.4 s serially
+        self.assertEqual(set(latency), set(backends))
+        self.assertTrue(all(0.25 < v < 1.5 for v in latency.values()))
+
+    def test_deadline_bounds_a_hung_stop(self):
+        hung = threading.Event()
+        self.addCleanup(hung.set)
+
+        class Hung:
+            def stop(self):
+                hung.wait()
+
+        started = time.monotonic()
+        latency = teardown.stop_all({"ok": SlowBackend(0.0), "hung": Hung()}, deadline=0.3)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertIsNone(latency["hung"])
+        self.assertIsNotNone(latency["ok"])
+        self.assertIn("still stopping at the deadline: hung", teardown.report(latency, 0.3))
+
+    def test_failing_stop_counts_as_done(self):
+        class Broken:
+            def stop(self):
+                raise RuntimeError("boom")
+
+        self.assertIsNotNone(teardown.stop_all({"x": Broken()})["x"])
+
+
+@unittest.skipIf(sys.platform == "win32", "uses shell scripts as device tools")
+class ScreenRecordStopTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.log = os.path.join(self.dir, "calls")
+        for tool in ("killall", "am"):
+            path = os.path.join(self.dir, tool)
+            with open(path, "w") as f:
+                f.write(f'#!/bin/sh\necho "{tool} $*" >> "{self.log}"\n')
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        env = dict(os.environ, PATH=self.dir + os.pathsep + os.environ.get("PATH", ""))
+        self.server = FakeAdbServer({"FAKE0001": "device"}, env=env).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        patcher = mock.patch.dict(os.environ, {"ANDROID_ADB_SERVER_PORT": str(self.server.port)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(adbclient.get_client().close)
+        self.addCleanup(shell.close_all)
+        self.addCleanup(devinfo.invalidate_all)
+
+    def test_stop_kills_player_and_cleans_up_in_one_command(self):
+        backend = ScreenRecordBackend()
+        backend.serial = "FAKE0001"
+        backend._spawn_player(PLAYER, subprocess.PIPE)
+        player = backend.player_process
+        backend.stop()
+        self.assertIsNotNone(player.returncode)
+        self.assertIsNone(backend.player_process)
+        self.assertIsNotNone(backend.stop_latency)
+        with open(self.log) as f:
+            calls = f.read().splitlines()
+        self.assertEqual(calls, ["killall screenrecord",
+                                 "am broadcast -a com.oculus.vrpowermanager.automation_disable"])
+
+
+if __name__ == "__main__":
+    unittest.main()
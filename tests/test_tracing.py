@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from mirror_backend import tracing
+from mirror_backend.logreactor import LogRecord
+
+
+class TraceTests(unittest.TestCase):
+    def test_spans_marks_and_summary(self):
+        trace = tracing.Trace("screenrecord", "S1")
+        with trace.span("prep"):
+            with trace.span("display"):
+                time.sleep(0.01)
+        with self.assertRaises(RuntimeError):
+            with trace.span("attempt", n=1):
+                raise RuntimeError("INVALID_LAYER_STACK")
+        trace.mark("first-frame")
+        name, start, end = trace.events[0][:3]  # inner span ends first
+        self.assertEqual(name, "display")
+        self.assertGreaterEqual(end - start, 10_000_000)
+        self.assertLessEqual(trace.elapsed_ms("display"), trace.elapsed_ms("prep"))
+        self.assertTrue(trace.summary().startswith("prep 0-"))
+        self.assertIn("attempt", trace.summary())
+        self.assertIn("(failed)", trace.summary())
+        self.assertEqual(trace.events[2][4], {"n": 1, "error": "INVALID_LAYER_STACK"})
+
+    def test_chrome_json(self):
+        a = tracing.Trace("screenrecord", "S1")
+        b = tracing.Trace("scrcpy", "S2")
+        with a.span("adb-online"):
+            pass
+        worker = threading.Thread(target=a.mark, args=("first-bytes",), name="StreamRelay-S1")
+        worker.start()
+        worker.join()
+        b.mark("first-frame")
+        with tempfile.TemporaryDirectory() as d:
+            path = tracing.dump(os.path.join(d, "trace.json"), [a, b])
+            with open(path) as f:
+                data = json.load(f)
+        events = data["traceEvents"]
+        span = next(e for e in events if e["name"] == "adb-online")
+        self.assertEqual((span["ph"], span["pid"], span["cat"]), ("X", 1, "screenrecord"))
+        self.assertGreaterEqual(span["dur"], 0)
+        mark = next(e for e in events if e["name"] == "first-bytes")
+        self.assertEqual((mark["ph"], mark["tid"]), ("i", 2))
+        threads = {e["args"]["name"] for e in events if e["name"] == "thread_name"}
+        self.assertIn("StreamRelay-S1", threads)
+        self.assertEqual(next(e for e in events if e["name"] == "first-frame")["pid"], 2)
+
+    def test_watch_log_marks_once_and_unregisters(self):
+        class Reactor:
+            def __init__(self):
+                self.handlers = []
+
+            def add_handler(self, fn, raw=False):
+                self.handlers.append(fn)
+
+            def remove_handler(self, fn):
+                self.handlers.remove(fn)
+
+        reactor = Reactor()
+        trace = tracing.Trace("scrcpy", "S1")
+        tracing.watch_log(trace, reactor, "S1", ["scrcpy"], {"window": "Renderer:", "first-frame": "Texture:"})
+        for source, text in (("S2", "INFO: Texture: 1x1"), ("S1", "INFO: Renderer: opengl"),
+                             ("S1", "INFO: Renderer: opengl"), ("S1", "INFO: Texture: 1920x1080")):
+            for fn in list(reactor.handlers):
+                fn(LogRecord(source, "scrcpy", text))
+        self.assertEqual([e[0] for e in trace.events], ["window", "first-frame"])
+        self.assertEqual(reactor.handlers, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
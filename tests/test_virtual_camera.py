@@ -0,0 +1,133 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from mirror_backend import virtual_camera
+
+W, H = 8, 4
+FRAME = W * H * 3
+
+
+def frames(*values):
+    return b"".join(bytes([v]) * FRAME for v in values)
+
+
+class TrickleStream(io.RawIOBase):
+    """Raw stream returning at most `chunk` bytes per readinto()."""
+
+    def __init__(self, data, chunk):
+        self._data = io.BytesIO(data)
+        self._chunk = chunk
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._data.read(min(len(b), self._chunk))
+        b[:len(data)] = data
+        return len(data)
+
+
+class SlowSink:
+    def __init__(self, delay):
+        self.delay = delay
+        self.values = []
+
+    def send(self, frame):
+        self.values.append(int(frame[0, 0, 0]))
+        time.sleep(self.delay)
+
+    def close(self):
+        pass
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class FrameRingTests(unittest.TestCase):
+    def test_frames_land_in_the_preallocated_ring(self):
+        ring = virtual_camera.FrameRing(W, H)
+        stream = TrickleStream(frames(7), chunk=5)  # short reads
+        self.assertTrue(ring.fill_from(stream))
+        seq, frame = ring.take(0)
+        self.assertEqual(seq, 1)
+        self.assertEqual(frame.shape, (H, W, 3))
+        self.assertTrue((frame == 7).all())
+        self.assertTrue(np.shares_memory(frame, ring.frames))
+        self.assertFalse(ring.fill_from(stream))  # EOF
+
+    def test_only_the_newest_frame_is_handed_out(self):
+        ring = virtual_camera.FrameRing(W, H)
+        stream = io.BytesIO(frames(1, 2, 3))
+        for _ in range(3):
+            ring.fill_from(stream)
+        seq, frame = ring.take(0)
+        self.assertEqual((seq, int(frame[0, 0, 0])), (3, 3))
+        self.assertEqual(ring.dropped, 2)
+        self.assertIsNone(ring.take(0))
+
+    def test_held_frame_is_not_overwritten(self):
+        ring = virtual_camera.FrameRing(W, H)
+        stream = io.BytesIO(frames(*range(1, 11)))
+        ring.fill_from(stream)
+        _, held = ring.take(0)
+        for _ in range(9):
+            ring.fill_from(stream)
+        self.assertTrue((held == 1).all())
+        self.assertEqual(int(ring.take(0)[1][0, 0, 0]), 10)
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class FrameOutputTests(unittest.TestCase):
+    def test_slow_sink_drops_instead_of_queueing(self):
+        r, w = os.pipe()
+        sink = SlowSink(0.05)
+        output = virtual_camera.FrameOutput(W, H, sink, name="test")
+        with open(r, "rb") as stream, open(w, "wb") as writer:
+            output.start(stream)
+            for v in range(1, 41):
+                writer.write(frames(v))
+                writer.flush()
+                time.sleep(0.005)
+            time.sleep(0.2)  # let the sink catch up with the last frame
+            writer.close()
+            output.stop()
+        stats = output.stats()
+        self.assertEqual(stats["frames"], 40)
+        self.assertLess(stats["sent"], 20)
+        self.assertEqual(stats["sent"] + stats["dropped"], 40)
+        self.assertEqual(sink.values[-1], 40)  # the newest, not a backlog
+        self.assertEqual(sink.values, sorted(sink.values))
+
+    def test_file_sink(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, "out.rgb")
+        sink = virtual_camera.make_sink({"vcam_sink": f"file:{path}"}, W, H, 30)
+        output = virtual_camera.FrameOutput(W, H, sink)
+        output.start(io.BytesIO(frames(5)))
+        deadline = time.monotonic() + 2
+        while output.sent < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        output.stop()
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), frames(5))
+
+
+class DecoderCommandTests(unittest.TestCase):
+    def test_player_filters_scaled_to_camera_size(self):
+        options = {"width": 1280, "height": 720, "eye": "左眼", "correction": "none",
+                   "crop_size": 640, "eye_cx": 320, "eye_cy": 360}
+        cmd = virtual_camera.build_decoder_cmd(options, 1280, 720)
+        self.assertEqual(cmd[cmd.index("-vf") + 1], "crop=640:640:0:40,scale=1280:720")
+        self.assertEqual(cmd[-5:], ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"])
+
+
+if __name__ == "__main__":
+    unittest.main()